@@ -0,0 +1,146 @@
+"""
+Exports the fine-tuned disease classifier to CPU-optimized artifacts and checks that they
+still predict the same labels as the fp32 PyTorch model on Datasets/Test_images.
+
+Run from the be/ folder:
+    python AI/Export.py            # export + parity check
+    python AI/Export.py --check    # parity check only
+
+Then serve with DISEASE_BACKEND=onnx (or torchscript).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image
+from transformers import AutoModelForImageClassification
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from Diseasedetect import (  # noqa: E402
+    CHECKPOINT_PATH,
+    EXPORT_PATH,
+    ONNX_MODEL_PATH,
+    ONNX_INT8_MODEL_PATH,
+    TORCHSCRIPT_MODEL_PATH,
+    DiseaseModelRegistry,
+)
+
+TEST_IMAGES_PATH = Path(__file__).resolve().parent.parent / "Datasets" / "Test_images"
+
+
+class LogitsOnly(torch.nn.Module):
+    """
+    Wraps the HF model so the exported graph takes pixel_values and returns plain logits.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export():
+    EXPORT_PATH.mkdir(parents=True, exist_ok=True)
+    model = AutoModelForImageClassification.from_pretrained(str(CHECKPOINT_PATH), local_files_only=True)
+    model.eval()
+    wrapped = LogitsOnly(model).eval()
+    example = torch.randn(1, 3, 224, 224)
+
+    # ONNX (fp32) with a dynamic batch dimension
+    torch.onnx.export(
+        wrapped,
+        example,
+        str(ONNX_MODEL_PATH),
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    print(f"Saved {ONNX_MODEL_PATH}")
+
+    # ONNX int8 weights, if the quantization tooling is installed
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(ONNX_MODEL_PATH), str(ONNX_INT8_MODEL_PATH), weight_type=QuantType.QUInt8)
+        print(f"Saved {ONNX_INT8_MODEL_PATH}")
+    except ImportError:
+        print("onnxruntime not installed, skipping ONNX int8 export")
+
+    # TorchScript with dynamic int8 quantization (applies to the Linear classifier head)
+    quantized = torch.ao.quantization.quantize_dynamic(wrapped, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.inference_mode():
+        traced = torch.jit.trace(quantized, example)
+    traced.save(str(TORCHSCRIPT_MODEL_PATH))
+    print(f"Saved {TORCHSCRIPT_MODEL_PATH}")
+
+
+def load_test_images():
+    samples = []
+    for folder in sorted(p for p in TEST_IMAGES_PATH.iterdir() if p.is_dir()):
+        for path in sorted(folder.iterdir()):
+            samples.append((folder.name, Image.open(path).convert("RGB")))
+    return samples
+
+
+def classify(registry: DiseaseModelRegistry, images, batch_size: int = 32):
+    registry.load()
+    labels = []
+    started = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        probabilities = registry.predict_probabilities(images[i:i + batch_size])
+        labels.extend(registry.label_for_index(idx) for idx in probabilities.argmax(-1).tolist())
+    return labels, (time.perf_counter() - started) / len(images)
+
+
+def check_parity(max_mismatch_rate: float = 0.0) -> bool:
+    samples = load_test_images()
+    truth = [folder for folder, _ in samples]
+    images = [image for _, image in samples]
+    print(f"Checking parity on {len(images)} images from {TEST_IMAGES_PATH}")
+
+    reference, ref_seconds = classify(DiseaseModelRegistry(backend="torch"), images)
+    accuracy = sum(r == t for r, t in zip(reference, truth)) / len(truth)
+    print(f"torch        accuracy={accuracy:.3f}  {ref_seconds * 1000:.1f} ms/img")
+
+    candidates = [
+        ("torchscript", TORCHSCRIPT_MODEL_PATH),
+        ("onnx", ONNX_MODEL_PATH),
+        ("onnx", ONNX_INT8_MODEL_PATH),
+    ]
+    passed = True
+    for backend, path in candidates:
+        if not path.exists():
+            continue
+        try:
+            labels, seconds = classify(DiseaseModelRegistry(backend=backend, artifact_path=path), images)
+        except ImportError as e:
+            print(f"{path.name}: skipped ({e})")
+            continue
+        mismatches = [(t, r, l) for t, r, l in zip(truth, reference, labels) if r != l]
+        accuracy = sum(l == t for l, t in zip(labels, truth)) / len(truth)
+        mismatch_rate = len(mismatches) / len(labels)
+        print(
+            f"{path.name:<32} accuracy={accuracy:.3f}  mismatches={len(mismatches)}  "
+            f"{seconds * 1000:.1f} ms/img ({ref_seconds / seconds:.2f}x)"
+        )
+        for folder, expected, got in mismatches:
+            print(f"    {folder}: torch={expected} {backend}={got}")
+        if mismatch_rate > max_mismatch_rate:
+            passed = False
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only run the parity check")
+    parser.add_argument("--max-mismatch-rate", type=float, default=0.0, help="allowed share of labels that differ from torch")
+    args = parser.parse_args()
+
+    if not args.check:
+        export()
+    sys.exit(0 if check_parity(args.max_mismatch_rate) else 1)
@@ -1,26 +1,29 @@
-from fastapi import FastAPI, UploadFile, File
-from faster_whisper import WhisperModel
-import os
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from pathlib import Path
+import sys
+
+# Share the process-wide Whisper model with app.py instead of loading a second copy
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from speechmodel import speech_model, WHISPER_PRELOAD  # noqa: E402
+from transcriber import TranscriptionExecutor, TranscriberBusy, TranscriberUnavailable  # noqa: E402
 
 app_speech = FastAPI()
 
-# ✅ Load model once at startup
-model = WhisperModel("medium", device="cpu", compute_type="int8", cpu_threads=os.cpu_count())
+transcriber = TranscriptionExecutor(speech_model)
+
+
+@app_speech.on_event("startup")
+async def load_model():
+    if WHISPER_PRELOAD == "background":
+        speech_model.load_in_background()
 
-print("Model loaded ready to transcribe")
 
 @app_speech.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
-    # Save uploaded file temporarily
-    file_path = f"./temp_{file.filename}"
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    # Transcribe
-    segments, info = model.transcribe(file_path, beam_size=1, language="hi", vad_filter=True)
-    text = " ".join([s.text for s in segments])
+    # Decoded in memory and transcribed on the worker pool
+    try:
+        text = await transcriber.transcribe(await file.read(), beam_size=1, language="hi", vad_filter=True)
+    except (TranscriberBusy, TranscriberUnavailable) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": "5"})
 
     return {"transcription": text}
-
-
-
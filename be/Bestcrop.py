@@ -1,17 +1,26 @@
 import requests
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import pandas as pd
 import numpy as np
 import os
 from dotenv import load_dotenv
 import time
 import asyncio
-import httpx
+from singleflight import flights
+from geocache import geocache, tile_of as geocache_tile
+from httpclients import http_clients
+from rainstore import rain_store
+from suitability import SuitabilityIndex
 
 
 
 load_dotenv()
 
+# Upstream endpoints; module constants so benchmarks can point them at a local stub
+SOIL_API_URL = "https://soil.narc.gov.np/soil/api/"
+WEATHER_API_URL = "https://api.weatherapi.com/v1"
+ELEVATION_API_URL = "https://api.open-elevation.com/api/v1/lookup"
+
 try:
     df = pd.read_csv('Datasets/crop_ecology_data.csv')
 except FileNotFoundError:
@@ -56,6 +65,9 @@ plant_end = df["Planting_End_Month"].to_numpy()
 harvest_start = df["Harvesting_Start_Month"].to_numpy()
 harvest_end = df["Harvesting_End_Month"].to_numpy()
 
+# The same table compiled once for request-time scoring (plain lists / JSON, no DataFrames)
+crop_index = SuitabilityIndex(df)
+
 
 
 
@@ -98,66 +110,95 @@ def recommend_crops(temp, rainfall, ph, latitude, altitude, month):
     return result.sort_values("Score", ascending=False).reset_index(drop=True)
 
 
+# Locations scored per pass in the bulk engine; bounds the (locations x crops) temporaries
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "8192"))
+BULK_FETCH_CONCURRENCY = int(os.getenv("BULK_FETCH_CONCURRENCY", "16"))
+# A bulk request answers by this deadline; plots whose tile is not looked up yet get "error": "timeout"
+BULK_DEADLINE_SECONDS = float(os.getenv("BULK_DEADLINE_SECONDS", "20"))
+
+
+def score_matrix(temp, rainfall, ph, latitude, altitude, month) -> np.ndarray:
+    """
+    Scores every crop for many locations at once with the same rules as recommend_crops.
+    Each argument is a scalar or a 1-D array over locations; returns an int32 (locations, crops) matrix.
+    """
+    return crop_index.score_matrix(temp, rainfall, ph, latitude, altitude, month)
+
+
+def top_crops_bulk(temp, rainfall, ph, latitude, altitude, month, top_n: int = 5):
+    """
+    Top `top_n` crops with a positive score for each location, best first:
+    [[{"Crop": ..., "Score": ...}, ...], ...]. Scored in chunks of BULK_CHUNK_SIZE locations.
+    """
+    columns = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (temp, rainfall, ph, latitude, altitude, month)))
+    count = len(columns[0]) if columns[0].ndim else 1
+    columns = [np.atleast_1d(c) for c in columns]
+    top_n = max(1, min(top_n, len(crop_names)))
+    results = []
+    for lo in range(0, count, BULK_CHUNK_SIZE):
+        scores = score_matrix(*(c[lo:lo + BULK_CHUNK_SIZE] for c in columns))
+        # Stable sort keeps catalogue order among equal scores
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_n]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        names = crop_names[order]
+        for row_names, row_scores in zip(names.tolist(), top_scores.tolist()):
+            results.append([{"Crop": name, "Score": score} for name, score in zip(row_names, row_scores) if score > 0])
+    return results
+
+
+@geocache.cached("soil_ph")
+@flights.coalesce("soil_ph")
+async def _fetch_soil_ph(lat, lon):
+    url = f"{SOIL_API_URL}?lat={lat}&lon={lon}"
+    response = await http_clients.get("soil", url)
+    data = response.json()
+
+    # Extract pH
+    ph_value = data.get('ph')
+    if ph_value is not None:
+        # Remove spaces and convert to float
+        return round(float(ph_value.strip()), 2)
+    return None
+
+
 async def fetch_soil_ph(lat, lon):
-    url = f"https://soil.narc.gov.np/soil/api/?lat={lat}&lon={lon}"
+    # The default is returned but never cached, so a failed lookup is retried next time
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract pH
-            ph_value = data.get('ph')
-            if ph_value is not None:
-                # Remove spaces and convert to float
-                return round(float(ph_value.strip()), 2)
-            
-            # Default pH if not found
-            return 6.1
+        ph_value = await _fetch_soil_ph(lat, lon)
     except Exception:
         return 6.1
+    # Default pH if not found
+    return 6.1 if ph_value is None else ph_value
 
 
-
+@geocache.cached("weather")
+@flights.coalesce("weather")
 async def fetch_weather(lat, lon):
     weather_api_key = os.getenv("weather_api_key")
-    url = f"https://api.weatherapi.com/v1/current.json?key={weather_api_key}&q={lat},{lon}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if "error" in data:
-            raise ValueError(f"Weather API error: {data['error']['message']}")
-        return data["current"]["temp_c"]
-
+    url = f"{WEATHER_API_URL}/current.json?key={weather_api_key}&q={lat},{lon}"
+    response = await http_clients.get("weatherapi", url)
+    data = response.json()
+    if "error" in data:
+        raise ValueError(f"Weather API error: {data['error']['message']}")
+    return data["current"]["temp_c"]
+
+@geocache.cached("rainfall")
+@flights.coalesce("rainfall")
 async def fetch_rainfall(lat, lon):
-    today = datetime.now(timezone.utc).date()
-    one_year_ago = today - timedelta(days=365)
-    url = (
-        f"https://archive-api.open-meteo.com/v1/archive?"
-        f"latitude={lat}&longitude={lon}"
-        f"&start_date={one_year_ago}&end_date={today}"
-        "&daily=precipitation_sum&timezone=UTC"
-    )
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if "daily" in data and "precipitation_sum" in data["daily"]:
-            return sum(p for p in data["daily"]["precipitation_sum"] if p is not None)
-        return 0
+    # Only the days the store does not have yet are pulled from the archive
+    return await rain_store.annual_total(lat, lon)
 
+@geocache.cached("altitude")
+@flights.coalesce("altitude")
 async def fetch_altitude(lat, lon):
-    url = f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lon}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if "results" in data and len(data["results"]) > 0:
-            return data["results"][0]["elevation"]
-        return 0
-
-async def get_crop_recommendations_from_location(lat: float, lon: float):
+    url = f"{ELEVATION_API_URL}?locations={lat},{lon}"
+    response = await http_clients.get("open_elevation", url)
+    data = response.json()
+    if "results" in data and len(data["results"]) > 0:
+        return data["results"][0]["elevation"]
+    return 0
+
+async def location_conditions(lat: float, lon: float):
     # Run all fetches in parallel
     ph_task = fetch_soil_ph(lat, lon)
     weather_task = fetch_weather(lat, lon)
@@ -172,18 +213,96 @@ async def get_crop_recommendations_from_location(lat: float, lon: float):
 
     month = datetime.utcnow().month
     print(f"PH: {ph_soil}, Temp: {temp}, Rainfall: {rainfall}, Altitude: {altitude}, Month: {month}")
+    return dict(temp=temp, rainfall=rainfall, ph=ph_soil, latitude=lat, altitude=altitude, month=month)
 
-    # Call your synchronous recommendation function
-    recommendations = recommend_crops(
-        temp=temp,
-        rainfall=rainfall,
-        ph=ph_soil,
-        latitude=lat,
-        altitude=altitude,
-        month=month
-    )
-    return recommendations
+
+async def get_crop_recommendations_from_location(lat: float, lon: float):
+    # [{"Crop": ..., "Score": ...}, ...] best first, scored on the compiled index
+    return crop_index.recommend(**await location_conditions(lat, lon))
+
+
+async def get_crop_recommendations_json(lat: float, lon: float) -> bytes:
+    # Same list, already serialized for the HTTP response
+    return crop_index.recommend_json(**await location_conditions(lat, lon))
+
+
+async def get_bulk_recommendations(locations, top_n: int = 5, month: int = None, deadline: float = BULK_DEADLINE_SECONDS):
+    """
+    Recommendations for many (lat, lon) plots. Conditions are looked up once per map tile through
+    the cached fetches, at most BULK_FETCH_CONCURRENCY tiles at a time, then every plot is scored in one pass.
+    Returns one {"lat", "lon", "recommendations"} (or {"lat", "lon", "error"}) per input location.
+    Tiles still being looked up at `deadline` seconds keep going and fill the cache, so a retry
+    of the same request picks up where this one stopped.
+    """
+    month = month or datetime.utcnow().month
+    tiles = {}
+    for lat, lon in locations:
+        tiles.setdefault(geocache_tile(lat, lon), (lat, lon))
+
+    gate = asyncio.Semaphore(BULK_FETCH_CONCURRENCY)
+
+    async def conditions(lat, lon):
+        async with gate:
+            try:
+                return await asyncio.gather(fetch_weather(lat, lon), fetch_rainfall(lat, lon), fetch_soil_ph(lat, lon), fetch_altitude(lat, lon))
+            except Exception as e:
+                return e
+
+    tasks = {tile: asyncio.ensure_future(conditions(lat, lon)) for tile, (lat, lon) in tiles.items()}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    rows, scored, results = [], [], []
+    for lat, lon in locations:
+        task = tasks[geocache_tile(lat, lon)]
+        found = task.result() if task.done() else None
+        if found is None:
+            results.append({"lat": lat, "lon": lon, "error": "timeout"})
+        elif isinstance(found, Exception):
+            results.append({"lat": lat, "lon": lon, "error": str(found) or type(found).__name__})
+        else:
+            temp, rainfall, ph_soil, altitude = found
+            rows.append((temp, rainfall, ph_soil, lat, altitude))
+            scored.append(len(results))
+            results.append({"lat": lat, "lon": lon, "recommendations": None})
+
+    if rows:
+        temp, rainfall, ph_soil, lats, altitude = (np.array(column, dtype=float) for column in zip(*rows))
+        top = top_crops_bulk(temp, rainfall, ph_soil, lats, altitude, month, top_n)
+        for index, crops in zip(scored, top):
+            results[index]["recommendations"] = crops
+    return results
 
 
 # a = asyncio.run(get_crop_recommendations_from_location(27, 84))
-# print(a)
\ No newline at end of file
+# print(a)
+
+
+if __name__ == "__main__":
+    # Bulk scoring vs calling recommend_crops per location: python Bestcrop.py
+    rng = np.random.default_rng(0)
+    for count in (1_000, 10_000, 100_000):
+        temp = rng.uniform(0, 40, count)
+        rainfall = rng.uniform(100, 4000, count)
+        ph = rng.uniform(4.5, 8.5, count)
+        latitude = rng.uniform(26, 31, count)
+        altitude = rng.uniform(60, 4500, count)
+        month = rng.integers(1, 13, count)
+
+        started = time.perf_counter()
+        top = top_crops_bulk(temp, rainfall, ph, latitude, altitude, month, top_n=5)
+        bulk_seconds = time.perf_counter() - started
+
+        sample = min(count, 1_000)
+        started = time.perf_counter()
+        single = [recommend_crops(temp[i], rainfall[i], ph[i], latitude[i], altitude[i], month[i]) for i in range(sample)]
+        loop_seconds = (time.perf_counter() - started) * count / sample
+
+        # Same scores as the per-location path
+        matrix = score_matrix(temp[:sample], rainfall[:sample], ph[:sample], latitude[:sample], altitude[:sample], month[:sample])
+        for i, frame in enumerate(single):
+            expected = dict(zip(frame["Crop"], frame["Score"]))
+            assert expected == {name: int(score) for name, score in zip(crop_names, matrix[i]) if score > 0}
+            assert [c["Score"] for c in top[i]] == sorted(expected.values(), reverse=True)[:5]
+
+        print(f"{count:>7} locations: bulk {bulk_seconds * 1000:8.1f} ms, per-location loop {loop_seconds * 1000:9.1f} ms{' (extrapolated)' if sample < count else ''}, {loop_seconds / bulk_seconds:5.0f}x")
\ No newline at end of file
@@ -1,9 +1,8 @@
-import requests
-from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import re
 import pandas as pd
 import numpy as np
-import os
-from dotenv import load_dotenv
 
 
 try:
@@ -15,39 +14,148 @@ except FileNotFoundError:
 
 
 try:
-    df1 = pd.read_csv('Datasets/Fertilizer_data.csv')
+    df1 = pd.read_csv('Datasets/fertilizer_data.csv')
 except FileNotFoundError:
     print("File not found")
     df1 = pd.DataFrame()
 
+# Define optimal columns for both datasets
+optimal_columns_df = [
+    'Crop',
+    'Ecology_Temp_Optimal_Min', 'Ecology_Temp_Optimal_Max',
+    'Ecology_Rainfall_Annual_Optimal_Min', 'Ecology_Rainfall_Annual_Optimal_Max',
+    'Ecology_Latitude_Optimal_Min', 'Ecology_Latitude_Optimal_Max',
+    'Ecology_Altitude_Optimal_Min', 'Ecology_Altitude_Optimal_Max',
+    'Ecology_Soil_PH_Optimal_Min', 'Ecology_Soil_PH_Optimal_Max',
+    'Planting_Start_Month', 'Planting_End_Month',
+    'Harvesting_Start_Month', 'Harvesting_End_Month'
+]
+
+optimal_columns_df1 = [
+    'Crop',
+    'N_Required_kg_ha',
+    'P_Required_kg_ha',
+    'K_Required_kg_ha',
+    'Fertilizers',
+    'Usage_Period'
+]
+
+# Other names farmers type for catalogue crops
+CROP_ALIASES = {
+    "corn": "Maize",
+    "paddy": "Rice",
+    "eggplant": "Brinjal",
+    "aubergine": "Brinjal",
+    "capsicum": "Bell Pepper",
+    "groundnut": "Peanut",
+    "lady finger": "Okra",
+    "ladies finger": "Okra",
+    "chilli": "Chili Pepper",
+    "chili": "Chili Pepper",
+    "mustard": "Rapeseed",
+    "flax": "Linseed",
+    "coffee": "Arabica Coffee",
+    "cotton": "Upland Cotton",
+    "orange": "Sweet Orange",
+    "indian gooseberry": "Amla",
+    "colocasia": "Taro",
+    "lychee": "Litchi",
+    "soya": "Soybean",
+    "soyabean": "Soybean",
+}
+
+
+def normalize_crop_name(name: str) -> str:
+    return " ".join(re.sub(r"[_\-]+", " ", str(name)).lower().split())
+
+
+def _clean(value):
+    # numpy scalars -> Python, NaN -> None, ready for json.dumps
+    if isinstance(value, (float, np.floating)) and np.isnan(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class CropCatalogue:
+    """
+    The ecology and fertilizer tables merged per crop once, keyed by normalized name and aliases.
+    Each entry holds the /Crop_info response body as JSON bytes plus its ETag, so a request is a dict
+    lookup and a repeat visit can be answered with 304 Not Modified.
+    """
+
+    def __init__(self, ecology: pd.DataFrame, fertilizer: pd.DataFrame, aliases: dict = CROP_ALIASES):
+        ecology_rows, fertilizer_rows = {}, {}
+        if not ecology.empty:
+            for row in ecology[optimal_columns_df].to_dict(orient="records"):
+                ecology_rows.setdefault(normalize_crop_name(row["Crop"]), []).append(row)
+        if not fertilizer.empty:
+            for row in fertilizer[optimal_columns_df1].to_dict(orient="records"):
+                fertilizer_rows.setdefault(normalize_crop_name(row["Crop"]), []).append(row)
+
+        self.entries = {}  # normalized name -> (body, etag)
+        for key in ecology_rows.keys() | fertilizer_rows.keys():
+            eco, fert = ecology_rows.get(key, []), fertilizer_rows.get(key, [])
+            records = []
+            for i in range(max(len(eco), len(fert))):
+                # Row i of each table side by side, as get_crop_info's concat does
+                record = dict(eco[i]) if i < len(eco) else {column: None for column in optimal_columns_df}
+                if i < len(fert):
+                    record.update({column: value for column, value in fert[i].items() if column != "Crop"})
+                    if record["Crop"] is None:
+                        record["Crop"] = fert[i]["Crop"]
+                records.append({column: _clean(value) for column, value in record.items()})
+            body = json.dumps(records, ensure_ascii=False).encode("utf-8")
+            self.entries[key] = (body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"')
+
+        self.aliases = {}
+        for key in self.entries:
+            self.aliases[key.replace(" ", "")] = key
+        for alias, name in aliases.items():
+            if normalize_crop_name(name) in self.entries:
+                self.aliases[normalize_crop_name(alias)] = normalize_crop_name(name)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def lookup(self, name: str):
+        """
+        (body, etag) for a crop name or alias, or None.
+        """
+        key = normalize_crop_name(name)
+        entry = self.entries.get(key) or self.entries.get(self.aliases.get(key) or self.aliases.get(key.replace(" ", ""), ""))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def names(self) -> list:
+        return [json.loads(body)[0]["Crop"] for body, _ in self.entries.values()]
+
+    def stats(self) -> dict:
+        return {
+            "crops": len(self.entries),
+            "aliases": len(self.aliases),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+
 def get_crop_info(crop_name):
 
     # Case-insensitive match
     mask = df['Crop'].str.lower() == crop_name.lower()
     mask1 = df1['Crop'].str.lower() == crop_name.lower()
     
-    # Define optimal columns for both datasets
-    optimal_columns_df = [
-        'Crop',
-        'Ecology_Temp_Optimal_Min', 'Ecology_Temp_Optimal_Max',
-        'Ecology_Rainfall_Annual_Optimal_Min', 'Ecology_Rainfall_Annual_Optimal_Max',
-        'Ecology_Latitude_Optimal_Min', 'Ecology_Latitude_Optimal_Max',
-        'Ecology_Altitude_Optimal_Min', 'Ecology_Altitude_Optimal_Max',
-        'Ecology_Soil_PH_Optimal_Min', 'Ecology_Soil_PH_Optimal_Max',
-        'Planting_Start_Month', 'Planting_End_Month',
-        'Harvesting_Start_Month', 'Harvesting_End_Month'
-    ]
-    
-    optimal_columns_df1 = [
-        'Crop',
-        'N_Required_kg_ha', 
-        'P_Required_kg_ha', 
-        'K_Required_kg_ha', 
-        'Fertilizers', 
-        'Usage_Period'
-    ]
-
-    
     # Select rows if they exist
     crop_rows = []
     if mask.any():
@@ -60,7 +168,25 @@ def get_crop_info(crop_name):
         return merged_row
     else:
         return f"Crop '{crop_name}' not found in either dataset."
-    
 
-a = get_crop_info("Wheat")
-print(a)
+
+
+# Built once at startup
+crop_catalogue = CropCatalogue(df, df1)
+
+
+if __name__ == "__main__":
+    # Per-request cost, DataFrame path vs the catalogue: python Cropinfo.py
+    import time
+
+    names = [name for name in df["Crop"].tolist()] * 20
+    started = time.perf_counter()
+    for name in names:
+        get_crop_info(name).astype(object).to_dict(orient="records")
+    old = (time.perf_counter() - started) / len(names)
+    started = time.perf_counter()
+    for name in names:
+        crop_catalogue.lookup(name)
+    new = (time.perf_counter() - started) / len(names)
+    print(f"get_crop_info + to_dict: {old * 1e6:8.1f} us, catalogue lookup: {new * 1e6:6.2f} us")
+    print(crop_catalogue.lookup("wheat")[0].decode("utf-8"))
@@ -1,7 +1,16 @@
 from pathlib import Path
+from io import BytesIO
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
 import torch
-from transformers import AutoFeatureExtractor, AutoModelForImageClassification
+from transformers import AutoConfig, AutoModelForImageClassification
 from PIL import Image
+from cache import TTLCache
 
 # ---- LABEL MAPPING ----
 LABEL_MAP = {
@@ -26,67 +35,446 @@ LABEL_MAP = {
     'LABEL_18': 'Tomato___Tomato_mosaic_virus'
 }
 
+def clean_disease_name(name: str) -> str:
+    return name.replace("_", " ").replace("___", " ").replace("__", " ")
+
+
+# Resolve checkpoint path relative to this script
+CHECKPOINT_PATH = Path(__file__).parent / "AI" / "results" / "checkpoint-5373"
+# Alternative for testing: Hardcode absolute path
+# CHECKPOINT_PATH = Path("/home/user/Hami-Kisaan/be/AI/results/checkpoint-5373")
+
+# CPU artifacts produced by AI/Export.py
+EXPORT_PATH = CHECKPOINT_PATH.parent / "exported"
+ONNX_MODEL_PATH = EXPORT_PATH / "disease_classifier.onnx"
+ONNX_INT8_MODEL_PATH = EXPORT_PATH / "disease_classifier_int8.onnx"
+TORCHSCRIPT_MODEL_PATH = EXPORT_PATH / "disease_classifier_int8.pt"
+
+# torch | torchscript | onnx
+DISEASE_BACKEND = os.getenv("DISEASE_BACKEND", "torch").lower()
+DISEASE_MODEL_PATH = os.getenv("DISEASE_MODEL_PATH")
+# A failed background load is retried after this many seconds, doubling up to the maximum
+DISEASE_LOAD_RETRY_SECONDS = float(os.getenv("DISEASE_LOAD_RETRY_SECONDS", "5"))
+DISEASE_LOAD_RETRY_MAX_SECONDS = float(os.getenv("DISEASE_LOAD_RETRY_MAX_SECONDS", "300"))
+
+
+class ImagePreprocessor:
+    """
+    Decode → resize → center-crop → normalize pipeline driven by preprocessor_config.json.
+    Replaces the generic HF extractor: parameters are read once, JPEGs are decoded at reduced
+    size with Image.draft(), and pixels are written straight into a reusable float32 batch buffer.
+    """
+
+    def __init__(self, config_path: Path, max_buffered: int = None):
+        with open(config_path) as f:
+            config = json.load(f)
+
+        size = config.get("size", {})
+        crop = config.get("crop_size", {})
+        self.do_resize = config.get("do_resize", True)
+        self.shortest_edge = size.get("shortest_edge") or min(size.get("height", 256), size.get("width", 256))
+        self.resample = config.get("resample", Image.BILINEAR)
+        self.do_center_crop = config.get("do_center_crop", True)
+        self.crop_height = crop.get("height", 224)
+        self.crop_width = crop.get("width", 224)
+
+        # (x * rescale - mean) / std folded into one multiply-add per channel
+        rescale = config.get("rescale_factor", 1 / 255) if config.get("do_rescale", True) else 1.0
+        mean = np.array(config.get("image_mean", [0.0, 0.0, 0.0]) if config.get("do_normalize", True) else [0.0] * 3, dtype=np.float32)
+        std = np.array(config.get("image_std", [1.0, 1.0, 1.0]) if config.get("do_normalize", True) else [1.0] * 3, dtype=np.float32)
+        self.scale = (rescale / std).reshape(3, 1, 1)
+        self.offset = (-mean / std).reshape(3, 1, 1)
+        # Largest batch whose buffer a thread keeps: the batcher's batch size
+        self.max_buffered = max_buffered or int(os.getenv("DISEASE_MAX_BATCH_SIZE", "16"))
+        self._local = threading.local()
+
+    def decode(self, source) -> Image.Image:
+        """
+        Opens raw bytes (or a not-yet-loaded PIL image) as RGB, letting the JPEG decoder
+        downscale by 1/2, 1/4 or 1/8 while keeping the short edge at least `shortest_edge`.
+        """
+        image = Image.open(BytesIO(source)) if isinstance(source, (bytes, bytearray)) else source
+        if self.do_resize and image.format == "JPEG":
+            width, height = image.size
+            factor = self.shortest_edge / min(width, height)
+            if factor < 1:
+                image.draft("RGB", (math.ceil(width * factor), math.ceil(height * factor)))
+        return image.convert("RGB")
+
+    def resize_and_crop(self, image: Image.Image) -> Image.Image:
+        width, height = image.size
+        if self.do_resize:
+            # Scale the short edge to `shortest_edge`, keeping the aspect ratio (same as the HF processor)
+            if width <= height:
+                size = (self.shortest_edge, int(self.shortest_edge * height / width))
+            else:
+                size = (int(self.shortest_edge * width / height), self.shortest_edge)
+            if size != image.size:
+                image = image.resize(size, resample=self.resample)
+            width, height = size
+        if self.do_center_crop:
+            top = (height - self.crop_height) // 2
+            left = (width - self.crop_width) // 2
+            image = image.crop((left, top, left + self.crop_width, top + self.crop_height))
+        return image
+
+    def _buffer(self, count: int) -> np.ndarray:
+        # One buffer per thread, reused across batches up to the usual batch size; anything larger
+        # gets a one-off array so no thread keeps a big buffer for good
+        if count > self.max_buffered:
+            return np.empty((count, 3, self.crop_height, self.crop_width), dtype=np.float32)
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < count:
+            buffer = np.empty((count, 3, self.crop_height, self.crop_width), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:count]
+
+    def __call__(self, images) -> torch.Tensor:
+        batch = self._buffer(len(images))
+        for i, source in enumerate(images):
+            pixels = np.asarray(self.resize_and_crop(self.decode(source)), dtype=np.uint8).transpose(2, 0, 1)
+            np.multiply(pixels, self.scale, out=batch[i])
+            batch[i] += self.offset
+        return torch.from_numpy(batch)
+
+
+class TorchBackend:
+    """
+    fp32 PyTorch eager inference straight from the fine-tuned checkpoint.
+    """
+    name = "torch"
+
+    def __init__(self, checkpoint_path: Path, artifact_path: Path = None):
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = AutoModelForImageClassification.from_pretrained(str(checkpoint_path), local_files_only=True)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values.to(self.device)).logits
+
+
+class TorchScriptBackend:
+    """
+    Dynamic-int8-quantized TorchScript module exported by AI/Export.py (CPU only).
+    """
+    name = "torchscript"
+
+    def __init__(self, checkpoint_path: Path, artifact_path: Path = None):
+        artifact_path = Path(artifact_path or TORCHSCRIPT_MODEL_PATH)
+        if not artifact_path.exists():
+            raise FileNotFoundError(f"TorchScript model not found: {artifact_path}. Run AI/Export.py first.")
+        self.device = torch.device("cpu")
+        self.model = torch.jit.load(str(artifact_path), map_location=self.device)
+        self.model.eval()
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values)
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime CPU session over the model exported by AI/Export.py.
+    """
+    name = "onnx"
+
+    def __init__(self, checkpoint_path: Path, artifact_path: Path = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+
+        artifact_path = Path(artifact_path or ONNX_MODEL_PATH)
+        if not artifact_path.exists():
+            raise FileNotFoundError(f"ONNX model not found: {artifact_path}. Run AI/Export.py first.")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.device = torch.device("cpu")
+        self.session = ort.InferenceSession(str(artifact_path), options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        logits = self.session.run(["logits"], {"pixel_values": pixel_values.cpu().numpy()})[0]
+        return torch.from_numpy(logits)
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+class DiseaseModelRegistry:
+    """
+    Keeps the disease classifier and its preprocessor loaded for the lifetime of the process.
+    The model is loaded once (thread-safe), put in eval mode and warmed up, after which
+    concurrent requests share it read-only under torch.inference_mode().
+    """
+
+    def __init__(self, checkpoint_path: Path = CHECKPOINT_PATH, backend: str = DISEASE_BACKEND, artifact_path: Path = DISEASE_MODEL_PATH):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown disease backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+        self.checkpoint_path = Path(checkpoint_path)
+        self.backend_name = backend
+        self.artifact_path = artifact_path
+        self.preprocessor = None
+        self.config = None
+        self.backend = None
+        self.device = None
+        self.ready = False
+        self.load_seconds = None
+        self.error = None
+        self.attempts = 0
+        self._lock = threading.Lock()
+        self._loader = None
+        self._loader_lock = threading.Lock()
+
+    def _verify_checkpoint(self):
+        print(f"Checking checkpoint path: {self.checkpoint_path}")
+        if not self.checkpoint_path.exists():
+            raise FileNotFoundError(f"Checkpoint folder not found: {self.checkpoint_path}")
+        if not self.checkpoint_path.is_dir():
+            raise NotADirectoryError(f"Checkpoint path is not a directory: {self.checkpoint_path}")
+
+        # Verify required files
+        required_files = ["training_args.bin", "config.json", "preprocessor_config.json"]
+        for file in required_files:
+            if not (self.checkpoint_path / file).exists():
+                raise FileNotFoundError(f"Missing required file in checkpoint: {file}")
+
+        print("Checkpoint folder and files verified")
+
+    def load(self):
+        """
+        Loads, evaluates and warms up the model. Safe to call from several threads; only the first call loads.
+        """
+        if self.ready:
+            return self
+        with self._lock:
+            if self.ready:
+                return self
+            started = time.perf_counter()
+            self.attempts += 1
+            try:
+                self._verify_checkpoint()
+                preprocessor = ImagePreprocessor(self.checkpoint_path / "preprocessor_config.json")
+                config = AutoConfig.from_pretrained(str(self.checkpoint_path), local_files_only=True)
+                backend = BACKENDS[self.backend_name](self.checkpoint_path, self.artifact_path)
+                print(f"Using {backend.name} backend on device: {backend.device}")
+
+                self.preprocessor, self.config, self.backend, self.device = preprocessor, config, backend, backend.device
+                self.warmup()
+            except Exception as e:
+                self.error = str(e)
+                print(f"Error loading model or preprocessor: {str(e)}")
+                raise
+
+            self.load_seconds = time.perf_counter() - started
+            self.error = None
+            self.ready = True
+            print(f"Disease model ready in {self.load_seconds:.2f}s")
+        return self
+
+    def load_in_background(self, retry_seconds: float = DISEASE_LOAD_RETRY_SECONDS):
+        """
+        Starts loading on a daemon thread so the HTTP server can come up immediately. A failed load
+        is retried with exponential backoff until it succeeds. Does nothing if the model is ready or
+        a loader is already running, so it is safe to call again (e.g. from /ready).
+        """
+        def _run():
+            delay = retry_seconds
+            while not self.ready:
+                try:
+                    self.load()
+                except Exception:
+                    # Kept in self.error and reported by status() meanwhile
+                    print(f"Retrying disease model load in {delay:g}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, DISEASE_LOAD_RETRY_MAX_SECONDS)
+
+        with self._loader_lock:
+            if self.ready or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=_run, name="disease-model-loader", daemon=True)
+            self._loader.start()
+
+    def warmup(self):
+        """
+        Runs one dummy inference so the first real request doesn't pay for lazy allocations.
+        """
+        self._forward([Image.new("RGB", (256, 256))])
+
+    def _forward(self, images) -> torch.Tensor:
+        # Preprocess images
+        try:
+            pixel_values = self.preprocessor(images)
+        except Exception as e:
+            print(f"Error preprocessing image: {str(e)}")
+            raise
+
+        # Predict
+        try:
+            with torch.inference_mode():
+                logits = self.backend(pixel_values)
+                return logits.softmax(-1).cpu()
+        except Exception as e:
+            print(f"Error during prediction: {str(e)}")
+            raise
+
+    def predict_probabilities(self, images) -> torch.Tensor:
+        """
+        Classifies a list of PIL images (or raw image bytes) in one batched forward pass.
+        Returns softmax probabilities of shape (len(images), num_labels) on the CPU.
+        """
+        self.load()
+        return self._forward(images)
+
+    def label_for_index(self, idx: int) -> str:
+        # Get proper label
+        predicted_label = self.config.id2label.get(idx, "Unknown")
+        return LABEL_MAP.get(predicted_label, "Unknown")
+
+    def predict(self, image: Image.Image) -> str:
+        probabilities = self.predict_probabilities([image])
+        return self.label_for_index(probabilities[0].argmax().item())
+
+    def top_k(self, probabilities: torch.Tensor, k: int = 3) -> list:
+        """
+        Returns the k most likely diseases for every row of `probabilities` with their softmax confidences.
+        """
+        values, indices = probabilities.topk(min(k, probabilities.shape[-1]), dim=-1)
+        return [
+            [{"disease": self.label_for_index(idx), "confidence": round(value, 4)} for value, idx in zip(row_values, row_indices)]
+            for row_values, row_indices in zip(values.tolist(), indices.tolist())
+        ]
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "backend": self.backend_name,
+            "device": str(self.device) if self.device is not None else None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "attempts": self.attempts,
+            "loading": self._loader is not None and self._loader.is_alive(),
+        }
+
+
+class DiseaseResultCache:
+    """
+    Caches classification results for uploaded images.
+    Exact re-uploads are matched by a hash of the file bytes; re-encoded or resized copies
+    of the same photo are matched by a 64-bit difference hash (dHash) within `max_distance` bits.
+    Only hashes of images that were actually classified are stored, so near matches never chain
+    from one photo to the next.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 6 * 3600, max_distance: int = 4):
+        self.exact = TTLCache(maxsize, ttl)
+        self.perceptual = TTLCache(maxsize, ttl)
+        self.max_distance = max_distance
+        # Hashes within max_distance bits agree exactly on at least one of max_distance + 1 bands,
+        # so a lookup only compares the hashes sharing a band instead of scanning them all
+        self.band_bits = 64 // (max_distance + 1)
+        self.bands = [{} for _ in range(max_distance + 1)]  # band value -> set of stored hashes
+        self.indexed = 0
+        self._lock = threading.Lock()
+        self.near_hits = 0
+
+    @staticmethod
+    def content_key(image_bytes: bytes) -> str:
+        return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+    @staticmethod
+    def perceptual_hash(image_bytes: bytes) -> int:
+        image = Image.open(BytesIO(image_bytes))
+        # A 9x8 thumbnail is all dHash needs, so let the JPEG decoder skip almost everything
+        image.draft("L", (64, 64))
+        pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return int("".join("1" if bit else "0" for bit in bits), 2)
+
+    def _band_values(self, phash: int):
+        mask = (1 << self.band_bits) - 1
+        # The last band takes whatever bits are left over
+        for band in range(len(self.bands) - 1):
+            yield band, (phash >> (band * self.band_bits)) & mask
+        last = len(self.bands) - 1
+        yield last, phash >> (last * self.band_bits)
+
+    def get(self, content_key: str):
+        return self.exact.get(content_key)
+
+    def get_similar(self, phash: int):
+        with self._lock:
+            candidates = set()
+            for band, value in self._band_values(phash):
+                candidates |= self.bands[band].get(value, set())
+        best, best_distance = None, self.max_distance + 1
+        for other in candidates:
+            distance = (phash ^ other).bit_count()
+            if distance < best_distance:
+                result = self.perceptual.get(other)
+                if result is not None:
+                    best, best_distance = result, distance
+        if best is not None:
+            self.near_hits += 1
+        return best
+
+    def set(self, content_key: str, phash: int, result):
+        """
+        Pass `phash` only for an image that was classified; results served from a near match are
+        cached under their exact bytes alone.
+        """
+        self.exact.set(content_key, result)
+        if phash is None:
+            return
+        self.perceptual.set(phash, result)
+        with self._lock:
+            for band, value in self._band_values(phash):
+                self.bands[band].setdefault(value, set()).add(phash)
+            self.indexed += 1
+            # Evicted and expired hashes stay in the bands until the index is rebuilt from the live ones
+            if self.indexed > 2 * self.perceptual.maxsize:
+                self._reindex()
+
+    def _reindex(self):
+        self.bands = [{} for _ in self.bands]
+        self.indexed = 0
+        for phash, _ in self.perceptual.items():
+            for band, value in self._band_values(phash):
+                self.bands[band].setdefault(value, set()).add(phash)
+            self.indexed += 1
+
+    def stats(self) -> dict:
+        exact = self.exact.stats()
+        lookups = exact["hits"] + exact["misses"]
+        saved = exact["hits"] + self.near_hits
+        return {
+            "size": exact["size"],
+            "exact_hits": exact["hits"],
+            "near_duplicate_hits": self.near_hits,
+            "misses": exact["misses"] - self.near_hits,
+            "evictions": exact["evictions"],
+            "inferences_saved": saved,
+            "hit_rate": round(saved / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Shared across all requests in this process
+registry = DiseaseModelRegistry()
+result_cache = DiseaseResultCache(
+    maxsize=int(os.getenv("DISEASE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("DISEASE_CACHE_TTL", str(6 * 3600))),
+    max_distance=int(os.getenv("DISEASE_CACHE_MAX_DISTANCE", "4")),
+)
+
+
 def predict_plant_disease_from_image(image: Image.Image) -> str:
     """
     Predicts the disease of a plant leaf from a PIL Image object using a pretrained model.
     """
-    # Resolve checkpoint path relative to this script
-    checkpoint_path = Path(__file__).parent / "AI" / "results" / "checkpoint-5373"
-    # Alternative for testing: Hardcode absolute path
-    # checkpoint_path = Path("/home/user/Hami-Kisaan/be/AI/results/checkpoint-5373")
-
-    print(f"Checking checkpoint path: {checkpoint_path}")
-    if not checkpoint_path.exists():
-        raise FileNotFoundError(f"Checkpoint folder not found: {checkpoint_path}")
-    if not checkpoint_path.is_dir():
-        raise NotADirectoryError(f"Checkpoint path is not a directory: {checkpoint_path}")
-
-    # Verify required files
-    required_files = ["training_args.bin", "config.json", "preprocessor_config.json"]
-    for file in required_files:
-        if not (checkpoint_path / file).exists():
-            raise FileNotFoundError(f"Missing required file in checkpoint: {file}")
-
-    print("Checkpoint folder and files verified")
-
-    try:
-        # Load model & extractor
-        extractor = AutoFeatureExtractor.from_pretrained(str(checkpoint_path), local_files_only=True)
-        model = AutoModelForImageClassification.from_pretrained(str(checkpoint_path), local_files_only=True)
-    except Exception as e:
-        print(f"Error loading model or extractor: {str(e)}")
-        raise
-
-    # Device
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    model.eval()
-    print(f"Using device: {device}")
-
-    # Ensure image is RGB
-    image = image.convert("RGB")
-
-    # Preprocess image
-    try:
-        inputs = extractor(images=image, return_tensors="pt")
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-    except Exception as e:
-        print(f"Error preprocessing image: {str(e)}")
-        raise
-
-    # Predict
-    try:
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            predicted_class_idx = logits.argmax(-1).item()
-    except Exception as e:
-        print(f"Error during prediction: {str(e)}")
-        raise
-
-    # Get proper label
-    predicted_label = model.config.id2label.get(predicted_class_idx, "Unknown")
-    predicted_disease = LABEL_MAP.get(predicted_label, "Unknown")
+    predicted_disease = registry.predict(image)
     print(f"Predicted disease: {predicted_disease}")
 
-    return predicted_disease
\ No newline at end of file
+    return predicted_disease
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from dotenv import load_dotenv
+from forecastalerts import FORECAST_TILE_DEGREES, NO_ALERTS, ForecastFrame, evaluate, fetch_forecast, load_rules
+from geocache import tile_center, tile_of
+from httpclients import http_clients
+
+load_dotenv()
+
+ALERT_JOB_DAYS = int(os.getenv("ALERT_JOB_DAYS", "3"))
+# Forecast requests in flight at once, and started per second (weatherapi plans are rate limited)
+ALERT_JOB_CONCURRENCY = int(os.getenv("ALERT_JOB_CONCURRENCY", "32"))
+ALERT_JOB_RATE = float(os.getenv("ALERT_JOB_RATE", "50"))
+# Rows per page when reading farmers, and user ids per bulk update
+ALERT_JOB_PAGE_SIZE = int(os.getenv("ALERT_JOB_PAGE_SIZE", "1000"))
+ALERT_JOB_WRITE_BATCH = int(os.getenv("ALERT_JOB_WRITE_BATCH", "200"))
+ALERT_JOB_WRITE_CONCURRENCY = int(os.getenv("ALERT_JOB_WRITE_CONCURRENCY", "4"))
+# The job usually runs from cron, so each run's stats are left here for the API's /metrics
+ALERT_JOB_STATS_PATH = Path(os.getenv("ALERT_JOB_STATS_PATH", Path(__file__).parent / "alertjob_stats.json"))
+
+# Failed forecast tiles listed in last_run (all of them are counted)
+ALERT_JOB_FAILED_TILES_REPORTED = 50
+
+# Notices this job wrote carry this source; anything else in the column is left alone
+NOTICE_SOURCE = "weather"
+
+
+class RateLimiter:
+    """
+    Token bucket for asyncio: acquire() waits until a request may start, `rate` per second on
+    average with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SupabaseFarmers:
+    """
+    Farmer locations and notices in the Supabase `users` table.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from supabase import create_client
+            client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE"))
+        self.client = client
+
+    def load(self) -> list:
+        """
+        [{"id", "latitude", "longitude", "notices"}, ...] for every user with a location.
+        """
+        rows, start = [], 0
+        while True:
+            page = (
+                self.client.table("users")
+                .select("id, latitude, longitude, notices")
+                .not_.is_("latitude", "null")
+                .not_.is_("longitude", "null")
+                .order("id")
+                .range(start, start + ALERT_JOB_PAGE_SIZE - 1)
+                .execute()
+                .data
+            )
+            rows += page
+            if len(page) < ALERT_JOB_PAGE_SIZE:
+                return rows
+            start += ALERT_JOB_PAGE_SIZE
+
+    def notices(self, ids: list) -> dict:
+        """
+        {id: notices} as stored right now, for merging just before a write.
+        """
+        rows = self.client.table("users").select("id, notices").in_("id", ids).execute().data
+        return {row["id"]: row["notices"] for row in rows}
+
+    def write(self, notices: list, ids: list):
+        self.client.table("users").update({"notices": notices}).in_("id", ids).execute()
+
+
+def _weather_notices(alerts: list, issued: str) -> list:
+    if alerts == [NO_ALERTS]:
+        return []
+    return [{"title": "Weather alert", "message": alert, "time": issued, "source": NOTICE_SOURCE} for alert in alerts]
+
+
+def _other_notices(notices) -> list:
+    # Everything in the column that this job did not write
+    return [notice for notice in notices or [] if not (isinstance(notice, dict) and notice.get("source") == NOTICE_SOURCE)]
+
+
+def last_run_stats(path: Path = ALERT_JOB_STATS_PATH):
+    """
+    The stats the most recent run of the job (in any process) left behind, or None.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class AlertJob:
+    """
+    Weather alerts for every farmer in one pass: farmer locations are grouped into forecast tiles,
+    each tile's forecast is fetched once (concurrently, under ALERT_JOB_RATE), all forecasts are
+    stacked into one ForecastFrame and evaluated together, and farmers whose alerts changed are
+    written back grouped by identical notices, so one update covers many users. Each update batch
+    re-reads its farmers' notices first and keeps whatever other sources added since the load.
+    """
+
+    def __init__(self, farmers, days: int = ALERT_JOB_DAYS, tile_degrees: float = FORECAST_TILE_DEGREES,
+                 concurrency: int = ALERT_JOB_CONCURRENCY, rate: float = ALERT_JOB_RATE, rules: list = None,
+                 stats_path: Path = ALERT_JOB_STATS_PATH):
+        self.farmers = farmers
+        self.days = days
+        self.tile_degrees = tile_degrees
+        self.concurrency = concurrency
+        self.rate = rate
+        self.rules = load_rules() if rules is None else rules
+        self.stats_path = stats_path
+        self.runs = 0
+        self.last_run = None
+
+    async def _fetch_tiles(self, tiles: list) -> list:
+        """
+        One ForecastFrame per tile, or the exception its fetch raised.
+        """
+        gate = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate, burst=self.concurrency)
+
+        async def fetch(tile):
+            async with gate:
+                await limiter.acquire()
+                lat, lon = tile_center(tile, self.tile_degrees)
+                try:
+                    return ForecastFrame.from_payload(await fetch_forecast(lat, lon, self.days))
+                except Exception as e:
+                    print(f"Forecast for tile {tile} failed: {e}")
+                    return e
+
+        return await asyncio.gather(*(fetch(tile) for tile in tiles))
+
+    async def _write(self, groups: dict) -> tuple:
+        """
+        groups: the new weather notices, serialized with json.dumps, -> ids of the farmers getting them.
+        Returns (read calls, update calls).
+        """
+        gate = asyncio.Semaphore(ALERT_JOB_WRITE_CONCURRENCY)
+
+        async def write(weather, ids):
+            async with gate:
+                # Merge with the column as it is now, not as it was when the job started
+                current = await asyncio.to_thread(self.farmers.notices, ids)
+                merged = {}
+                for user_id in ids:
+                    key = json.dumps(_other_notices(current.get(user_id)) + weather, ensure_ascii=False)
+                    merged.setdefault(key, []).append(user_id)
+                for key, same in merged.items():
+                    await asyncio.to_thread(self.farmers.write, json.loads(key), same)
+                return len(merged)
+
+        batches = [
+            (json.loads(key), ids[i:i + ALERT_JOB_WRITE_BATCH])
+            for key, ids in groups.items()
+            for i in range(0, len(ids), ALERT_JOB_WRITE_BATCH)
+        ]
+        return len(batches), sum(await asyncio.gather(*(write(weather, ids) for weather, ids in batches)))
+
+    async def run(self) -> dict:
+        started = time.perf_counter()
+        issued = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        rows = await asyncio.to_thread(self.farmers.load)
+        # The same tiles ForecastCache uses, so the job and /weatherforecast ask for the same forecasts
+        tile_index, farmer_tile = {}, []
+        for row in rows:
+            tile = tile_of(row["latitude"], row["longitude"], self.tile_degrees)
+            farmer_tile.append(tile_index.setdefault(tile, len(tile_index)))
+        tiles = list(tile_index)
+        loaded = time.perf_counter()
+
+        frames = await self._fetch_tiles(tiles)
+        fetched = [i for i, frame in enumerate(frames) if not isinstance(frame, Exception)]
+        failed = [(tiles[i], frame) for i, frame in enumerate(frames) if isinstance(frame, Exception)]
+        fetched_at = time.perf_counter()
+
+        tile_alerts = [None] * len(tiles)
+        if fetched:
+            for i, alerts in zip(fetched, evaluate(ForecastFrame.concat([frames[i] for i in fetched]), self.rules)):
+                tile_alerts[i] = alerts
+        evaluated = time.perf_counter()
+
+        # Only farmers whose weather notices changed are written, grouped by their new weather notices
+        groups, unchanged, skipped = {}, 0, 0
+        for row, tile in zip(rows, farmer_tile):
+            alerts = tile_alerts[tile]
+            if alerts is None:
+                skipped += 1
+                continue
+            current = row.get("notices") or []
+            kept = _other_notices(current)
+            previous = [notice["message"] for notice in current if notice not in kept]
+            if previous == (alerts if alerts != [NO_ALERTS] else []):
+                unchanged += 1
+                continue
+            key = json.dumps(_weather_notices(alerts, issued), ensure_ascii=False)
+            groups.setdefault(key, []).append(row["id"])
+        reads, writes = await self._write(groups)
+        finished = time.perf_counter()
+
+        self.runs += 1
+        self.last_run = {
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "farmers": len(rows),
+            "tiles": len(tiles),
+            "forecast_calls": len(tiles),
+            "forecast_failures": len(failed),
+            "failed_tiles": [
+                {"tile": list(tile), "center": list(tile_center(tile, self.tile_degrees)), "error": str(e) or type(e).__name__}
+                for tile, e in failed[:ALERT_JOB_FAILED_TILES_REPORTED]
+            ],
+            "farmers_updated": sum(len(ids) for ids in groups.values()),
+            "farmers_unchanged": unchanged,
+            "farmers_skipped": skipped,
+            "notice_reads": reads,
+            "update_calls": writes,
+            "load_seconds": round(loaded - started, 2),
+            "fetch_seconds": round(fetched_at - loaded, 2),
+            "evaluate_seconds": round(evaluated - fetched_at, 3),
+            "write_seconds": round(finished - evaluated, 2),
+            "total_seconds": round(finished - started, 2),
+        }
+        print(f"Weather alert job: {self.last_run}")
+        if self.stats_path:
+            try:
+                with open(self.stats_path, "w", encoding="utf-8") as f:
+                    json.dump(self.stats(), f)
+            except OSError as e:
+                print(f"Could not write {self.stats_path}: {str(e)}")
+        return self.last_run
+
+    def stats(self) -> dict:
+        return {"runs": self.runs, "last_run": self.last_run}
+
+
+if __name__ == "__main__":
+    # Run once against Supabase (e.g. from cron): python alertjob.py
+    # Benchmark against the local stub instead:  python alertjob.py --benchmark [farmers] [villages]
+    import random
+    import sys
+    from stubserver import StubServer
+    import forecastalerts
+
+    async def run_once():
+        try:
+            await AlertJob(SupabaseFarmers()).run()
+        finally:
+            await http_clients.close()
+
+    if "--benchmark" not in sys.argv:
+        asyncio.run(run_once())
+        sys.exit()
+
+    args = [arg for arg in sys.argv[1:] if arg != "--benchmark"]
+    farmers = int(args[0]) if args else 100_000
+    villages = int(args[1]) if len(args) > 1 else 3_000
+
+    class MemoryFarmers:
+        # The users table as a list of rows, counting update calls
+        def __init__(self, rows):
+            self.rows = {row["id"]: row for row in rows}
+            self.updates = 0
+
+        def load(self):
+            return [dict(row) for row in self.rows.values()]
+
+        def notices(self, ids):
+            return {user_id: self.rows[user_id]["notices"] for user_id in ids}
+
+        def write(self, notices, ids):
+            self.updates += 1
+            for user_id in ids:
+                self.rows[user_id]["notices"] = notices
+
+    # Farmers clustered around villages across Nepal's farmland latitudes
+    rng = random.Random(0)
+    centres = [(rng.uniform(26.4, 30.2), rng.uniform(80.1, 88.1)) for _ in range(villages)]
+    rows = []
+    for i in range(farmers):
+        lat, lon = rng.choice(centres)
+        rows.append({"id": i, "latitude": lat + rng.gauss(0, 0.004), "longitude": lon + rng.gauss(0, 0.004), "notices": None})
+
+    async def main():
+        with StubServer(latency=0.05) as stub:
+            stub.point(forecastalerts)
+
+            # Today's path: one forecast request and nested-loop analysis per farmer, on a sample
+            sample = rows[:500]
+            gate = asyncio.Semaphore(ALERT_JOB_CONCURRENCY)
+
+            async def per_farmer(row):
+                async with gate:
+                    data = await fetch_forecast(row["latitude"], row["longitude"], ALERT_JOB_DAYS)
+                    return len(data["forecast"]["forecastday"])
+
+            started = time.perf_counter()
+            await asyncio.gather(*(per_farmer(row) for row in sample))
+            per_farmer_seconds = (time.perf_counter() - started) * farmers / len(sample)
+            print(f"per-farmer requests : {farmers} forecast calls, ~{per_farmer_seconds:.0f}s (extrapolated from {len(sample)}, concurrency {ALERT_JOB_CONCURRENCY}, no rate limit)")
+
+            store = MemoryFarmers(rows)
+            job = AlertJob(store, rate=1000, concurrency=64, stats_path=None)
+            for label in ("first run", "second run"):
+                stub.reset()
+                store.updates = 0
+                result = await job.run()
+                print(f"alert job, {label:<10}: {result['forecast_calls']} forecast calls ({stub.requests} requests), {store.updates} bulk updates for {result['farmers_updated']} farmers, {result['total_seconds']}s")
+
+            # Same alerts as /weatherforecast (forecast_cache.alerts) gives the farmer
+            for row in rows[:50]:
+                expected = await forecastalerts.forecast_cache.alerts(row["latitude"], row["longitude"], ALERT_JOB_DAYS)
+                written = [notice["message"] for notice in store.rows[row["id"]]["notices"]] or [NO_ALERTS]
+                assert written == expected, (written, expected)
+            print("notices match /weatherforecast for the sampled farmers")
+            await http_clients.close()
+
+    asyncio.run(main())
@@ -1,17 +1,30 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File,  Query, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File,  Query, BackgroundTasks, WebSocket, WebSocketDisconnect, Request
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from Bestcrop import get_crop_recommendations_from_location,fetch_soil_ph,fetch_weather,fetch_rainfall,fetch_altitude
+from Bestcrop import get_crop_recommendations_json, get_bulk_recommendations
 from weatherforecast import analyze_forecast_for_alerts_async, LocationInput as WeatherLocationInput
-import pandas as pd
-from faster_whisper import WhisperModel
+from forecastalerts import forecast_cache
+from alertjob import last_run_stats
+from speechmodel import speech_model, WHISPER_PRELOAD
+from transcriber import TranscriptionExecutor, TranscriberBusy, TranscriberUnavailable, StreamingTranscription
 import json
-from callai import msg
-from searchai import grounded_search
+from callai import client as llm_client
+from searchai import client as search_client
+from diseaseinfo import knowledge_store, empty_details
+from listing import extract_listing, listing_stats
+from intentrouter import route_query, router as intent_router
+from singleflight import flights as upstream_flights
+from geocache import geocache
+from httpclients import http_clients
+from dashboard import dashboard
+from rainstore import rain_store
 import os
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import re
-from Cropinfo import get_crop_info
-from Diseasedetect import predict_plant_disease_from_image
+from Cropinfo import crop_catalogue, etag_matches
+from cropsearch import crop_search
+from Diseasedetect import LABEL_MAP, clean_disease_name, registry as disease_registry, result_cache as disease_cache
+from diseasebatcher import batcher as disease_batcher
 from supabase import client, Client, create_client
 from datetime import datetime
 from PIL import Image
@@ -27,14 +40,24 @@ SUPABASE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE")
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-model = WhisperModel("medium", device="cpu", compute_type="int8", cpu_threads=os.cpu_count())
-
-print("Model loaded ready to transcribe")
+# Whisper runs on a bounded pool so a long clip never freezes the other endpoints
+transcriber = TranscriptionExecutor(speech_model)
 
 class DiseaseRequest(BaseModel):
     disease_name: str
 
 
+class PlotLocation(BaseModel):
+    lat: float
+    lon: float
+
+
+class BulkRecommendationRequest(BaseModel):
+    locations: List[PlotLocation]
+    top_n: int = 5
+    month: Optional[int] = None
+
+
 app = FastAPI()
 
 # Add CORS middleware
@@ -77,26 +100,95 @@ def disease_detected(disease_name: str, latitude: float, longitude: float):
         return None
 
 
+@app.on_event("startup")
+async def warm_disease_model():
+    # Load and warm up the classifier without blocking server startup; /ready reports when it is hot
+    disease_registry.load_in_background()
+    disease_batcher.start()
+    if WHISPER_PRELOAD == "background":
+        speech_model.load_in_background()
+    app.state.knowledge_refresh = asyncio.create_task(knowledge_store.refresh_loop())
+    await http_clients.start()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    disease_batcher.stop()
+    transcriber.shutdown()
+    app.state.knowledge_refresh.cancel()
+    geocache.close()
+    await http_clients.close()
+
+
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
 
+
+@app.get("/ready")
+def readiness():
+    status = disease_registry.status()
+    if not status["ready"]:
+        # A lazy load that failed (or a loader that gave up) starts retrying here
+        disease_registry.load_in_background()
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "disease_batcher": disease_batcher.stats(),
+        "disease_cache": disease_cache.stats(),
+        "transcriber": transcriber.stats(),
+        "speech_model": speech_model.status(),
+        "intent_router": intent_router.stats(),
+        "listing_extractor": listing_stats.stats(),
+        "llm": llm_client.stats(),
+        "llm_search": search_client.stats(),
+        "disease_knowledge": knowledge_store.stats(),
+        "upstream_coalescing": upstream_flights.stats(),
+        "geocache": geocache.stats(),
+        "upstream_http": http_clients.stats(),
+        "dashboard": dashboard.stats(),
+        "rainfall_store": rain_store.stats(),
+        "crop_catalogue": crop_catalogue.stats(),
+        "crop_search": crop_search.stats(),
+        "weather_forecasts": forecast_cache.stats(),
+        "weather_alert_job": last_run_stats(),
+    }
+
 @app.get("/Crop_recommendation")
 async def crop_recommendation(lat: float, lon: float):
-    # Get recommendations (returns a pandas DataFrame)
-    recommendations =  await get_crop_recommendations_from_location(lat, lon)
+    # Scored on the compiled suitability index and sent as prebuilt JSON: [{"Crop", "Score"}, ...]
+    return Response(content=await get_crop_recommendations_json(lat, lon), media_type="application/json")
 
 
-    if not isinstance(recommendations, pd.DataFrame):
-        recommendations = pd.DataFrame(recommendations)
-    
-    
-    recommendations = recommendations.astype(object).where(pd.notnull(recommendations), None)
-    
-    # Convert to list of dicts for JSON response
-    return recommendations.to_dict(orient="records")
+MAX_BULK_LOCATIONS = int(os.getenv("MAX_BULK_LOCATIONS", "10000"))
+
+
+@app.post("/Crop_recommendation/bulk")
+async def crop_recommendation_bulk(request: BulkRecommendationRequest):
+    # District planning: top crops for many plots, conditions looked up once per map tile
+    if not request.locations:
+        raise HTTPException(status_code=400, detail="No locations provided")
+    if len(request.locations) > MAX_BULK_LOCATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_LOCATIONS} locations per request")
+    if request.month is not None and not 1 <= request.month <= 12:
+        raise HTTPException(status_code=400, detail="month must be between 1 and 12")
+    return await get_bulk_recommendations([(p.lat, p.lon) for p in request.locations], request.top_n, request.month)
+
 
 
+async def transcribe_or_reject(audio) -> str:
+    """
+    Transcribes on the worker pool, turning saturation into 429 and an unavailable model into 503.
+    """
+    try:
+        return await transcriber.transcribe(audio, beam_size=1, language="hi", vad_filter=True)
+    except (TranscriberBusy, TranscriberUnavailable) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": "5"})
+
 
 @app.post("/transcribe")
 async def upload_audio(file: UploadFile = File(...)):
@@ -104,104 +196,119 @@ async def upload_audio(file: UploadFile = File(...)):
     print("Received request for transcription")
 
     try:
-        # Save uploaded file temporarily
-        file_path = f"./temp_{file.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-
-        # Transcribe the audio
-        segments, info = model.transcribe(file_path, beam_size=1, language="hi", vad_filter=True)
-        text = " ".join([s.text for s in segments])
+        # Decode the upload in memory (no temp files) and transcribe the audio
+        audio_bytes = await file.read()
+        text = await transcribe_or_reject(audio_bytes)
 
         print(f"Transcription complete, text = {text}")
 
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        # AI prompt to extract crop data
-        prompt = f"""
-Analyze this text and extract crop information. The text may be in Hindi, English, or mixed languages:
-"{text}"
-
-Common Hindi crop names and their English equivalents:
-- टमाटर, गोलवेदा, गोलभेडा = Tomato
-- आलू = Potato
-- प्याज = Onion
-- गोल वेडा = Round Gourd
-- भिंडी = Okra
-- बैंगन = Brinjal
-- मिर्च = Chili
-- धनिया = Coriander
-- पालक = Spinach
-- गोभी = Cabbage
-- चावल = Rice
-- गेहूं = Wheat
-- मक्का = Corn
-
-Extract the following information and return ONLY a valid JSON object:
-
-{{
-  "crop_name": "English crop name or null",
-  "crop_unit": "unit like per kg,per dozen , per piece, null",
-  "price_per_unit": "price number or null",
-  "quantity": "quantity number or null"
-}}
-
-Look for:
-- Crop names (English)
-- Quantities (numbers with per kilo,per piece, etc.)
-- Prices (numbers with rupees, rs, per kg, per piece, etc.)
-- Units (kg, kilo, per kg, etc.)
-
-Return ONLY the JSON object. No explanations, no markdown, no extra text.
-"""
-
-        # Call AI and get output
-        message = msg(prompt)
-        print("Raw AI output:", message)  # Debug print
-
-
-        # Extract JSON from AI string
-        json_match = re.search(r"\{.*\}", message, re.DOTALL)
-        if not json_match:
-            raise HTTPException(status_code=500, detail="Could not extract JSON from AI output")
-
-        data = json.loads(json_match.group(0))
+        # Extract crop, unit, price and quantity locally; Gemini only fills what the parser missed
+        try:
+            data = await asyncio.to_thread(extract_listing, text)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 
         # Return as proper JSON
         return JSONResponse(content=data)
 
     except Exception as e:
-        # Cleanup temp file if exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
     
 
 
 
+@app.websocket("/transcribe/stream")
+async def stream_audio(websocket: WebSocket):
+    """
+    Streaming voice listing. The client sends binary frames of 16 kHz mono 16-bit PCM and then the
+    text frame "end". Partial transcripts are pushed back as they are decoded, followed by the final
+    text and the extracted listing:
+        {"type": "partial", "text": ..., "segment": ...}
+        {"type": "final", "text": ...}
+        {"type": "listing", "data": {"crop_name": ..., "crop_unit": ..., "price_per_unit": ..., "quantity": ...}}
+        {"type": "error", "status": ..., "detail": ...}
+    """
+    await websocket.accept()
+    print("Streaming transcription session opened")
+
+    session = StreamingTranscription(transcriber, beam_size=1, language="hi", vad_filter=True)
+
+    async def send_partial(text, segment):
+        await websocket.send_json({"type": "partial", "text": text, "segment": segment})
+
+    worker = asyncio.create_task(session.run(send_partial))
+    receiver = None
+    try:
+        while True:
+            # Wait on the socket and the worker together, so a failed transcription is reported
+            # right away instead of after the client's next frame
+            receiver = asyncio.create_task(websocket.receive())
+            await asyncio.wait({receiver, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if not receiver.done():
+                break
+            message = receiver.result()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect()
+            if message.get("bytes"):
+                session.feed(message["bytes"])
+            elif (message.get("text") or "").strip().lower() == "end":
+                session.finish()
+                break
+
+        text = await worker
+        print(f"Streaming transcription complete, text = {text}")
+        await websocket.send_json({"type": "final", "text": text})
+
+        data = await asyncio.to_thread(extract_listing, text)
+        await websocket.send_json({"type": "listing", "data": data})
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        print("Streaming transcription client disconnected")
+    except Exception as e:
+        status = getattr(e, "status_code", 500)
+        await websocket.send_json({"type": "error", "status": status, "detail": str(e)})
+        await websocket.close(code=1013 if status in (429, 503) else 1011)
+    finally:
+        worker.cancel()
+        if receiver is not None:
+            receiver.cancel()
+
+
 @app.get("/Crop_info")
-def crop_info(name):
-    # Get recommendations (returns a pandas DataFrame)
-    
-    recommendations = get_crop_info(name)
-    
-    
-    if not isinstance(recommendations, pd.DataFrame):
-        recommendations = pd.DataFrame(recommendations)
-    
-    
-    recommendations = recommendations.astype(object).where(pd.notnull(recommendations), None)
-    
-    # Convert to list of dicts for JSON response
-    return recommendations.to_dict(orient="records")
+def crop_info(name: str, request: Request):
+    # Hash lookup into the prebuilt catalogue; the body is ready JSON, so repeats can get a 304
+    entry = crop_catalogue.lookup(name)
+    if entry is None:
+        # "tamatar", "टमाटर" or "tomatoe": fall back to the closest confident search hit
+        match = crop_search.best(name)
+        entry = crop_catalogue.lookup(match) if match else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Crop '{name}' not found in either dataset.")
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        crop_catalogue.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/Crop_search")
+def crop_search_endpoint(q: str, limit: int = Query(8, ge=1, le=50)):
+    # Typeahead: prefix, misspelling and Nepali/Hindi name matches, best first
+    return crop_search.search(q, limit)
 
 
 # Disease Detection with AI our own
 
 
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_BATCH_IMAGES = 64
+
+
 @app.post("/disease_detection/")
 async def disease_detection(
     image: UploadFile = File(...),
@@ -215,9 +322,8 @@ async def disease_detection(
         if not image.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Invalid file type. Only images (JPEG, PNG, etc.) are allowed.")
 
-        MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
         image_bytes = await image.read()
-        if len(image_bytes) > MAX_FILE_SIZE:
+        if len(image_bytes) > MAX_IMAGE_SIZE:
             raise HTTPException(status_code=400, detail="Image size exceeds 5MB limit.")
 
         print(f"Image size: {len(image_bytes)} bytes")
@@ -230,16 +336,48 @@ async def disease_detection(
             print(f"Error opening image: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Invalid image format: {str(e)}")
 
-        # Predict disease (assuming synchronous function)
-        try:
-            disease_result = predict_plant_disease_from_image(image_pil)
-            print(f"Prediction result: {disease_result}")
-        except Exception as e:
-            print(f"Error in predict_plant_disease_from_image: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        # Re-uploads and app retries are answered from the cache (exact bytes first, then near-duplicates)
+        cache_key = disease_cache.content_key(image_bytes)
+        disease_result = disease_cache.get(cache_key)
+        exact_hit = disease_result is not None
+        phash = None
+        if not exact_hit:
+            try:
+                phash = await asyncio.to_thread(disease_cache.perceptual_hash, image_bytes)
+                disease_result = disease_cache.get_similar(phash)
+            except Exception as e:
+                print(f"Could not compute perceptual hash: {str(e)}")
+            if disease_result is not None:
+                # A near match is not re-indexed under this image's hash, or matches would chain
+                phash = None
+
+        if disease_result is not None:
+            print(f"Prediction served from cache: {disease_result}")
+        else:
+            # Cached answers above work while the model loads; only a miss needs the model
+            if not disease_registry.ready:
+                raise HTTPException(status_code=503, detail="Disease model is still loading. Please retry shortly.")
+            # Decode fully before queueing, so a truncated or corrupt file is this request's 400
+            # and never reaches a batch shared with other farmers
+            try:
+                image_pil = await asyncio.to_thread(disease_registry.preprocessor.decode, image_pil)
+            except Exception as e:
+                print(f"Error decoding image: {str(e)}")
+                raise HTTPException(status_code=400, detail=f"Invalid image format: {str(e)}")
+
+            # Predict disease on the batching worker so the event loop stays free
+            try:
+                disease_result = await disease_batcher.classify(image_pil)
+                print(f"Prediction result: {disease_result}")
+            except Exception as e:
+                print(f"Error in disease classification: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+        if not exact_hit:
+            disease_cache.set(cache_key, phash, disease_result)
 
         # Clean up disease name
-        disease_result = disease_result.replace("_", " ").replace("___", " ").replace("__", " ")
+        disease_result = clean_disease_name(disease_result)
         print(f"Cleaned disease result: {disease_result}")
 
         # Optionally store or process the result (replace disease_detected if needed)
@@ -253,66 +391,78 @@ async def disease_detection(
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+
+@app.post("/disease_detection/batch/")
+async def disease_detection_batch(
+    images: List[UploadFile] = File(...),
+    top_k: int = Query(3, ge=1, le=len(LABEL_MAP))
+):
+    """
+    Classifies many leaf photos in one batched pass and returns the top-k diseases with confidences for each.
+    """
+    print(f"Received batch disease detection request: {len(images)} images, top_k={top_k}")
+
+    if not disease_registry.ready:
+        raise HTTPException(status_code=503, detail="Disease model is still loading. Please retry shortly.")
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images are allowed per request.")
+
+    # Decode everything first (fully, so truncated files are caught here); bad files get a
+    # per-image error instead of failing the whole batch
+    results = []
+    decoded = []
+    for image in images:
+        result = {"filename": image.filename}
+        results.append(result)
+        if not (image.content_type or "").startswith("image/"):
+            result["error"] = "Invalid file type. Only images (JPEG, PNG, etc.) are allowed."
+            continue
+        image_bytes = await image.read()
+        if len(image_bytes) > MAX_IMAGE_SIZE:
+            result["error"] = "Image size exceeds 5MB limit."
+            continue
+        try:
+            decoded.append((result, await asyncio.to_thread(disease_registry.preprocessor.decode, image_bytes)))
+        except Exception as e:
+            result["error"] = f"Invalid image format: {str(e)}"
+
+    # Through the shared batching worker, in batches of its max size, like single uploads
+    rows = await asyncio.gather(*(disease_batcher.submit(pil) for _, pil in decoded), return_exceptions=True)
+    for (result, _), row in zip(decoded, rows):
+        if isinstance(row, Exception):
+            print(f"Error in disease classification: {str(row)}")
+            result["error"] = f"Prediction failed: {str(row)}"
+            continue
+        predictions = disease_registry.top_k(row.unsqueeze(0), top_k)[0]
+        for prediction in predictions:
+            prediction["disease"] = clean_disease_name(prediction["disease"])
+        result["predictions"] = predictions
+
+    return {"results": results}
+
+
 @app.post("/disease_detection_detailed/")
 async def disease_detection_detailed(request: DiseaseRequest):
     disease_name = request.disease_name
     print(f"Request for details of disease: {disease_name}")
 
     try:
-        search_prompt = (
-            f"{disease_name} This is the disease of a plant detected from an image. "
-"Provide a simple solution for general farmers. "
-"Use trusted sources and keep the output concise. "
-"Return the response in the following JSON structure:\n\n"
-"{\n"
-"  \"Potential_Harms\": \"Description of potential harms\",\n"
-"  \"Solution\": \"Recommended solution for the disease\",\n"
-"  \"Organic_Solutions\": \"Organic solutions for the disease\",\n"
-"  \"Sources\": [\n"
-"    {\"source_name_1\": \"Source_1_url\"},\n"
-"    {\"source_name_2\": \"Source_2_url\"},\n"
-"    {\"source_name_3\": \"Source_3_url\"}\n"
-"  ]\n"
-"}\n\n"
-        )
-
-        solution = grounded_search(search_prompt)
-        print(f"AI response: {solution}")
-
-        json_match = re.search(r"\{.*\}", solution, re.DOTALL)
-        if not json_match:
-            print("AI response does not contain valid JSON")
-            return {
-                "Potential_Harms": "",
-                "Solution": "",
-                "Organic_Solutions": "",
-                "Sources": []
-            }
-
-        data = json.loads(json_match.group(0))
-        print(f"Extracted JSON data: {data}")
+        # Served from the prebuilt knowledge store; the LLM is only asked about missing or stale labels
+        data = await knowledge_store.get(disease_name)
+        print(f"Disease details: {data}")
         return data
 
     except Exception as e:
         print(f"Error processing disease details: {str(e)}")
-        return {
-            "Potential_Harms": "",
-            "Solution": "",
-            "Organic_Solutions": "",
-            "Sources": []
-        }
+        return empty_details()
 
 @app.get("/dashboard/data/")
 
 async def get_dashboard_data(latitude:float, longitude:float):
-    return {
-        "weather": {
-            "temperature": await fetch_weather(latitude, longitude),
-            "rainfall": await fetch_rainfall(latitude, longitude),
-            "soil_ph": await fetch_soil_ph(latitude, longitude),
-            "altitude": await fetch_altitude(latitude, longitude),
-        },
-    }
+    # All four sources are fetched at once and the answer goes out by the deadline;
+    # "status" says per field whether the value is live, a stale cached one, a default or missing
+    return await dashboard.collect(latitude, longitude)
 
 
 @app.post("/weatherforecast")
@@ -334,104 +484,23 @@ async def weather_forecast(input_data: WeatherLocationInput):
 async def upload_audio(file: UploadFile = File(...)):
     print("Received request for routing")
     try:
-        # Save uploaded file temporarily
-        file_path = f"./temp_{file.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-
-        # Transcribe the audio
-        segments, info = model.transcribe(file_path, beam_size=1, language="hi", vad_filter=True)
-        text = " ".join([s.text for s in segments])
+        # Decode the upload in memory (no temp files) and transcribe the audio
+        audio_bytes = await file.read()
+        text = await transcribe_or_reject(audio_bytes)
         print("Transcribed text:", text)  # Debug print
 
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        # AI prompt to extract crop data
-        prompt = f"""Analyze the following user query and determine which page of the website the user wants to navigate to. 
-                The query text may be in Hindi, English, or a mix of both:
-
-                "{text}"
-
-                Available pages, their routes, and functions:
-
-                1) Crop Recommendation 
-                route: "/recommend" 
-                function: Suggests the best crops for the farmer to grow based on their location, soil type, season, weather conditions, and temperature. 
-                Helps farmers make data-driven decisions for higher yield.
-
-                2) Weather Forecast 
-                route: "/weatheralerts" 
-                function: Provides real-time and upcoming weather conditions, temperature, rainfall chances, and extreme weather alerts. 
-                Helps farmers plan irrigation, fertilizer use, and crop protection.
-
-                3) Disease Detection 
-                route: "/disease" 
-                function: Allows farmers to upload crop images for AI-based disease detection. 
-                Identifies plant diseases, pests, or nutrient deficiencies and provides treatment suggestions.
-
-                4) Crop Info 
-                route: "/recommend" 
-                function: Gives detailed information about crops (growth stages, soil requirements, fertilizer use, irrigation needs, harvesting tips). 
-                Helps farmers manage crops effectively after choosing them.
-
-                5) Dashboard 
-                route: "/" 
-                function: Main homepage/dashboard showing an overview of all features, shortcuts, and personalized recommendations.
-
-                6) Alerts 
-                route: "/alerts" 
-                function: Displays map-based crop disease alerts and outbreaks in nearby regions. 
-                Helps farmers take preventive measures before diseases spread.
-
-                7) Explore 
-                route: "/explore" 
-                function: Online marketplace where farmers can sell their crops/vegetables/Fruits directly. 
-                Encourages fair pricing and better market access. 
-
-                8) Tutorial 
-                route: "/tutorial" 
-                function: Provides step-by-step tutorials, guides, and videos for farmers to learn modern agricultural techniques. 
-                Includes best practices for planting, irrigation, pest control, and harvesting. It's a youtube for all the tutorial things. User can watch videos here
-
-                9) Notification 
-                route: "/notifications" 
-                function: Shows all notifications relevant to farmers such as updates about their fields, reminders, weather warnings, and new government policies. 
-                Ensures farmers don’t miss critical information.
-
-                10) Not Found 
-                route: "/404" 
-                function: If the user query does not match any of the above pages, return this page indicating no relevant result.
-
-                Return **ONLY** a valid JSON object in the following format:
-
-                {{
-                "page": "ROUTE_OF_THE_PAGE"
-                }}
-                """
-
-
-
-        # Call AI and get output
-        message = msg(prompt)
-        print("Raw AI output:", message)  # Debug print
-
-
-        # Extract JSON from AI string
-        json_match = re.search(r"\{.*\}", message, re.DOTALL)
-        if not json_match:
-            raise HTTPException(status_code=500, detail="Could not extract JSON from AI output")
-
-        data = json.loads(json_match.group(0))
+        # Local keyword router first; Gemini only for ambiguous queries
+        try:
+            data = await asyncio.to_thread(route_query, text)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 
         # Return as proper JSON
         return JSONResponse(content=data)
 
     except Exception as e:
-        # Cleanup temp file if exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=str(e))
     
\ No newline at end of file
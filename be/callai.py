@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-from dotenv import load_dotenv
+from llmclient import GeminiBackend, LLMClient
 # Load environment variables from .env
 load_dotenv()
 
@@ -13,13 +13,16 @@ if not GEMINI_API_KEY:
 # Configure Gemini API
 genai.configure(api_key=GEMINI_API_KEY)
 
+# One client per process: reused model object, timeouts, concurrency limit and response cache
+client = LLMClient(GeminiBackend(), "gemini-2.5-flash")
+
+
 def msg(prompt: str) -> str:
     """
     Sends a prompt to Gemini API and returns the text response.
+    Blocking; call it from worker threads. Async code uses client.generate() directly.
     """
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    return client.generate_sync(prompt)
 
 
 # text = msg("""
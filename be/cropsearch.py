@@ -0,0 +1,238 @@
+import bisect
+import json
+import os
+import re
+import time
+import unicodedata
+import numpy as np
+from Cropinfo import CROP_ALIASES, crop_catalogue
+
+ALIASES_PATH = os.path.join("Datasets", "crop_aliases.json")
+# Fuzzy candidates re-ranked by edit distance per query, and the trigram overlap (Dice) they need
+FUZZY_CANDIDATES = 8
+MIN_TRIGRAM_DICE = 0.25
+# Weakest fuzzy match still returned, 0..1
+MIN_FUZZY_SCORE = 0.5
+# Shortest query best() resolves from a prefix alone ("to" is too short to mean tomato)
+MIN_PREFIX_LENGTH = 3
+
+
+def normalize_query(text: str) -> str:
+    """
+    Lowercases, folds Latin accents, and smooths common Devanagari spelling variants
+    (nukta, chandrabindu vs anusvara, zero-width joiners) so they index the same.
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not (unicodedata.combining(ch) and ord(ch) < 0x0900))
+    text = text.replace("़", "").replace("ँ", "ं").replace("‌", "").replace("‍", "")
+    text = re.sub(r"[_\-.,]+", " ", unicodedata.normalize("NFC", text))
+    return " ".join(text.split())
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance with adjacent transpositions, computed only in the diagonal band of width
+    `limit`; anything further apart returns limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    before, previous = None, [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        ai = a[i - 1]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            bj = b[j - 1]
+            if ai == bj:
+                value = previous[j - 1]
+            else:
+                value = previous[j - 1] + 1
+                if previous[j] + 1 < value:
+                    value = previous[j] + 1
+                if current[j - 1] + 1 < value:
+                    value = current[j - 1] + 1
+                if i > 1 and j > 1 and ai == b[j - 2] and a[i - 2] == bj and before[j - 2] + 1 < value:
+                    value = before[j - 2] + 1
+            if value < over:
+                current[j] = value
+                if value < row_min:
+                    row_min = value
+        if row_min > limit:
+            return over
+        before, previous = previous, current
+    return previous[-1]
+
+
+class CropSearchIndex:
+    """
+    Typeahead search over crop names and their aliases (English, romanized and Devanagari Nepali/Hindi).
+    Exact and prefix matches come from a sorted key list (bisect); misspellings from a trigram
+    inverted index whose best candidates are re-ranked by edit distance. Results name each crop once.
+    """
+
+    def __init__(self, names: dict):
+        # names: searchable text -> canonical crop name
+        self.keys = []
+        self.crops = []
+        self.exact = {}
+        for text, crop in names.items():
+            key = normalize_query(text)
+            if key and key not in self.exact:
+                self.exact[key] = len(self.keys)
+                self.keys.append(key)
+                self.crops.append(crop)
+        # Keys that are the crop's own (English) name rank above its aliases among prefix hits
+        self.canonical = [key == normalize_query(crop) for key, crop in zip(self.keys, self.crops)]
+        self.sorted_keys = sorted((key, i) for i, key in enumerate(self.keys))
+        self._sorted_text = [key for key, _ in self.sorted_keys]
+
+        postings = {}
+        for i, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = np.array([len(trigrams(key)) for key in self.keys], dtype=np.int32)
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @classmethod
+    def from_catalogue(cls, catalogue=crop_catalogue, aliases_path: str = ALIASES_PATH):
+        names = {name: name for name in catalogue.names()}
+        for alias, crop in CROP_ALIASES.items():
+            names.setdefault(alias, crop)
+        try:
+            with open(aliases_path, encoding="utf-8") as f:
+                for crop, words in json.load(f).items():
+                    for word in words:
+                        names.setdefault(word, crop)
+        except FileNotFoundError:
+            print(f"{aliases_path} not found, searching English names only")
+        return cls(names)
+
+    def _prefix(self, key: str) -> list:
+        # Every key starting with `key`: one contiguous run of the sorted list
+        lo = bisect.bisect_left(self._sorted_text, key)
+        hi = bisect.bisect_left(self._sorted_text, key + "\U0010ffff", lo)
+        return [i for _, i in self.sorted_keys[lo:hi]]
+
+    def _fuzzy(self, key: str) -> list:
+        query_grams = trigrams(key)
+        grams = [gram for gram in query_grams if gram in self.postings]
+        if not grams:
+            return []
+        shared = np.bincount(np.concatenate([self.postings[gram] for gram in grams]), minlength=len(self.keys))
+        # Dice coefficient on trigram sets picks a few candidates; edit distance decides among them
+        dice = 2.0 * shared / (self.gram_counts + len(query_grams))
+        count = min(FUZZY_CANDIDATES, len(dice))
+        best = np.argpartition(-dice, count - 1)[:count]
+        # One typo per three characters, at most three
+        limit = min(3, max(1, len(key) // 3))
+        results = []
+        for i in best[dice[best] >= MIN_TRIGRAM_DICE].tolist():
+            candidate = self.keys[i]
+            # Compare against the candidate's start too, so "tomat" still finds "tomato"
+            target = candidate[:len(key) + 1] if len(candidate) > len(key) + 1 else candidate
+            distance = edit_distance(key, target, limit)
+            if distance > limit:
+                continue
+            score = 0.85 * (1 - distance / max(len(key), len(target))) + 0.15 * float(dice[i])
+            if score >= MIN_FUZZY_SCORE:
+                results.append((score, i))
+        return results
+
+    def search(self, query: str, limit: int = 8) -> list:
+        """
+        Ranked [{"crop", "matched", "match", "score"}, ...], one entry per crop, best first.
+        """
+        started = time.perf_counter()
+        key = normalize_query(query)
+        scored = {}
+
+        def offer(score, i, match):
+            crop = self.crops[i]
+            if crop not in scored or score > scored[crop]["score"]:
+                scored[crop] = {"crop": crop, "matched": self.keys[i], "match": match, "score": round(score, 3)}
+
+        if key:
+            if key in self.exact:
+                offer(1.0, self.exact[key], "exact")
+            # All prefix hits are scored before truncating, so the ranking does not depend on `limit`.
+            # Crop names before aliases ("to": tomato before tori), shorter completions first
+            # ("tomato" before "tomato seedlings")
+            for i in self._prefix(key):
+                offer(0.9 + 0.05 * self.canonical[i] + 0.04 * len(key) / len(self.keys[i]), i, "prefix")
+            if len(key) >= 3 and len(scored) < limit:
+                for score, i in self._fuzzy(key):
+                    offer(min(score, 0.89), i, "fuzzy")
+
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return sorted(scored.values(), key=lambda hit: -hit["score"])[:limit]
+
+    def best(self, query: str, min_score: float = 0.75, min_prefix: int = MIN_PREFIX_LENGTH):
+        """
+        Canonical crop name for the top hit if it is confident enough, else None. A prefix hit counts
+        only for queries of at least `min_prefix` characters, so "a" or "b" never resolve to a crop.
+        """
+        hits = self.search(query, limit=1)
+        if not hits or hits[0]["score"] < min_score:
+            return None
+        if hits[0]["match"] == "prefix" and len(normalize_query(query)) < min_prefix:
+            return None
+        return hits[0]["crop"]
+
+    def stats(self) -> dict:
+        return {
+            "names": len(self.keys),
+            "crops": len(set(self.crops)),
+            "queries": self.queries,
+            "avg_us": round(self.query_seconds / self.queries * 1e6, 1) if self.queries else None,
+        }
+
+
+crop_search = CropSearchIndex.from_catalogue()
+
+
+if __name__ == "__main__":
+    # Query latency as the catalogue grows to 10k names: python cropsearch.py
+    import random
+
+    samples = ["tamatar", "टमाटर", "tomatoe", "tom", "potatos", "आलु", "cauliflwer", "bhindi", "मकै", "gahu", "wheet", "lady fing"]
+    for query in samples:
+        print(f"{query:<12} -> {[(hit['crop'], hit['match'], hit['score']) for hit in crop_search.search(query, 3)]}")
+
+    rng = random.Random(0)
+    syllables = ["ka", "ra", "ma", "to", "pa", "li", "nu", "go", "ba", "che", "sha", "di", "lo", "ve", "tan", "mor"]
+    base = {name: crop for name, crop in zip(crop_search.keys, crop_search.crops)}
+
+    def typo(word):
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice("aeiourtnslm") + word[i + 1:]
+
+    for size in (len(base), 1_000, 10_000):
+        names = dict(base)
+        while len(names) < size:
+            name = " ".join("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 2)))
+            names[name] = name.title()
+        started = time.perf_counter()
+        index = CropSearchIndex(names)
+        build = time.perf_counter() - started
+        keys = list(names)
+        queries = [rng.choice(keys)[:rng.randint(2, 5)] for _ in range(300)]
+        queries += [typo(rng.choice(keys)) for _ in range(300)]
+        queries += samples * 25
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"{len(index.keys):>6} names: p50 {timings[len(timings) // 2] * 1e6:7.1f} us, p99 {timings[int(len(timings) * 0.99)] * 1e6:7.1f} us, built in {build * 1000:.0f} ms")
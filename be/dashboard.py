@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from collections import deque
+from Bestcrop import fetch_weather, fetch_rainfall, _fetch_soil_ph, fetch_altitude
+from geocache import geocache
+
+# The whole response is sent by this deadline with whatever has arrived
+DASHBOARD_DEADLINE = float(os.getenv("DASHBOARD_DEADLINE_SECONDS", "3"))
+
+# field -> (geocache source, fetch, per-source timeout, oldest acceptable stale value in seconds or None, default)
+DASHBOARD_SOURCES = {
+    "temperature": ("weather", fetch_weather, float(os.getenv("DASHBOARD_TIMEOUT_TEMPERATURE", "2")), 6 * 3600, None),
+    "rainfall": ("rainfall", fetch_rainfall, float(os.getenv("DASHBOARD_TIMEOUT_RAINFALL", "2.5")), None, None),
+    "soil_ph": ("soil_ph", _fetch_soil_ph, float(os.getenv("DASHBOARD_TIMEOUT_SOIL_PH", "2")), None, 6.1),
+    "altitude": ("altitude", fetch_altitude, float(os.getenv("DASHBOARD_TIMEOUT_ALTITUDE", "1.5")), None, None),
+}
+
+
+def _retrieve(task):
+    # Late fetches keep running to fill the cache; swallow their errors quietly
+    if not task.cancelled():
+        task.exception()
+
+
+class DashboardFanout:
+    """
+    Fetches every dashboard field concurrently and answers by the deadline, so one slow or failing
+    provider costs at most its timeout instead of failing the whole response. A field that does not
+    arrive in time falls back to its last cached value (marked stale with its age) or a default.
+    Fetches still running at the deadline are left to finish and warm the cache for the next request.
+    """
+
+    def __init__(self, sources: dict = DASHBOARD_SOURCES, deadline: float = DASHBOARD_DEADLINE):
+        self.sources = sources
+        self.deadline = deadline
+        self.requests = 0
+        self.complete = 0
+        self.states = {field: {"ok": 0, "stale": 0, "default": 0, "missing": 0} for field in sources}
+        self.latency = deque(maxlen=500)
+
+    async def _field(self, field: str, task, timeout: float):
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout), None
+        except asyncio.TimeoutError:
+            return None, "timeout"
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    async def collect(self, lat: float, lon: float) -> dict:
+        started = time.perf_counter()
+        tasks = {}
+        for field, (source, fetch, timeout, max_stale, default) in self.sources.items():
+            tasks[field] = asyncio.ensure_future(fetch(lat, lon))
+            tasks[field].add_done_callback(_retrieve)
+
+        results = await asyncio.gather(*(
+            self._field(field, tasks[field], min(self.sources[field][2], self.deadline))
+            for field in self.sources
+        ))
+
+        values, status = {}, {}
+        for field, (value, error) in zip(self.sources, results):
+            source, fetch, timeout, max_stale, default = self.sources[field]
+            if error is None and value is not None:
+                values[field], status[field] = value, {"state": "ok"}
+            else:
+                error = error or "no data"
+                stale = geocache.stale(source, lat, lon)
+                if stale is not None and (max_stale is None or stale[1] <= max_stale):
+                    values[field] = stale[0]
+                    status[field] = {"state": "stale", "age_seconds": round(stale[1]), "error": error}
+                elif default is not None:
+                    values[field], status[field] = default, {"state": "default", "error": error}
+                else:
+                    values[field], status[field] = None, {"state": "missing", "error": error}
+            self.states[field][status[field]["state"]] += 1
+
+        elapsed = time.perf_counter() - started
+        self.requests += 1
+        self.complete += all(s["state"] == "ok" for s in status.values())
+        self.latency.append(elapsed)
+        return {
+            "weather": values,
+            "status": status,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latency)
+        return {
+            "deadline_seconds": self.deadline,
+            "requests": self.requests,
+            "complete": self.complete,
+            "fields": self.states,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 1) if ordered else None,
+        }
+
+
+dashboard = DashboardFanout()
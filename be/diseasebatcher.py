@@ -0,0 +1,188 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from PIL import Image
+from Diseasedetect import registry as disease_registry, DiseaseModelRegistry
+
+
+def _set_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: Exception):
+    if not future.done():
+        future.set_exception(exc)
+
+
+class DiseaseInferenceBatcher:
+    """
+    Dynamic micro-batching in front of the disease classifier.
+    Images submitted within `max_wait_ms` of each other (up to `max_batch_size`) are
+    classified in one forward pass on a dedicated worker thread, so the event loop never
+    blocks on inference. Every caller gets back its own row of probabilities.
+    """
+
+    def __init__(self, registry: DiseaseModelRegistry = disease_registry, max_batch_size: int = None, max_wait_ms: float = None):
+        self.registry = registry
+        self.max_batch_size = max_batch_size or int(os.getenv("DISEASE_MAX_BATCH_SIZE", "16"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("DISEASE_BATCH_WAIT_MS", "10"))
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.isolated_failures = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="disease-batcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    async def submit(self, image: Image.Image):
+        """
+        Queues one image and waits for its softmax probabilities.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.start()
+        self._queue.put((image, future, loop))
+        return await future
+
+    async def classify(self, image: Image.Image) -> str:
+        probabilities = await self.submit(image)
+        return self.registry.label_for_index(probabilities.argmax().item())
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then let the run loop see the stop signal
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._process(self._collect(first))
+
+    def _process(self, batch):
+        try:
+            probabilities = self.registry.predict_probabilities([image for image, _, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _, future, loop = batch[0]
+                loop.call_soon_threadsafe(_set_exception, future, e)
+                return
+            # One unreadable image must not fail everyone batched with it: redo the items one by one
+            self.isolated_failures += 1
+            for item in batch:
+                self._process([item])
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for row, (_, future, loop) in zip(probabilities, batch):
+            loop.call_soon_threadsafe(_set_result, future, row)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "isolated_failures": self.isolated_failures,
+        }
+
+
+# Shared by the /disease_detection/ endpoints
+batcher = DiseaseInferenceBatcher()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _benchmark(batch_size: int, images, requests: int):
+    bench = DiseaseInferenceBatcher(max_batch_size=batch_size, max_wait_ms=5)
+    bench.start()
+
+    async def one(image):
+        started = time.perf_counter()
+        await bench.submit(image)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(images[i % len(images)]) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    bench.stop()
+
+    print(
+        f"batch={batch_size:>2}  throughput={requests / elapsed:7.1f} img/s  "
+        f"p50={_percentile(latencies, 50) * 1000:7.1f} ms  p99={_percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"avg_batch={bench.stats()['avg_batch_size']}"
+    )
+
+
+def _random_init(registry: DiseaseModelRegistry):
+    # The checkpoint's architecture with random weights: same compute per image as the trained model,
+    # for timing where the weights are not available
+    import torch
+    from transformers import AutoConfig, AutoModelForImageClassification
+    from Diseasedetect import ImagePreprocessor, TorchBackend
+
+    config = AutoConfig.from_pretrained(str(registry.checkpoint_path), local_files_only=True)
+    backend = TorchBackend.__new__(TorchBackend)
+    backend.device = torch.device("cpu")
+    backend.model = AutoModelForImageClassification.from_config(config).eval()
+    registry.preprocessor = ImagePreprocessor(registry.checkpoint_path / "preprocessor_config.json")
+    registry.config, registry.backend, registry.device = config, backend, backend.device
+    registry.warmup()
+    registry.ready = True
+
+
+if __name__ == "__main__":
+    # CPU benchmark: python diseasebatcher.py [--random-init]
+    import sys
+    import torch
+
+    torch.set_num_threads(os.cpu_count())
+    test_dir = Path(__file__).parent / "Datasets" / "Test_images"
+    images = [Image.open(path).convert("RGB") for path in sorted(test_dir.glob("*/*"))[:64]]
+    if "--random-init" in sys.argv:
+        _random_init(disease_registry)
+    else:
+        disease_registry.load()
+    print(f"{len(images)} test images, {os.cpu_count()} CPU threads, backend {disease_registry.backend.name}")
+    for size in (1, 4, 8, 16, 32):
+        asyncio.run(_benchmark(size, images, requests=256))
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from Diseasedetect import LABEL_MAP, clean_disease_name
+from searchai import grounded_search_async
+
+KNOWLEDGE_PATH = Path(__file__).parent / "Datasets" / "disease_knowledge.json"
+KNOWLEDGE_MAX_AGE = float(os.getenv("DISEASE_KNOWLEDGE_MAX_AGE", str(30 * 24 * 3600)))
+KNOWLEDGE_REFRESH_INTERVAL = float(os.getenv("DISEASE_KNOWLEDGE_REFRESH_INTERVAL", str(6 * 3600)))
+
+DETAIL_FIELDS = ("Potential_Harms", "Solution", "Organic_Solutions", "Sources")
+
+
+def empty_details() -> dict:
+    return {
+        "Potential_Harms": "",
+        "Solution": "",
+        "Organic_Solutions": "",
+        "Sources": []
+    }
+
+
+def details_prompt(disease_name: str) -> str:
+    return (
+        f"{disease_name} This is the disease of a plant detected from an image. "
+        "Provide a simple solution for general farmers. "
+        "Use trusted sources and keep the output concise. "
+        "Return the response in the following JSON structure:\n\n"
+        "{\n"
+        "  \"Potential_Harms\": \"Description of potential harms\",\n"
+        "  \"Solution\": \"Recommended solution for the disease\",\n"
+        "  \"Organic_Solutions\": \"Organic solutions for the disease\",\n"
+        "  \"Sources\": [\n"
+        "    {\"source_name_1\": \"Source_1_url\"},\n"
+        "    {\"source_name_2\": \"Source_2_url\"},\n"
+        "    {\"source_name_3\": \"Source_3_url\"}\n"
+        "  ]\n"
+        "}\n\n"
+    )
+
+
+async def fetch_details(disease_name: str, use_cache: bool = True):
+    """
+    Asks the LLM about a disease. Returns the parsed details, or None if the reply had no usable JSON.
+    """
+    solution = await grounded_search_async(details_prompt(disease_name), use_cache=use_cache)
+    print(f"AI response: {solution}")
+
+    json_match = re.search(r"\{.*\}", solution, re.DOTALL)
+    if not json_match:
+        print("AI response does not contain valid JSON")
+        return None
+
+    data = json.loads(json_match.group(0))
+    if not data.get("Solution"):
+        return None
+    return data
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.replace("_", " ").lower().split())
+
+
+class DiseaseKnowledgeStore:
+    """
+    Details for the classifier's labels, persisted as JSON and served from memory.
+    The live LLM is only asked about labels that are missing or older than `max_age`;
+    refresh_loop() keeps entries fresh in the background.
+    """
+
+    def __init__(self, path: Path = KNOWLEDGE_PATH, max_age: float = KNOWLEDGE_MAX_AGE):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.entries = {}
+        # Both the raw label and the cleaned name the frontend sends map to the label
+        self.labels = {}
+        for label in LABEL_MAP.values():
+            self.labels[normalize_name(label)] = label
+            self.labels[normalize_name(clean_disease_name(label))] = label
+        self._locks = {}
+        # One save at a time, each writing a snapshot taken after the previous save finished
+        self._save_lock = asyncio.Lock()
+        self.hits = 0
+        self.live_fetches = 0
+        self.refreshes = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+            print(f"Loaded disease knowledge for {len(self.entries)} labels")
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            print(f"Could not read {self.path}: {str(e)}")
+            self.entries = {}
+
+    def save(self, entries: dict = None):
+        """
+        Writes `entries` (default: the current entries) atomically. Runs in a worker thread, so callers
+        on the event loop pass a snapshot rather than the dict other refreshes keep changing.
+        """
+        entries = self.entries if entries is None else entries
+        # Per-process temp file, so the app and an offline build never write the same one
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def label_for(self, disease_name: str):
+        return self.labels.get(normalize_name(disease_name))
+
+    def is_fresh(self, label: str) -> bool:
+        entry = self.entries.get(label)
+        return entry is not None and time.time() - entry.get("updated_at", 0) < self.max_age
+
+    async def refresh(self, label: str, force: bool = False) -> bool:
+        """
+        Fetches one label from the LLM and persists it. Returns False if the LLM gave nothing usable.
+        Concurrent callers for the same label share one fetch. `force` also bypasses the LLM client's
+        response cache.
+        """
+        lock = self._locks.setdefault(label, asyncio.Lock())
+        async with lock:
+            if not force and self.is_fresh(label):
+                return True
+            details = await fetch_details(clean_disease_name(label), use_cache=not force)
+            if details is None:
+                return False
+            entry = {field: details.get(field, [] if field == "Sources" else "") for field in DETAIL_FIELDS}
+            entry["updated_at"] = time.time()
+            self.entries[label] = entry
+            async with self._save_lock:
+                await asyncio.to_thread(self.save, dict(self.entries))
+            return True
+
+    async def get(self, disease_name: str) -> dict:
+        label = self.label_for(disease_name)
+        if label is None:
+            # Not one of our classes (free text from a client): ask the LLM, don't store
+            self.live_fetches += 1
+            return await fetch_details(disease_name) or empty_details()
+
+        if self.is_fresh(label):
+            self.hits += 1
+        else:
+            self.live_fetches += 1
+            try:
+                await self.refresh(label)
+            except Exception as e:
+                print(f"Error refreshing disease details for {label}: {str(e)}")
+
+        entry = self.entries.get(label)
+        if entry is None:
+            return empty_details()
+        # A stale entry still beats an empty answer when the LLM is unavailable
+        defaults = empty_details()
+        return {field: entry.get(field, defaults[field]) for field in DETAIL_FIELDS}
+
+    async def refresh_loop(self, interval: float = KNOWLEDGE_REFRESH_INTERVAL):
+        """
+        Background task: re-fetches missing or stale labels every `interval` seconds.
+        """
+        while True:
+            for label in LABEL_MAP.values():
+                if not self.is_fresh(label):
+                    try:
+                        if await self.refresh(label):
+                            self.refreshes += 1
+                    except Exception as e:
+                        print(f"Background refresh failed for {label}: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {
+            "labels": len(LABEL_MAP),
+            "stored": len(self.entries),
+            "fresh": sum(self.is_fresh(label) for label in LABEL_MAP.values()),
+            "hits": self.hits,
+            "live_fetches": self.live_fetches,
+            "background_refreshes": self.refreshes,
+        }
+
+
+knowledge_store = DiseaseKnowledgeStore()
+
+
+async def build(force: bool = False):
+    store = DiseaseKnowledgeStore()
+    for label in LABEL_MAP.values():
+        if force or not store.is_fresh(label):
+            ok = await store.refresh(label, force=force)
+            print(f"{'ok    ' if ok else 'FAILED'} {label}")
+    print(f"{len(store.entries)}/{len(LABEL_MAP)} labels stored in {store.path}")
+
+
+if __name__ == "__main__":
+    # Prebuild the store offline: python diseaseinfo.py [--force]
+    import sys
+
+    asyncio.run(build(force="--force" in sys.argv))
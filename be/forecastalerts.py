@@ -0,0 +1,436 @@
+import functools
+import json
+import operator
+import os
+import string
+import time
+import numpy as np
+from cache import TTLCache
+from geocache import tile_of, tile_center
+from httpclients import http_clients
+from singleflight import flights
+
+# Module constant so benchmarks can point it at a local stub
+WEATHER_API_URL = "https://api.weatherapi.com/v1"
+
+# Forecasts are fetched for the centre of a tile this many degrees wide (0.05 ~ 5.5 km)
+FORECAST_TILE_DEGREES = float(os.getenv("FORECAST_TILE_DEGREES", "0.05"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "5000"))
+# weatherapi refreshes its model about every 15 minutes; a cached forecast lives until the next refresh
+FORECAST_UPDATE_SECONDS = float(os.getenv("FORECAST_UPDATE_SECONDS", "900"))
+FORECAST_MIN_TTL = float(os.getenv("FORECAST_MIN_TTL", "60"))
+# Optional JSON file with a rule list in the ALERT_RULES format, replacing the built-in rules
+ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "")
+
+NO_ALERTS = "No significant weather threats detected."
+
+# Columns each rule scope can test and quote in its message; "condition" is the lowercased text
+DAY_COLUMNS = ("date", "precip", "max_temp", "condition", "code")
+HOUR_COLUMNS = ("time", "precip", "temp", "condition", "code")
+
+# Evaluated in this order for every day: the day rules, then each hour's rules in hour order
+ALERT_RULES = [
+    {
+        "name": "heavy_rain",
+        "scope": "day",
+        "all": [["precip", ">", 20]],
+        "message": "Alert for {date}: Heavy rain expected ({precip} mm). Take precautions for flooding.",
+    },
+    {
+        "name": "dry_heat",
+        "scope": "day",
+        "all": [["precip", "<", 1], ["max_temp", ">", 30]],
+        "unless": "heavy_rain",
+        "message": "Alert for {date}: Dry and hot conditions (Precip: {precip} mm, Temp: {max_temp}°C). Monitor irrigation.",
+    },
+    {
+        "name": "hail",
+        "scope": "day",
+        "any": [["condition", "contains", "hail"], ["code", "in", [1246, 1264, 1276]]],
+        "message": "Alert for {date}: Possible hail ({condition}). Protect crops with covers.",
+    },
+    {
+        "name": "sudden_heavy_rain",
+        "scope": "hour",
+        "all": [["precip", ">", 10]],
+        "message": "Alert for {time}: Sudden heavy rain expected ({precip} mm).",
+    },
+    {
+        "name": "thunderstorm",
+        "scope": "hour",
+        "all": [["condition", "contains", "thunderstorm"]],
+        "message": "Alert for {time}: Thunderstorm possible. Secure outdoor equipment.",
+    },
+]
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Condition texts are interned process-wide so every frame shares one id space; the ids are keyed
+# by the text as received and name its lowercased form
+_condition_ids = {}
+_condition_texts = []
+
+
+def _condition_column(texts: list) -> np.ndarray:
+    for text in set(texts).difference(_condition_ids):
+        lowered = text.lower()
+        if lowered not in _condition_texts:
+            _condition_texts.append(lowered)
+        _condition_ids[text] = _condition_texts.index(lowered)
+    return np.fromiter(map(_condition_ids.__getitem__, texts), dtype=np.int32, count=len(texts))
+
+
+@functools.lru_cache(maxsize=256)
+def _template(message: str) -> tuple:
+    """
+    (format, fields): the message with its {column} fields made positional, and the column names in order.
+    """
+    parts, fields = [], []
+    for literal, field, spec, conversion in string.Formatter().parse(message):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            parts.append("{%d%s%s}" % (len(fields), "!" + conversion if conversion else "", ":" + spec if spec else ""))
+            fields.append(field)
+    return "".join(parts).format, tuple(fields)
+
+
+def validate_rules(rules: list) -> list:
+    names = set()
+    for position, rule in enumerate(rules):
+        if not isinstance(rule, dict) or not rule.get("name"):
+            raise ValueError(f"Alert rule #{position}: every rule needs a 'name'")
+        if rule["name"] in names:
+            raise ValueError(f"Alert rule {rule['name']!r}: name is used by an earlier rule")
+        if not isinstance(rule.get("message"), str):
+            raise ValueError(f"Alert rule {rule['name']!r}: 'message' must be a string")
+        columns = DAY_COLUMNS if rule.get("scope") == "day" else HOUR_COLUMNS if rule.get("scope") == "hour" else None
+        if columns is None:
+            raise ValueError(f"Alert rule {rule['name']!r}: scope must be 'day' or 'hour'")
+        for column, op, value in rule.get("all", []) + rule.get("any", []):
+            if column not in columns:
+                raise ValueError(f"Alert rule {rule['name']!r}: unknown {rule['scope']} column {column!r}")
+            if op not in OPERATORS and op not in ("contains", "in"):
+                raise ValueError(f"Alert rule {rule['name']!r}: unknown operator {op!r}")
+            if (column == "condition") != (op == "contains") or column in ("date", "time"):
+                raise ValueError(f"Alert rule {rule['name']!r}: 'contains' tests the condition text; other operators compare numbers")
+        fields = set(_template(rule["message"])[1])
+        if not fields <= set(columns):
+            raise ValueError(f"Alert rule {rule['name']!r}: message uses unknown columns {sorted(fields - set(columns))}")
+        if rule.get("unless") and rule["unless"] not in names:
+            raise ValueError(f"Alert rule {rule['name']!r}: 'unless' must name an earlier rule")
+        names.add(rule["name"])
+    return rules
+
+
+def load_rules(path: str = ALERT_RULES_PATH) -> list:
+    if not path:
+        return ALERT_RULES
+    with open(path, encoding="utf-8") as f:
+        return validate_rules(json.load(f))
+
+
+class ForecastFrame:
+    """
+    One or more weatherapi forecasts flattened into columns: a row per forecast day and a row per
+    hour, with `day` linking each hour to its day row and `location` each day to its forecast.
+    `values` keeps the JSON values exactly as received, which alert messages quote; `arrays` holds
+    the same columns as NumPy arrays (conditions as interned ids) for the rule thresholds.
+    """
+
+    def __init__(self, days: dict, hours: dict, locations: int = 1, updated: float = None):
+        self.values, self.arrays = {}, {}
+        for scope, table in (("day", days), ("hour", hours)):
+            arrays = {name: np.array(table[name], dtype=np.float64) for name in ("precip", "max_temp", "temp") if name in table}
+            arrays["code"] = np.array(table["code"], dtype=np.int32)
+            arrays["condition"] = _condition_column(table["condition"])
+            link = "location" if scope == "day" else "day"
+            arrays[link] = np.array(table[link], dtype=np.int32)
+            texts = np.array(_condition_texts, dtype=object)
+            self.values[scope] = {name: np.array(column, dtype=object) for name, column in table.items() if name not in ("condition", link)}
+            self.values[scope]["condition"] = texts[arrays["condition"]]
+            self.arrays[scope] = arrays
+        self.locations = locations
+        self.updated = updated
+
+    @classmethod
+    def from_payload(cls, data: dict):
+        forecast_days = data["forecast"]["forecastday"]
+        days = {
+            "date": [day["date"] for day in forecast_days],
+            "precip": [day["day"]["totalprecip_mm"] for day in forecast_days],
+            "max_temp": [day["day"]["maxtemp_c"] for day in forecast_days],
+            "condition": [day["day"]["condition"]["text"] for day in forecast_days],
+            "code": [day["day"]["condition"]["code"] for day in forecast_days],
+            "location": [0] * len(forecast_days),
+        }
+        # One pass over the hours, then transposed into columns
+        rows = [
+            (hour["time"], hour["precip_mm"], hour["temp_c"], hour["condition"]["text"], hour["condition"]["code"], d)
+            for d, day in enumerate(forecast_days) for hour in day["hour"]
+        ]
+        columns = zip(*rows) if rows else [()] * 6
+        hours = dict(zip(("time", "precip", "temp", "condition", "code", "day"), columns))
+        return cls(days, hours, 1, data.get("current", {}).get("last_updated_epoch"))
+
+    @classmethod
+    def concat(cls, frames: list):
+        """
+        Stacks forecasts so one evaluate() call covers all of them; location i is frames[i].
+        """
+        frame = cls.__new__(cls)
+        frame.values, frame.arrays = {}, {}
+        day_offsets = np.cumsum([0] + [len(f.values["day"]["date"]) for f in frames])
+        location_offsets = np.cumsum([0] + [f.locations for f in frames])
+        for scope in ("day", "hour"):
+            frame.values[scope] = {name: np.concatenate([f.values[scope][name] for f in frames]) for name in frames[0].values[scope]}
+            frame.arrays[scope] = {
+                name: np.concatenate([f.arrays[scope][name] for f in frames]) for name in frames[0].arrays[scope]
+            }
+        # Re-point the link columns at the stacked rows
+        frame.arrays["day"]["location"] = np.concatenate([f.arrays["day"]["location"] + o for f, o in zip(frames, location_offsets)]).astype(np.int32)
+        frame.arrays["hour"]["day"] = np.concatenate([f.arrays["hour"]["day"] + o for f, o in zip(frames, day_offsets)]).astype(np.int32)
+        frame.locations = int(location_offsets[-1])
+        frame.updated = min((f.updated for f in frames if f.updated is not None), default=None)
+        return frame
+
+
+# needle -> which interned condition texts contain it, extended as new texts are interned
+_needle_matches = {}
+
+
+def _condition_mask(column: np.ndarray, needle: str) -> np.ndarray:
+    # Substring test once per distinct condition text, then a gather over the rows
+    matches = _needle_matches.get(needle)
+    if matches is None or len(matches) < len(_condition_texts):
+        matches = np.fromiter((needle in text for text in _condition_texts), dtype=bool, count=len(_condition_texts))
+        _needle_matches[needle] = matches
+    return matches[column]
+
+
+def _rule_mask(arrays: dict, rule: dict, fired: dict) -> np.ndarray:
+    rows = len(arrays["code"])
+
+    def test(column, op, value):
+        if op == "contains":
+            return _condition_mask(arrays[column], str(value).lower())
+        if op == "in":
+            # A handful of codes: equality per code beats np.isin's sort on forecast-sized columns
+            found = np.zeros(rows, dtype=bool)
+            for item in value:
+                found |= arrays[column] == item
+            return found
+        return OPERATORS[op](arrays[column], value)
+
+    tests = [test(*condition) for condition in rule.get("all", [])]
+    if rule.get("any"):
+        tests.append(np.logical_or.reduce([test(*condition) for condition in rule["any"]]))
+    if rule.get("unless"):
+        tests.append(~fired[rule["unless"]])
+    if not tests:
+        return np.ones(rows, dtype=bool)
+    mask = tests[0]
+    for other in tests[1:]:
+        mask = mask & other
+    return mask
+
+
+def evaluate(frame: ForecastFrame, rules: list = None) -> list:
+    """
+    Alert messages per location in the frame, [[message, ...], ...], in the order the rules fire:
+    day by day, the day rules first and then the hours. Locations without alerts get NO_ALERTS.
+    """
+    rules = ALERT_RULES if rules is None else rules
+    hour_days = frame.arrays["hour"]["day"]
+    fired, hits, messages = {}, [], []
+    for order, rule in enumerate(rules):
+        mask = fired[rule["name"]] = _rule_mask(frame.arrays[rule["scope"]], rule, fired)
+        hit = mask.nonzero()[0]
+        if not len(hit):
+            continue
+        hits.append((order, rule["scope"], hit))
+        # Only the fired rows are formatted, a rule at a time
+        format_message, fields = _template(rule["message"])
+        values = frame.values[rule["scope"]]
+        messages += map(format_message, *(values[name][hit] for name in fields)) if fields else [rule["message"]] * len(hit)
+
+    if not messages:
+        return [[NO_ALERTS] for _ in range(frame.locations)]
+
+    if frame.locations == 1:
+        # One forecast (the /weatherforecast path): a single integer key per alert orders day, slot and
+        # rule at once, cheaper than setting up lexsort for a few dozen rows
+        slots, rule_count = len(hour_days) + 1, len(rules)
+        keys = np.concatenate([
+            ((hit if scope == "day" else hour_days[hit]) * slots + (0 if scope == "day" else hit + 1)) * rule_count + order
+            for order, scope, hit in hits
+        ])
+        return [[messages[i] for i in keys.argsort(kind="stable").tolist()]]
+
+    days = np.concatenate([hit if scope == "day" else hour_days[hit] for _, scope, hit in hits])
+    slots = np.concatenate([np.full(len(hit), -1) if scope == "day" else hit for _, scope, hit in hits])
+    orders = np.concatenate([np.full(len(hit), order) for order, _, hit in hits])
+    # Day first, then day rules before hours (slot -1) and hours in order, then rule order
+    ranking = np.lexsort((orders, slots, days))
+    ordered = [messages[i] for i in ranking.tolist()]
+    # Days are stored location by location, so each location's alerts are one contiguous run
+    ends = np.cumsum(np.bincount(frame.arrays["day"]["location"][days], minlength=frame.locations)).tolist()
+    return [ordered[start:end] or [NO_ALERTS] for start, end in zip([0] + ends, ends)]
+
+
+async def fetch_forecast(lat: float, lon: float, days: int = 3) -> dict:
+    weather_api_key = os.getenv("weather_api_key")
+    url = f"{WEATHER_API_URL}/forecast.json?key={weather_api_key}&q={lat},{lon}&days={days}"
+    resp = await http_clients.get("weatherapi", url)
+    data = resp.json()
+    if "error" in data:
+        raise ValueError(data["error"]["message"])
+    return data
+
+
+class ForecastCache:
+    """
+    Parsed forecasts per (tile, days). An entry expires when weatherapi is due to publish its next
+    update (last_updated_epoch + FORECAST_UPDATE_SECONDS), never sooner than FORECAST_MIN_TTL;
+    concurrent misses for the same tile share one upstream call.
+    """
+
+    def __init__(self, tile_degrees: float = FORECAST_TILE_DEGREES, maxsize: int = FORECAST_CACHE_SIZE,
+                 update_seconds: float = FORECAST_UPDATE_SECONDS, rules: list = None):
+        self.tile_degrees = tile_degrees
+        self.update_seconds = update_seconds
+        self.rules = load_rules() if rules is None else rules
+        self._cache = TTLCache(maxsize=maxsize, ttl=update_seconds)
+        self.upstream_calls = 0
+
+    def _ttl(self, frame: ForecastFrame) -> float:
+        if frame.updated is None:
+            return self.update_seconds
+        remaining = frame.updated + self.update_seconds - time.time()
+        return min(max(remaining, FORECAST_MIN_TTL), self.update_seconds)
+
+    async def _load(self, tile: tuple, days: int) -> tuple:
+        lat, lon = tile_center(tile, self.tile_degrees)
+        frame = ForecastFrame.from_payload(await fetch_forecast(lat, lon, days))
+        self.upstream_calls += 1
+        # The alerts only change with the forecast, so they are worked out once per entry
+        entry = (frame, evaluate(frame, self.rules)[0])
+        self._cache.set((tile, days), entry, self._ttl(frame))
+        return entry
+
+    async def _entry(self, lat: float, lon: float, days: int) -> tuple:
+        tile = tile_of(lat, lon, self.tile_degrees)
+        entry = self._cache.get((tile, days))
+        if entry is None:
+            entry = await flights.do(("weatherapi_forecast", tile, days), self._load, tile, days)
+        return entry
+
+    async def frame(self, lat: float, lon: float, days: int = 3) -> ForecastFrame:
+        return (await self._entry(lat, lon, days))[0]
+
+    async def alerts(self, lat: float, lon: float, days: int = 3) -> list:
+        return list((await self._entry(lat, lon, days))[1])
+
+    def stats(self) -> dict:
+        return {
+            "tile_degrees": self.tile_degrees,
+            "upstream_calls": self.upstream_calls,
+            "rules": [rule["name"] for rule in self.rules],
+            **self._cache.stats(),
+        }
+
+
+forecast_cache = ForecastCache()
+
+
+if __name__ == "__main__":
+    # Nested-loop analyzer vs the columnar one on 14-day forecasts: python forecastalerts.py [locations]
+    import asyncio
+    import random
+    import sys
+    from stubserver import StubServer, forecast_payload
+
+    locations = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    def nested_loops(forecast_data):
+        # The analyzer as it was in weatherforecast.py
+        alerts = []
+        for day in forecast_data["forecast"]["forecastday"]:
+            date = day["date"]
+            day_data = day["day"]
+            max_temp = day_data["maxtemp_c"]
+            total_precip = day_data["totalprecip_mm"]
+            condition_text = day_data["condition"]["text"].lower()
+            condition_code = day_data["condition"]["code"]
+            if total_precip > 20:
+                alerts.append(f"Alert for {date}: Heavy rain expected ({total_precip} mm). Take precautions for flooding.")
+            elif total_precip < 1 and max_temp > 30:
+                alerts.append(f"Alert for {date}: Dry and hot conditions (Precip: {total_precip} mm, Temp: {max_temp}°C). Monitor irrigation.")
+            if "hail" in condition_text or condition_code in [1246, 1264, 1276]:
+                alerts.append(f"Alert for {date}: Possible hail ({condition_text}). Protect crops with covers.")
+            for hour in day["hour"]:
+                hour_time = hour["time"]
+                hour_precip = hour["precip_mm"]
+                hour_condition = hour["condition"]["text"].lower()
+                if hour_precip > 10:
+                    alerts.append(f"Alert for {hour_time}: Sudden heavy rain expected ({hour_precip} mm).")
+                if "thunderstorm" in hour_condition:
+                    alerts.append(f"Alert for {hour_time}: Thunderstorm possible. Secure outdoor equipment.")
+        return alerts if alerts else ["No significant weather threats detected."]
+
+    # Stub forecasts with some thunderstorm/hail texts and integer amounts mixed in
+    rng = random.Random(0)
+    extra = [(1087, "Thunderstorm nearby"), (1276, "Moderate or heavy rain with thunder"), (1237, "Light HAIL showers")]
+    payloads = []
+    for i in range(locations):
+        payload = forecast_payload(27.0 + i * 0.01, 84.0 + i * 0.01, 14)
+        for day in payload["forecast"]["forecastday"]:
+            if rng.random() < 0.2:
+                day["day"]["condition"] = dict(zip(("code", "text"), rng.choice(extra)))
+            if rng.random() < 0.1:
+                day["day"]["totalprecip_mm"] = rng.choice([0, 25])
+            for hour in day["hour"]:
+                if rng.random() < 0.02:
+                    hour["condition"] = dict(zip(("code", "text"), rng.choice(extra)))
+                    hour["precip_mm"] = 12
+        payloads.append(payload)
+
+    frames = [ForecastFrame.from_payload(payload) for payload in payloads]
+    expected = [nested_loops(payload) for payload in payloads]
+    assert [evaluate(frame)[0] for frame in frames] == expected
+    assert evaluate(ForecastFrame.concat(frames)) == expected
+    print(f"{locations} 14-day forecasts, {sum(len(a) for a in expected)} alerts, identical output")
+
+    def timed(fn, repeat=3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - started) / repeat / locations * 1e6
+
+    print(f"  nested loops             : {timed(lambda: [nested_loops(p) for p in payloads]):8.1f} us/location")
+    print(f"  parse + evaluate         : {timed(lambda: [evaluate(ForecastFrame.from_payload(p)) for p in payloads]):8.1f} us/location")
+    print(f"  evaluate (cached frame)  : {timed(lambda: [evaluate(f) for f in frames]):8.1f} us/location")
+    stacked = ForecastFrame.concat(frames)
+    print(f"  evaluate, one stacked pass: {timed(lambda: evaluate(stacked)):7.1f} us/location")
+
+    async def main():
+        with StubServer(latency=0.05) as stub:
+            stub.point(sys.modules[__name__])
+            cache = ForecastCache()
+            # 20 farmers per forecast tile asking at once, then again
+            farms = [(27.0 + (i // 20) * 0.05 + (i % 20) * 0.001, 84.0 + (i % 20) * 0.001) for i in range(locations)]
+            for label in ("cold", "warm"):
+                started = time.perf_counter()
+                await asyncio.gather(*(cache.alerts(lat, lon, 14) for lat, lon in farms))
+                elapsed = time.perf_counter() - started
+                print(f"  {label} cache: {len(farms)} farmers in {elapsed * 1000:7.1f} ms, {stub.requests} upstream requests so far")
+            await http_clients.close()
+            print(cache.stats())
+
+    asyncio.run(main())
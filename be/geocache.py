@@ -0,0 +1,231 @@
+import functools
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from cache import TTLCache
+
+# Tile edge in degrees; 0.01 is about 1.1 km north-south. Every point in a tile shares one value.
+GEO_TILE_DEGREES = float(os.getenv("GEO_TILE_DEGREES", "0.01"))
+GEOCACHE_SIZE = int(os.getenv("GEOCACHE_SIZE", "20000"))
+# Optional SQLite file so cached values survive restarts; empty disables the persistent tier
+GEOCACHE_DB = os.getenv("GEOCACHE_DB", "")
+# How long a value stays available as a stale fallback after it expires
+GEOCACHE_STALE_TTL = float(os.getenv("GEOCACHE_STALE_TTL", str(7 * 24 * 3600)))
+
+DAY = 24 * 3600
+SOURCE_TTLS = {
+    "altitude": float(os.getenv("GEOCACHE_TTL_ALTITUDE", str(60 * DAY))),
+    "soil_ph": float(os.getenv("GEOCACHE_TTL_SOIL_PH", str(30 * DAY))),
+    "rainfall": float(os.getenv("GEOCACHE_TTL_RAINFALL", str(DAY))),
+    "weather": float(os.getenv("GEOCACHE_TTL_WEATHER", str(10 * 60))),
+}
+
+
+def tile_of(lat: float, lon: float, size: float = GEO_TILE_DEGREES) -> tuple:
+    return (math.floor(float(lat) / size), math.floor(float(lon) / size))
+
+
+def tile_center(tile: tuple, size: float = GEO_TILE_DEGREES) -> tuple:
+    # Rounded so the same tile always produces the same upstream URL
+    return (round((tile[0] + 0.5) * size, 6), round((tile[1] + 0.5) * size, 6))
+
+
+class SqliteTier:
+    """
+    Persistent second tier: one row per (source, tile) holding the JSON value and its expiry
+    in wall-clock seconds. Expired rows are kept until overwritten so callers can still fall back to them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocache ("
+            "source TEXT, tile_lat INTEGER, tile_lon INTEGER, tile_size REAL, value TEXT, expires_at REAL, "
+            "PRIMARY KEY (source, tile_lat, tile_lon, tile_size))"
+        )
+
+    def get(self, source: str, tile: tuple, size: float, include_expired: bool = False):
+        """
+        Returns (value, expires_at) or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM geocache WHERE source=? AND tile_lat=? AND tile_lon=? AND tile_size=?",
+                (source, tile[0], tile[1], size),
+            ).fetchone()
+        if row is None or (not include_expired and row[1] <= time.time()):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, source: str, tile: tuple, size: float, value, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocache VALUES (?, ?, ?, ?, ?, ?)",
+                (source, tile[0], tile[1], size, json.dumps(value), expires_at),
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GeoCache:
+    """
+    Caches per-location upstream values by map tile, with a TTL per data source.
+    Lookups go to the in-process LRU first, then to the optional SQLite tier, then upstream.
+    """
+
+    def __init__(self, tile_degrees: float = GEO_TILE_DEGREES, maxsize: int = GEOCACHE_SIZE, db_path: str = GEOCACHE_DB, ttls: dict = None):
+        self.tile_degrees = tile_degrees
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.memory = TTLCache(maxsize, max(self.ttls.values()))
+        # (value, stored_at) per tile, outliving the TTL so callers can fall back to it
+        self.last_known = TTLCache(maxsize, GEOCACHE_STALE_TTL)
+        self.persistent = SqliteTier(db_path) if db_path else None
+        self.counters = {}  # source -> {"memory_hits", "persistent_hits", "misses"}
+
+    def _count(self, source: str, field: str):
+        counters = self.counters.setdefault(source, {"memory_hits": 0, "persistent_hits": 0, "misses": 0})
+        counters[field] += 1
+
+    def get(self, source: str, lat: float, lon: float, default=None):
+        tile = tile_of(lat, lon, self.tile_degrees)
+        value = self.memory.get((source, tile))
+        if value is not None:
+            self._count(source, "memory_hits")
+            return value
+        if self.persistent is not None:
+            found = self.persistent.get(source, tile, self.tile_degrees)
+            if found is not None:
+                value, expires_at = found
+                # Promote into memory for whatever is left of its lifetime
+                self.memory.set((source, tile), value, ttl=expires_at - time.time())
+                self._count(source, "persistent_hits")
+                return value
+        self._count(source, "misses")
+        return default
+
+    def set(self, source: str, lat: float, lon: float, value):
+        tile = tile_of(lat, lon, self.tile_degrees)
+        ttl = self.ttls[source]
+        self.memory.set((source, tile), value, ttl=ttl)
+        self.last_known.set((source, tile), (value, time.time()), ttl=ttl + GEOCACHE_STALE_TTL)
+        if self.persistent is not None:
+            self.persistent.set(source, tile, self.tile_degrees, value, time.time() + ttl)
+
+    def stale(self, source: str, lat: float, lon: float):
+        """
+        Last value stored for the tile even if its TTL has passed, as (value, age_seconds), or None.
+        """
+        tile = tile_of(lat, lon, self.tile_degrees)
+        found = self.last_known.get((source, tile))
+        if found is not None:
+            value, stored_at = found
+            return value, time.time() - stored_at
+        if self.persistent is not None:
+            found = self.persistent.get(source, tile, self.tile_degrees, include_expired=True)
+            if found is not None:
+                value, expires_at = found
+                return value, time.time() - (expires_at - self.ttls[source])
+        return None
+
+    def cached(self, source: str):
+        """
+        Decorator for async fetch(lat, lon): answers from the cache when the tile has a live value,
+        otherwise calls the fetch for the tile's center and stores the result. Exceptions are not cached.
+        """
+        def wrap(fn):
+            @functools.wraps(fn)
+            async def wrapper(lat, lon):
+                value = self.get(source, lat, lon)
+                if value is not None:
+                    return value
+                center_lat, center_lon = tile_center(tile_of(lat, lon, self.tile_degrees), self.tile_degrees)
+                value = await fn(center_lat, center_lon)
+                if value is not None:
+                    self.set(source, lat, lon, value)
+                return value
+
+            return wrapper
+
+        return wrap
+
+    def close(self):
+        if self.persistent is not None:
+            self.persistent.close()
+
+    def stats(self) -> dict:
+        return {
+            "tile_degrees": self.tile_degrees,
+            "ttls": self.ttls,
+            "memory": self.memory.stats(),
+            "persistent_rows": self.persistent.count() if self.persistent is not None else None,
+            "sources": {source: dict(counters) for source, counters in self.counters.items()},
+        }
+
+
+# Shared by every upstream fetch in this process
+geocache = GeoCache()
+
+
+if __name__ == "__main__":
+    # Compare uncached and cached location lookups against a local stub server:
+    #   python geocache.py [requests] [stub latency ms]
+    import asyncio
+    import random
+    import sys
+    import tempfile
+    import Bestcrop
+    import rainstore
+    from stubserver import StubServer
+
+    requests_count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+
+    async def main():
+        with StubServer(latency=latency) as stub:
+            stub.point(Bestcrop, rainstore)
+            cache = Bestcrop.geocache  # the instance the fetches are wrapped with
+            # A district's worth of farmers: 400 lookups spread over ~40 villages
+            rng = random.Random(0)
+            villages = [(27.5 + rng.random() * 0.5, 84.0 + rng.random() * 0.5) for _ in range(40)]
+            points = [(lat + rng.uniform(-0.003, 0.003), lon + rng.uniform(-0.003, 0.003)) for lat, lon in (rng.choice(villages) for _ in range(requests_count))]
+            fetches = (Bestcrop.fetch_soil_ph, Bestcrop.fetch_weather, Bestcrop.fetch_rainfall, Bestcrop.fetch_altitude)
+
+            async def run(label):
+                stub.reset()
+                started = time.perf_counter()
+                for lat, lon in points:
+                    await asyncio.gather(*(fetch(lat, lon) for fetch in fetches))
+                elapsed = time.perf_counter() - started
+                print(f"{label:<26}{elapsed:>8.2f}s {elapsed / len(points) * 1000:>8.1f} ms/location {stub.requests:>6} upstream requests")
+
+            for source in cache.ttls:
+                cache.ttls[source] = 0  # expire immediately: every lookup goes upstream
+            await run("uncached")
+
+            cache.ttls.update(SOURCE_TTLS)
+            cache.memory.clear()
+            await run("cold LRU")
+            await run("warm LRU")
+
+            with tempfile.TemporaryDirectory() as tmp:
+                cache.persistent = SqliteTier(os.path.join(tmp, "geocache.db"))
+                cache.memory.clear()
+                await run("cold LRU + SQLite")
+                cache.memory.clear()  # what a restart looks like
+                await run("after restart (SQLite)")
+                print(cache.stats()["sources"])
+                cache.close()
+
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+import asyncio
+import importlib.util
+import os
+import random
+import time
+import httpx
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]"); without it everything speaks HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Per-provider pool, timeout and retry settings. `timeout` bounds one attempt; retries back off
+# exponentially from `backoff` seconds. http2 is only offered where the host negotiates it.
+PROVIDERS = {
+    "weatherapi": {"timeout": 8.0, "connect_timeout": 3.0, "retries": 2, "backoff": 0.3, "max_connections": 50, "http2": True},
+    "open_meteo": {"timeout": 10.0, "connect_timeout": 3.0, "retries": 2, "backoff": 0.5, "max_connections": 20, "http2": True},
+    "open_elevation": {"timeout": 6.0, "connect_timeout": 3.0, "retries": 1, "backoff": 0.5, "max_connections": 10, "http2": False},
+    "soil": {"timeout": 8.0, "connect_timeout": 3.0, "retries": 1, "backoff": 0.5, "max_connections": 10, "http2": False},
+}
+KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _provider_settings(name: str, defaults: dict) -> dict:
+    # HTTP_WEATHERAPI_TIMEOUT=5, HTTP_SOIL_RETRIES=0, ... override the defaults above
+    settings = dict(defaults)
+    for key, value in defaults.items():
+        env = os.getenv(f"HTTP_{name.upper()}_{key.upper()}")
+        if env is not None:
+            settings[key] = env.lower() in ("1", "true", "yes") if isinstance(value, bool) else type(value)(env)
+    return settings
+
+
+class HttpClients:
+    """
+    One pooled httpx.AsyncClient per upstream provider for the lifetime of the app, so calls reuse
+    keep-alive connections (and HTTP/2 streams) instead of a fresh TCP+TLS handshake every time.
+    start()/close() are called from the FastAPI startup/shutdown hooks; scripts that never call
+    start() get clients created on first use.
+    """
+
+    def __init__(self, providers: dict = PROVIDERS):
+        self.settings = {name: _provider_settings(name, defaults) for name, defaults in providers.items()}
+        self._clients = {}
+        self.counters = {name: {"requests": 0, "retries": 0, "failures": 0, "seconds": 0.0} for name in self.settings}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        settings = self.settings[name]
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_connections"],
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+            http2=settings["http2"] and HTTP2_AVAILABLE,
+        )
+
+    async def start(self):
+        for name in self.settings:
+            self.client(name)
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    async def close(self):
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+    async def get(self, name: str, url: str, **kwargs) -> httpx.Response:
+        """
+        GET through the provider's pool. Connection errors, timeouts and 429/5xx answers are retried
+        with jittered exponential backoff; the final failure is raised (raise_for_status for HTTP errors).
+        """
+        settings = self.settings[name]
+        counters = self.counters[name]
+        started = time.perf_counter()
+        try:
+            for attempt in range(settings["retries"] + 1):
+                last_attempt = attempt == settings["retries"]
+                try:
+                    response = await self.client(name).get(url, **kwargs)
+                    if response.status_code not in RETRY_STATUSES or last_attempt:
+                        response.raise_for_status()
+                        return response
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+                counters["retries"] += 1
+                await asyncio.sleep(settings["backoff"] * (2 ** attempt) * random.uniform(0.5, 1.5))
+        except Exception:
+            counters["failures"] += 1
+            raise
+        finally:
+            counters["requests"] += 1
+            counters["seconds"] += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "http2_available": HTTP2_AVAILABLE,
+            "providers": {
+                name: {
+                    "open": name in self._clients,
+                    "requests": counters["requests"],
+                    "retries": counters["retries"],
+                    "failures": counters["failures"],
+                    "avg_ms": round(counters["seconds"] / counters["requests"] * 1000, 1) if counters["requests"] else None,
+                }
+                for name, counters in self.counters.items()
+            },
+        }
+
+
+# The app-wide registry
+http_clients = HttpClients()
+
+
+if __name__ == "__main__":
+    # Connection reuse against a local stub server, per-call client vs the shared pool:
+    #   python httpclients.py [requests] [concurrency]
+    import sys
+    from stubserver import StubServer
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    async def main():
+        with StubServer(latency=0.0) as stub:
+            urls = [f"{stub.url}/v1/current.json?key=x&q={27 + i % 50 * 0.01},85.3" for i in range(total)]
+
+            async def run(label, fetch):
+                stub.reset()
+                gate = asyncio.Semaphore(concurrency)
+
+                async def one(url):
+                    async with gate:
+                        await fetch(url)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(one(url) for url in urls))
+                elapsed = time.perf_counter() - started
+                print(f"{label:<22}{elapsed:>7.2f}s {elapsed / total * 1000:>7.2f} ms/request {stub.connections:>5} connections for {stub.requests} requests")
+
+            async def per_call_client(url):
+                # What the fetch functions used to do
+                async with httpx.AsyncClient(timeout=10) as client:
+                    (await client.get(url)).raise_for_status()
+
+            clients = HttpClients()
+            await clients.start()
+
+            async def shared_pool(url):
+                await clients.get("weatherapi", url)
+
+            await run("client per call", per_call_client)
+            await run("shared pool", shared_pool)
+            await clients.close()
+            print(clients.stats()["providers"]["weatherapi"])
+
+    asyncio.run(main())
@@ -0,0 +1,282 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from callai import msg
+
+# Phrases per route in English, Hindi, Nepali and romanized Hindi/Nepali.
+# Multi-word phrases outweigh single words, so "weather alert" beats "alert".
+ROUTE_PHRASES = {
+    "/recommend": [
+        "recommend", "recommendation", "suggest", "suggestion", "which crop", "best crop", "what to grow",
+        "what should i grow", "crop info", "crop information", "crop details", "fertilizer", "fertiliser",
+        "fasal", "kheti", "bali", "kun bali", "kaun si fasal",
+        "फसल", "फ़सल", "खेती", "सुझाव", "सिफारिश", "सिफारिस", "कौन सी फसल", "कौनसी फसल", "क्या उगाएं",
+        "खाद", "उर्वरक", "बाली", "कुन बाली", "के लगाउने", "बाली जानकारी",
+    ],
+    "/weatheralerts": [
+        "weather", "forecast", "rain", "rainfall", "temperature", "storm", "hail", "weather alert",
+        "weather forecast", "mausam", "barish", "barsat", "pani parne",
+        "मौसम", "बारिश", "बरसात", "वर्षा", "तापमान", "तापक्रम", "आंधी", "आँधी", "तूफान", "ओले", "असिना",
+        "हावापानी", "पानी पर्ने", "मौसम पूर्वानुमान",
+    ],
+    "/disease": [
+        "disease", "diseases", "plant disease", "crop disease", "pest", "pests", "infection", "insect",
+        "plant clinic", "leaf", "detect disease", "rog", "bimari", "keera", "kira",
+        "रोग", "बीमारी", "बिमारी", "कीट", "कीड़ा", "कीरा", "पत्ती", "पात", "रोग पहचान", "रोग पत्ता",
+        "संक्रमण", "डिजिज",
+    ],
+    "/": [
+        "dashboard", "home", "homepage", "home page", "main page", "main menu",
+        "डैशबोर्ड", "ड्यासबोर्ड", "होम", "मुख्य पृष्ठ", "गृहपृष्ठ", "मुख्य पेज",
+    ],
+    "/alerts": [
+        "alert", "alerts", "map", "outbreak", "disease alert", "disease alerts", "disease map", "nearby disease",
+        "अलर्ट", "नक्शा", "नक्सा", "प्रकोप", "रोग अलर्ट", "रोग नक्सा", "चेतावनी",
+    ],
+    "/explore": [
+        "market", "marketplace", "sell", "buy", "explore", "listing", "price", "bazaar", "bazar", "bajar",
+        "mandi", "bechna", "kharid",
+        "बाजार", "बज़ार", "बजार", "मंडी", "बेच", "बेच्न", "बिक्री", "खरीद", "किन्न", "भाउ",
+    ],
+    "/tutorial": [
+        "tutorial", "tutorials", "video", "videos", "learn", "guide", "how to", "youtube", "training",
+        "sikhna", "sikne",
+        "ट्यूटोरियल", "वीडियो", "भिडियो", "सीखना", "सीखें", "सिक्न", "सिकाइ", "तरीका", "तरिका", "प्रशिक्षण",
+    ],
+    "/notifications": [
+        "notification", "notifications", "message", "messages", "reminder", "reminders", "notice", "notices",
+        "सूचना", "सूचनाएं", "सूचनाहरू", "नोटिफिकेशन", "संदेश", "सन्देश", "रिमाइंडर",
+    ],
+}
+
+_DEVANAGARI = re.compile(r"[\u0900-\u097F]")
+_TOKEN = re.compile(r"[\w\u0900-\u097F]+")
+# Case endings, postpositions and verb endings a Devanagari phrase word may carry ("मौसमको",
+# "फसलों", "बेचनी"); anything else glued on makes a different word ("होमवर्क", "खादी")
+INFLECTIONS = (
+    "ों", "ें", "ओं", "एं", "एँ", "ियों", "ियाँ", "ियां", "हरू", "हरु", "को", "का", "की", "के", "मा", "ले",
+    "लाई", "बाट", "सँग", "से", "में", "ने", "ना", "नी", "नु", "ु", "े", "ो",
+)
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower()
+    # Drop nukta so "फ़सल" and "फसल" match
+    return text.replace("\u093c", "")
+
+
+def _stems(token: str) -> set:
+    # The token itself and the token with each matching inflection removed
+    stems = {token}
+    for suffix in INFLECTIONS:
+        if token.endswith(suffix) and len(token) > len(suffix):
+            stem = token[:-len(suffix)]
+            stems.add(stem)
+            # "बालियों" comes from "बाली", "कीड़े" and "कीड़ों" from "कीड़ा"
+            if suffix.startswith("ि"):
+                stems.add(stem + "ी")
+            elif suffix in ("े", "ों", "ें", "ओं"):
+                stems.add(stem + "ा")
+    return stems
+
+
+class IntentRouter:
+    """
+    Keyword/n-gram index mapping navigation queries to routes without an LLM call.
+    Latin phrases match whole tokens (up to 3-grams); Devanagari phrase words also match a token
+    carrying one of INFLECTIONS, so "मौसमको" hits "मौसम" but "होमवर्क" does not hit "होम".
+    A route wins only when it scores more than `min_margin` times the runner-up.
+    """
+
+    def __init__(self, phrases: dict = ROUTE_PHRASES, min_score: float = 1.0, min_margin: float = 2.0):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self._latin = {}
+        self._devanagari = {}  # first word -> [(words, route, weight)]
+        self._max_ngram = 1
+        for route, route_phrases in phrases.items():
+            for phrase in route_phrases:
+                phrase = normalize(phrase)
+                weight = float(len(phrase.split()))
+                if _DEVANAGARI.search(phrase):
+                    words = tuple(phrase.split())
+                    self._devanagari.setdefault(words[0], []).append((words, route, weight))
+                else:
+                    key = " ".join(phrase.split())
+                    self._latin.setdefault(key, []).append((route, weight))
+                    self._max_ngram = max(self._max_ngram, len(key.split()))
+
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.llm_calls = 0
+        self.local_seconds = 0.0
+        self.llm_seconds = 0.0
+
+    def scores(self, text: str) -> dict:
+        text = normalize(text)
+        scores = {}
+        tokens = _TOKEN.findall(text)
+        for n in range(1, self._max_ngram + 1):
+            for i in range(len(tokens) - n + 1):
+                for route, weight in self._latin.get(" ".join(tokens[i:i + n]), ()):
+                    scores[route] = scores.get(route, 0.0) + weight
+        stems = [_stems(token) for token in tokens]
+        matched = set()
+        for i, token_stems in enumerate(stems):
+            for stem in token_stems:
+                for words, route, weight in self._devanagari.get(stem, ()):
+                    if words not in matched and all(
+                        i + k < len(stems) and word in stems[i + k] for k, word in enumerate(words[1:], 1)
+                    ):
+                        # Each phrase counts once, however often it is repeated
+                        matched.add(words)
+                        scores[route] = scores.get(route, 0.0) + weight
+        return scores
+
+    def classify(self, text: str):
+        """
+        Returns the route when the best match is confident, otherwise None.
+        """
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][1] <= self.min_margin * ranked[1][1]:
+            return None
+        return ranked[0][0]
+
+    def record(self, local: bool, seconds: float):
+        """
+        Counts one routed query and how long it took, answered locally or by the LLM.
+        """
+        with self._lock:
+            if local:
+                self.local_hits += 1
+                self.local_seconds += seconds
+            else:
+                self.llm_calls += 1
+                self.llm_seconds += seconds
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.llm_calls
+        return {
+            "queries": total,
+            "local_hits": self.local_hits,
+            "llm_calls": self.llm_calls,
+            "llm_call_rate": round(self.llm_calls / total, 3) if total else 0.0,
+            "avg_local_ms": round(self.local_seconds / self.local_hits * 1000, 3) if self.local_hits else None,
+            "avg_llm_ms": round(self.llm_seconds / self.llm_calls * 1000, 1) if self.llm_calls else None,
+        }
+
+
+router = IntentRouter()
+
+
+def navigation_prompt(text: str) -> str:
+    # AI prompt to pick the page
+    prompt = f"""Analyze the following user query and determine which page of the website the user wants to navigate to. 
+                The query text may be in Hindi, English, or a mix of both:
+
+                "{text}"
+
+                Available pages, their routes, and functions:
+
+                1) Crop Recommendation 
+                route: "/recommend" 
+                function: Suggests the best crops for the farmer to grow based on their location, soil type, season, weather conditions, and temperature. 
+                Helps farmers make data-driven decisions for higher yield.
+
+                2) Weather Forecast 
+                route: "/weatheralerts" 
+                function: Provides real-time and upcoming weather conditions, temperature, rainfall chances, and extreme weather alerts. 
+                Helps farmers plan irrigation, fertilizer use, and crop protection.
+
+                3) Disease Detection 
+                route: "/disease" 
+                function: Allows farmers to upload crop images for AI-based disease detection. 
+                Identifies plant diseases, pests, or nutrient deficiencies and provides treatment suggestions.
+
+                4) Crop Info 
+                route: "/recommend" 
+                function: Gives detailed information about crops (growth stages, soil requirements, fertilizer use, irrigation needs, harvesting tips). 
+                Helps farmers manage crops effectively after choosing them.
+
+                5) Dashboard 
+                route: "/" 
+                function: Main homepage/dashboard showing an overview of all features, shortcuts, and personalized recommendations.
+
+                6) Alerts 
+                route: "/alerts" 
+                function: Displays map-based crop disease alerts and outbreaks in nearby regions. 
+                Helps farmers take preventive measures before diseases spread.
+
+                7) Explore 
+                route: "/explore" 
+                function: Online marketplace where farmers can sell their crops/vegetables/Fruits directly. 
+                Encourages fair pricing and better market access. 
+
+                8) Tutorial 
+                route: "/tutorial" 
+                function: Provides step-by-step tutorials, guides, and videos for farmers to learn modern agricultural techniques. 
+                Includes best practices for planting, irrigation, pest control, and harvesting. It's a youtube for all the tutorial things. User can watch videos here
+
+                9) Notification 
+                route: "/notifications" 
+                function: Shows all notifications relevant to farmers such as updates about their fields, reminders, weather warnings, and new government policies. 
+                Ensures farmers don’t miss critical information.
+
+                10) Not Found 
+                route: "/404" 
+                function: If the user query does not match any of the above pages, return this page indicating no relevant result.
+
+                Return **ONLY** a valid JSON object in the following format:
+
+                {{
+                "page": "ROUTE_OF_THE_PAGE"
+                }}
+                """
+    return prompt
+
+
+def route_query(text: str) -> dict:
+    """
+    Returns {"page": route} for a navigation query, asking Gemini only when the local router is unsure.
+    """
+    started = time.perf_counter()
+    route = router.classify(text)
+    if route is not None:
+        router.record(True, time.perf_counter() - started)
+        print(f"Routed locally to {route}")
+        return {"page": route}
+
+    # Call AI and get output
+    message = msg(navigation_prompt(text))
+    router.record(False, time.perf_counter() - started)
+    print("Raw AI output:", message)  # Debug print
+
+    # Extract JSON from AI string
+    json_match = re.search(r"\{.*\}", message, re.DOTALL)
+    if not json_match:
+        raise ValueError("Could not extract JSON from AI output")
+
+    return json.loads(json_match.group(0))
+
+
+if __name__ == "__main__":
+    # Share of sample queries answered locally and the local latency; before this router every
+    # query cost one Gemini round-trip (~2 KB prompt).
+    samples = [
+        "मौसम कैसा रहेगा", "weather", "आज बारिश होगी क्या", "मेरे टमाटर में रोग लगा है", "रोग", "बाजार",
+        "मुझे टमाटर बेचना है", "कौन सी फसल लगाऊं", "best crop for my farm", "show me the dashboard",
+        "सूचना दिखाओ", "tutorial videos", "भिडियो हेर्न चाहन्छु", "disease alerts near me on the map",
+        "weather alert", "नक्सा", "खाद की जानकारी", "मौसमको जानकारी दिनुस्", "hello", "मुझे कुछ चाहिए",
+    ]
+    started = time.perf_counter()
+    routed = [(text, router.classify(text)) for text in samples]
+    elapsed = time.perf_counter() - started
+    for text, route in routed:
+        print(f"{route or 'LLM fallback':<16} {text}")
+    fallback = sum(route is None for _, route in routed)
+    print(f"\nLLM call rate: before 100%, after {fallback / len(samples):.0%} ({fallback}/{len(samples)})")
+    print(f"Local routing latency: {elapsed / len(samples) * 1e6:.1f} µs per query")
@@ -0,0 +1,401 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from callai import msg
+
+LISTING_FIELDS = ("crop_name", "crop_unit", "price_per_unit", "quantity")
+
+# English name -> spoken forms (Hindi, Nepali, romanized); starts from the table in the Gemini prompt
+CROP_LEXICON = {
+    "Tomato": ["tomato", "tomatoes", "टमाटर", "गोलवेदा", "गोलभेडा", "गोलभेंडा", "tamatar", "golbheda"],
+    "Potato": ["potato", "potatoes", "आलू", "आलु", "aalu", "alu"],
+    "Onion": ["onion", "onions", "प्याज", "प्याजु", "pyaj", "pyaz"],
+    "Round Gourd": ["round gourd", "गोल वेडा", "टिंडा", "tinda"],
+    "Okra": ["okra", "ladyfinger", "lady finger", "भिंडी", "भिण्डी", "भिन्डी", "bhindi"],
+    "Brinjal": ["brinjal", "eggplant", "बैंगन", "भण्टा", "भंटा", "baingan", "bhanta"],
+    "Chili": ["chili", "chilli", "chillies", "मिर्च", "मिर्ची", "खुर्सानी", "mirch", "khursani"],
+    "Coriander": ["coriander", "धनिया", "धनियाँ", "dhaniya"],
+    "Spinach": ["spinach", "पालक", "palak"],
+    "Cabbage": ["cabbage", "गोभी", "बन्दा", "बंदा", "patta gobhi", "पत्ता गोभी", "banda"],
+    "Cauliflower": ["cauliflower", "फूलगोभी", "फूल गोभी", "काउली", "cauli"],
+    "Rice": ["rice", "paddy", "चावल", "चामल", "धान", "chawal", "chamal", "dhan"],
+    "Wheat": ["wheat", "गेहूं", "गेहूँ", "गहुँ", "गहूँ", "gehun", "gahu"],
+    "Corn": ["corn", "maize", "मक्का", "मकै", "makka", "makai"],
+    "Carrot": ["carrot", "carrots", "गाजर", "gajar"],
+    "Garlic": ["garlic", "लहसुन", "लसुन", "lahsun", "lasun"],
+    "Ginger": ["ginger", "अदरक", "अदुवा", "adrak", "aduwa"],
+    "Cucumber": ["cucumber", "खीरा", "काँक्रो", "kheera", "kakro"],
+    "Pumpkin": ["pumpkin", "कद्दू", "फर्सी", "kaddu", "pharsi"],
+    "Peas": ["peas", "मटर", "केराउ", "matar", "kerau"],
+    "Apple": ["apple", "apples", "सेब", "स्याउ", "seb", "syau"],
+    "Banana": ["banana", "bananas", "केला", "केरा", "kela", "kera"],
+    "Orange": ["orange", "oranges", "संतरा", "सुन्तला", "santra", "suntala"],
+    "Mango": ["mango", "mangoes", "आम", "aam"],
+}
+
+# Canonical units match the options of the listing form
+UNIT_WORDS = {
+    "per kg": ["kg", "kgs", "kilo", "kilos", "kilogram", "kilograms", "किलो", "किलोग्राम", "केजी", "केजि"],
+    "per dozen": ["dozen", "dozens", "darjan", "दर्जन"],
+    "per piece": ["piece", "pieces", "pcs", "pc", "पीस", "पिस", "गोटा", "वटा", "नग", "पिस्"],
+}
+CURRENCY_WORDS = {
+    "rs", "rupee", "rupees", "rupaye", "rupiya", "rupaiya", "npr", "inr", "₹",
+    "रुपये", "रुपए", "रूपये", "रुपया", "रूपया", "रुपैयाँ", "रुपैया", "रूपैयाँ", "रु", "रू",
+}
+PER_WORDS = {"per", "a", "each", "प्रति", "पर", "प्रती"}
+# "40 रुपये किलो के हिसाब से" / "किलो को 40" — small words that may sit between a price and its unit
+FILLER_WORDS = {"का", "की", "के", "को", "ka", "ki", "ke", "ko", "में", "मा", "in", "for", "हिसाब", "से"}
+PRICE_CUES = {"price", "rate", "दाम", "भाउ", "मूल्य", "कीमत", "दर", "भाव", "daam", "bhau"}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "fifteen": 15, "twenty": 20, "twenty-five": 25, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+    "एक": 1, "दो": 2, "दुई": 2, "तीन": 3, "चार": 4, "पांच": 5, "पाँच": 5, "छह": 6, "छ": 6, "सात": 7,
+    "आठ": 8, "नौ": 9, "दस": 10, "दश": 10, "पंद्रह": 15, "पन्ध्र": 15, "बीस": 20, "पच्चीस": 25,
+    "पच्चिस": 25, "तीस": 30, "तिस": 30, "चालीस": 40, "चालिस": 40, "पचास": 50, "साठ": 60, "सत्तर": 70,
+    "अस्सी": 80, "नब्बे": 90, "डेढ़": 1.5, "डेढ": 1.5, "ढाई": 2.5, "अढाई": 2.5,
+}
+MULTIPLIER_WORDS = {
+    "hundred": 100, "thousand": 1000, "सौ": 100, "सय": 100, "हजार": 1000, "हज़ार": 1000,
+}
+# Words that are a number, per-word or crop only next to a quantity: "छ" is also Nepali "is", "दो" is
+# also "give", "a" is also the article and "आम" is also "common" ("आम तौर पर")
+AMBIGUOUS_NUMBER_WORDS = {"छ", "दो"}
+AMBIGUOUS_PER_WORDS = {"a"}
+AMBIGUOUS_CROP_WORDS = {"आम", "aam"}
+
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+_TOKEN = re.compile(r"[0-9]+(?:\.[0-9]+)?|₹|[a-z\u0900-\u0963\u0971-\u097F]+")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower().translate(_DEVANAGARI_DIGITS)
+    text = text.replace("\u093c", "")  # nukta: "डेढ़" == "डेढ"
+    return re.sub(r"(?<=\d),(?=\d{3}\b)", "", text)  # 1,500 -> 1500
+
+
+def _build_index(groups: dict) -> dict:
+    index = {}
+    for canonical, words in groups.items():
+        for word in words:
+            index[tuple(_normalize(word).split())] = canonical
+    return index
+
+
+_CROP_INDEX = _build_index(CROP_LEXICON)
+_UNIT_INDEX = {words[0]: unit for words, unit in _build_index(UNIT_WORDS).items()}
+_MAX_CROP_WORDS = max(len(words) for words in _CROP_INDEX)
+# Devanagari aliases of 3+ characters also match inflected forms by prefix ("टमाटरों", "आलुको")
+_CROP_PREFIXES = [
+    (words[0], crop) for words, crop in _CROP_INDEX.items()
+    if len(words) == 1 and len(words[0]) >= 3 and "\u0900" <= words[0][0] <= "\u097f"
+]
+NUMBER_WORDS = {_normalize(word): value for word, value in NUMBER_WORDS.items()}
+MULTIPLIER_WORDS = {_normalize(word): value for word, value in MULTIPLIER_WORDS.items()}
+
+
+def _is_number_word(tokens: list, i: int) -> bool:
+    token = tokens[i]
+    if token not in NUMBER_WORDS:
+        return False
+    if token not in AMBIGUOUS_NUMBER_WORDS:
+        return True
+    # "छ किलो", "दो सौ", "दो रुपये" are numbers; "आलु छ", "बेच दो 20" are not
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    return following is not None and (
+        following in _UNIT_INDEX or following in CURRENCY_WORDS or following in MULTIPLIER_WORDS
+        or _is_number_word(tokens, i + 1)
+    )
+
+
+def _next_to_quantity(tokens: list, i: int, items: list) -> bool:
+    # The previous item or the next token is a number, unit, currency or per-word
+    if items and items[-1][0] in ("num", "unit", "currency", "per"):
+        return True
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    return following is not None and (
+        following[0].isdigit() or following in _UNIT_INDEX or following in CURRENCY_WORDS
+        or following in PER_WORDS or _is_number_word(tokens, i + 1)
+    )
+
+
+def _lex(text: str) -> list:
+    """
+    Turns text into (kind, value) items: num, currency, unit, per, filler, cue, crop or word.
+    Runs of number words ("दो सौ पचास", "5 हजार") collapse into one num item; a digit token is never
+    added to a neighbouring number, only scaled by a multiplier after it.
+    """
+    tokens = _TOKEN.findall(_normalize(text))
+    items = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+
+        # Numbers: digits or number words, with trailing multipliers
+        if token[0].isdigit() or _is_number_word(tokens, i) or (token in MULTIPLIER_WORDS and items and items[-1][0] == "num"):
+            total, current = 0.0, 0.0
+            last = None  # "digit", "word" or "multiplier"
+            while i < len(tokens):
+                token = tokens[i]
+                if token[0].isdigit() and last is None:
+                    current, last = float(token), "digit"
+                elif token in MULTIPLIER_WORDS:
+                    current = (current or 1) * MULTIPLIER_WORDS[token]
+                    if MULTIPLIER_WORDS[token] >= 1000:
+                        total, current = total + current, 0.0
+                    last = "multiplier"
+                elif last != "digit" and _is_number_word(tokens, i):
+                    current, last = current + NUMBER_WORDS[token], "word"
+                else:
+                    break
+                i += 1
+            value = total + current
+            items.append(("num", int(value) if value == int(value) else value))
+            continue
+
+        # Crops, longest alias first
+        for n in range(min(_MAX_CROP_WORDS, len(tokens) - i), 0, -1):
+            words = tuple(tokens[i:i + n])
+            crop = _CROP_INDEX.get(words)
+            if crop and (n > 1 or token not in AMBIGUOUS_CROP_WORDS or _next_to_quantity(tokens, i, items)):
+                items.append(("crop", crop))
+                i += n
+                break
+        else:
+            if token in CURRENCY_WORDS:
+                items.append(("currency", token))
+            elif token in _UNIT_INDEX:
+                items.append(("unit", _UNIT_INDEX[token]))
+            elif token in PER_WORDS and (token not in AMBIGUOUS_PER_WORDS or (i + 1 < len(tokens) and tokens[i + 1] in _UNIT_INDEX)):
+                items.append(("per", token))
+            elif token in FILLER_WORDS:
+                items.append(("filler", token))
+            elif token in PRICE_CUES:
+                items.append(("cue", token))
+            else:
+                crop = next((crop for alias, crop in _CROP_PREFIXES if token.startswith(alias)), None)
+                items.append(("crop", crop) if crop else ("word", token))
+            i += 1
+    return items
+
+
+def _unit_near(items: list, start: int, step: int, limit: int = 3):
+    # First unit within `limit` items, skipping "per"/filler words only
+    i = start
+    for _ in range(limit):
+        i += step
+        if not 0 <= i < len(items):
+            return None
+        kind, value = items[i]
+        if kind == "unit":
+            return value
+        if kind not in ("per", "filler"):
+            return None
+    return None
+
+
+def parse_listing(text: str) -> dict:
+    """
+    Deterministic extraction of crop_name, crop_unit, price_per_unit and quantity.
+    Fields it cannot fill are None.
+    """
+    items = _lex(text)
+    result = dict.fromkeys(LISTING_FIELDS)
+    used = set()
+    price_unit = quantity_unit = None
+
+    crops = [value for kind, value in items if kind == "crop"]
+    if crops:
+        result["crop_name"] = crops[0]
+
+    # Price: a number right next to a currency word ("40 रुपये", "rs 40", "₹40")
+    for i, (kind, value) in enumerate(items):
+        if kind != "num":
+            continue
+        after = items[i + 1][0] if i + 1 < len(items) else None
+        before = items[i - 1][0] if i > 0 else None
+        before_owned = i > 1 and items[i - 2][0] == "num"  # "40 रुपये 5 किलो": रुपये belongs to 40
+        if after == "currency" or (before == "currency" and not before_owned):
+            result["price_per_unit"] = value
+            used.add(i)
+            price_unit = _unit_near(items, i + (1 if after == "currency" else 0), 1) or _unit_near(items, i - (1 if before == "currency" else 0), -1)
+            break
+
+    # Quantity: a number followed by a unit ("40 किलो"), unless the unit follows "per"
+    for i, (kind, value) in enumerate(items):
+        if kind != "num" or i in used:
+            continue
+        if i + 1 < len(items) and items[i + 1][0] == "unit" and not (i > 0 and items[i - 1][0] == "per"):
+            result["quantity"] = value
+            quantity_unit = items[i + 1][1]
+            used.add(i)
+            break
+
+    # Price without a currency word: "प्रति किलो 40", "rate 40", "दाम 40"
+    if result["price_per_unit"] is None:
+        for i, (kind, value) in enumerate(items):
+            if kind != "num" or i in used:
+                continue
+            per_unit = i > 1 and items[i - 2][0] == "per" and items[i - 1][0] == "unit"
+            cue = any(items[j][0] == "cue" for j in range(max(0, i - 2), i))
+            if per_unit or cue:
+                result["price_per_unit"] = value
+                price_unit = items[i - 1][1] if per_unit else _unit_near(items, i, 1)
+                used.add(i)
+                break
+
+    result["crop_unit"] = price_unit or quantity_unit
+    return result
+
+
+def listing_prompt(text: str) -> str:
+    # AI prompt to extract crop data
+    prompt = f"""
+Analyze this text and extract crop information. The text may be in Hindi, English, or mixed languages:
+"{text}"
+
+Common Hindi crop names and their English equivalents:
+- टमाटर, गोलवेदा, गोलभेडा = Tomato
+- आलू = Potato
+- प्याज = Onion
+- गोल वेडा = Round Gourd
+- भिंडी = Okra
+- बैंगन = Brinjal
+- मिर्च = Chili
+- धनिया = Coriander
+- पालक = Spinach
+- गोभी = Cabbage
+- चावल = Rice
+- गेहूं = Wheat
+- मक्का = Corn
+
+Extract the following information and return ONLY a valid JSON object:
+
+{{
+  "crop_name": "English crop name or null",
+  "crop_unit": "unit like per kg,per dozen , per piece, null",
+  "price_per_unit": "price number or null",
+  "quantity": "quantity number or null"
+}}
+
+Look for:
+- Crop names (English)
+- Quantities (numbers with per kilo,per piece, etc.)
+- Prices (numbers with rupees, rs, per kg, per piece, etc.)
+- Units (kg, kilo, per kg, etc.)
+
+Return ONLY the JSON object. No explanations, no markdown, no extra text.
+"""
+    return prompt
+
+
+def extract_listing_llm(text: str) -> dict:
+    # Call AI and get output
+    message = msg(listing_prompt(text))
+    print("Raw AI output:", message)  # Debug print
+
+    # Extract JSON from AI string
+    json_match = re.search(r"\{.*\}", message, re.DOTALL)
+    if not json_match:
+        raise ValueError("Could not extract JSON from AI output")
+
+    return json.loads(json_match.group(0))
+
+
+class ListingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parsed_locally = 0
+        self.llm_fallbacks = 0
+        self.llm_failures = 0
+
+    def record(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        total = self.parsed_locally + self.llm_fallbacks
+        return {
+            "listings": total,
+            "parsed_locally": self.parsed_locally,
+            "llm_fallbacks": self.llm_fallbacks,
+            "llm_failures": self.llm_failures,
+            "llm_call_rate": round(self.llm_fallbacks / total, 3) if total else 0.0,
+        }
+
+
+listing_stats = ListingStats()
+
+
+def extract_listing(text: str) -> dict:
+    """
+    Extracts crop_name, crop_unit, price_per_unit and quantity from a (Hindi/English) listing transcript.
+    The local parser runs first; Gemini is asked only to fill the fields it left empty.
+    """
+    data = parse_listing(text)
+    missing = [field for field in LISTING_FIELDS if data[field] is None]
+    if not missing:
+        listing_stats.record("parsed_locally")
+        return data
+
+    listing_stats.record("llm_fallbacks")
+    try:
+        llm_data = extract_listing_llm(text)
+    except Exception as e:
+        listing_stats.record("llm_failures")
+        if len(missing) == len(LISTING_FIELDS):
+            raise
+        print(f"LLM fallback failed, returning parsed fields only: {str(e)}")
+        return data
+
+    for field in missing:
+        data[field] = llm_data.get(field)
+    return data
+
+
+def _same(a, b) -> bool:
+    if a in (None, "", "null") or b in (None, "", "null"):
+        return a in (None, "", "null") and b in (None, "", "null")
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return str(a).strip().lower() == str(b).strip().lower()
+
+
+if __name__ == "__main__":
+    # Agreement of the local parser with the labelled corpus (and with Gemini when --llm is given):
+    #   python listing.py [--llm]
+    import sys
+    from pathlib import Path
+
+    corpus = json.loads((Path(__file__).parent / "Datasets" / "listing_corpus.json").read_text(encoding="utf-8"))
+    use_llm = "--llm" in sys.argv
+
+    agree = {field: 0 for field in LISTING_FIELDS}
+    agree_llm = {field: 0 for field in LISTING_FIELDS}
+    complete = 0
+    parse_seconds = 0.0
+    for sample in corpus:
+        started = time.perf_counter()
+        parsed = parse_listing(sample["text"])
+        parse_seconds += time.perf_counter() - started
+        complete += all(parsed[field] is not None for field in LISTING_FIELDS)
+        llm = extract_listing_llm(sample["text"]) if use_llm else None
+        for field in LISTING_FIELDS:
+            ok = _same(parsed[field], sample["expected"][field])
+            agree[field] += ok
+            if llm is not None:
+                agree_llm[field] += _same(parsed[field], llm.get(field))
+            if not ok:
+                print(f"{field:<15} expected={sample['expected'][field]!r:<12} parsed={parsed[field]!r:<12} {sample['text']}")
+
+    print(f"\n{len(corpus)} listings, {complete} fully parsed without the LLM, {parse_seconds / len(corpus) * 1e6:.1f} µs each")
+    for field in LISTING_FIELDS:
+        line = f"{field:<15} labels {agree[field] / len(corpus):6.1%}"
+        if use_llm:
+            line += f"   gemini {agree_llm[field] / len(corpus):6.1%}"
+        print(line)
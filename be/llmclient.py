@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from cache import TTLCache
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+
+
+class GeminiBackend:
+    """
+    Talks to Gemini through google.generativeai, reusing one GenerativeModel (and its transport) per model name.
+    The API key must already be configured with genai.configure().
+    """
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        self._genai = genai
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_name: str):
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.setdefault(model_name, self._genai.GenerativeModel(model_name))
+        return model
+
+    async def generate(self, model_name: str, prompt: str, timeout: float) -> str:
+        response = await self._model(model_name).generate_content_async(prompt, request_options={"timeout": timeout})
+        return response.text.strip()
+
+    def generate_sync(self, model_name: str, prompt: str, timeout: float) -> str:
+        response = self._model(model_name).generate_content(prompt, request_options={"timeout": timeout})
+        return response.text.strip()
+
+
+class FakeBackend:
+    """
+    Local stand-in for Gemini: returns canned responses after a configurable delay.
+    `responses` maps a prompt substring to a reply, or is a callable prompt -> reply.
+    """
+
+    def __init__(self, responses=None, default: str = "{}", latency: float = 0.0):
+        self.responses = responses or {}
+        self.default = default
+        self.latency = latency
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> str:
+        self.calls += 1
+        if callable(self.responses):
+            return self.responses(prompt)
+        for needle, reply in self.responses.items():
+            if needle in prompt:
+                return reply
+        return self.default
+
+    async def generate(self, model_name: str, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+    def generate_sync(self, model_name: str, prompt: str, timeout: float) -> str:
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake backend took longer than {timeout}s")
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class LLMClient:
+    """
+    Shared LLM access for callai and searchai: reused model objects, per-call timeouts,
+    bounded concurrency and a TTL cache keyed on the whitespace-normalized prompt.
+    Async callers use generate(); code already running in a worker thread uses generate_sync().
+    """
+
+    def __init__(self, backend, model_name: str, timeout: float = LLM_TIMEOUT_SECONDS, max_concurrency: int = LLM_MAX_CONCURRENCY, cache_ttl: float = LLM_CACHE_TTL, cache_size: int = LLM_CACHE_SIZE):
+        self.backend = backend
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = TTLCache(cache_size, cache_ttl)
+        # One limit shared by generate() and generate_sync(), and bound to no event loop
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._active = 0
+        self.peak_concurrency = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.call_seconds = 0.0
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.blake2b(f"{self.model_name}\0{normalize_prompt(prompt)}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _enter(self):
+        with self._lock:
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+
+    def _exit(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    async def _acquire(self):
+        # Polled rather than awaited on a worker thread, so a cancelled caller never leaves a slot
+        # taken behind it; the sleep only runs while all slots are busy
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+        self._enter()
+
+    def _record(self, started: float, outcome: str = None):
+        with self._lock:
+            self.calls += 1
+            self.call_seconds += time.perf_counter() - started
+            if outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "error":
+                self.errors += 1
+
+    async def generate(self, prompt: str, use_cache: bool = True) -> str:
+        key = self._key(prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        await self._acquire()
+        try:
+            started = time.perf_counter()
+            try:
+                text = await asyncio.wait_for(self.backend.generate(self.model_name, prompt, self.timeout), self.timeout)
+            except asyncio.TimeoutError:
+                self._record(started, "timeout")
+                raise TimeoutError(f"LLM call timed out after {self.timeout}s")
+            except Exception:
+                self._record(started, "error")
+                raise
+            self._record(started)
+        finally:
+            self._exit()
+
+        self.cache.set(key, text)
+        return text
+
+    def generate_sync(self, prompt: str, use_cache: bool = True) -> str:
+        key = self._key(prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        self._slots.acquire()
+        self._enter()
+        try:
+            started = time.perf_counter()
+            try:
+                text = self.backend.generate_sync(self.model_name, prompt, self.timeout)
+            except TimeoutError:
+                self._record(started, "timeout")
+                raise
+            except Exception:
+                self._record(started, "error")
+                raise
+            self._record(started)
+        finally:
+            self._exit()
+
+        self.cache.set(key, text)
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "max_concurrency": self.max_concurrency,
+            "peak_concurrency": self.peak_concurrency,
+            "avg_call_ms": round(self.call_seconds / self.calls * 1000, 1) if self.calls else None,
+            "cache": self.cache.stats(),
+        }
+
+
+if __name__ == "__main__":
+    # Exercise the client against the fake backend: python llmclient.py
+    async def main():
+        backend = FakeBackend({"weather": '{"page": "/weatheralerts"}'}, latency=0.2)
+        client = LLMClient(backend, "fake", timeout=1.0, max_concurrency=4)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client.generate(f"weather please {i}") for i in range(8)))
+        print(f"8 distinct prompts, concurrency 4, 200 ms each: {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client.generate("weather   please 0") for _ in range(100)))
+        print(f"100 repeats of a cached prompt: {(time.perf_counter() - started) * 1000:.2f} ms, backend calls={backend.calls}")
+
+        slow = LLMClient(FakeBackend(latency=0.5), "fake", timeout=0.1)
+        try:
+            await slow.generate("anything")
+        except TimeoutError as e:
+            print(f"timeout: {e}")
+        print(client.stats())
+
+    asyncio.run(main())
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from cache import TTLCache
+from geocache import GEO_TILE_DEGREES, tile_of, tile_center
+from httpclients import http_clients
+
+# Module constant so benchmarks can point it at a local stub
+ARCHIVE_API_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+# Days of history kept per tile (two years, so a full year is always available behind the archive lag)
+RAIN_HISTORY_DAYS = int(os.getenv("RAIN_HISTORY_DAYS", "730"))
+# The archive publishes with a delay; days this recent that came back empty are asked for again
+RAIN_ARCHIVE_LAG_DAYS = int(os.getenv("RAIN_ARCHIVE_LAG_DAYS", "7"))
+# Optional directory for one .npz per tile so the history survives restarts
+RAINSTORE_DIR = os.getenv("RAINSTORE_DIR", "")
+# Tiles kept in memory, least recently used dropped first (about 3 KB each at two years of history)
+RAINSTORE_MAX_TILES = int(os.getenv("RAINSTORE_MAX_TILES", "20000"))
+
+SEASONS = {
+    "winter": (12, 1, 2),
+    "pre_monsoon": (3, 4, 5),
+    "monsoon": (6, 7, 8, 9),
+    "post_monsoon": (10, 11),
+}
+
+
+class TileRainfall:
+    """
+    Daily precipitation for one tile: `values[i]` is the mm on `start + i days`, NaN where unknown.
+    """
+
+    def __init__(self, start: date, values: np.ndarray):
+        self.start = start
+        self.values = values
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self.values) - 1)
+
+    def merge(self, first: date, values: np.ndarray, keep_days: int):
+        # Write the fetched days into place (growing the array as needed), then keep the newest keep_days
+        last = first + timedelta(days=len(values) - 1)
+        start = min(self.start, first)
+        end = max(self.end, last)
+        merged = np.full((end - start).days + 1, np.nan, dtype=np.float32)
+        offset = (self.start - start).days
+        merged[offset:offset + len(self.values)] = self.values
+        offset = (first - start).days
+        known = ~np.isnan(values)
+        merged[offset:offset + len(values)][known] = values[known]
+        if len(merged) > keep_days:
+            start += timedelta(days=len(merged) - keep_days)
+            merged = merged[-keep_days:]
+        self.start, self.values = start, merged
+
+    def window(self, first: date, last: date) -> np.ndarray:
+        lo = max((first - self.start).days, 0)
+        hi = min((last - self.start).days + 1, len(self.values))
+        return self.values[lo:hi] if hi > lo else self.values[:0]
+
+    def months(self) -> np.ndarray:
+        days = np.datetime64(self.start.isoformat()) + np.arange(len(self.values))
+        return days.astype("datetime64[M]").astype(int) % 12 + 1
+
+
+async def fetch_precipitation(lat: float, lon: float, first: date, last: date) -> np.ndarray:
+    url = (
+        f"{ARCHIVE_API_URL}?"
+        f"latitude={lat}&longitude={lon}"
+        f"&start_date={first}&end_date={last}"
+        "&daily=precipitation_sum&timezone=UTC"
+    )
+    response = await http_clients.get("open_meteo", url)
+    data = response.json()
+    daily = data.get("daily", {}).get("precipitation_sum") or []
+    values = np.full((last - first).days + 1, np.nan, dtype=np.float32)
+    received = np.array([np.nan if p is None else p for p in daily[:len(values)]], dtype=np.float32)
+    values[:len(received)] = received
+    return values
+
+
+class RainfallStore:
+    """
+    Keeps daily precipitation per map tile in compact float32 arrays and only asks the archive for
+    the days it does not have yet (plus recent days the archive had not published). Annual, seasonal
+    and monthly totals are vectorized sums over the stored days.
+    """
+
+    def __init__(self, tile_degrees: float = GEO_TILE_DEGREES, history_days: int = RAIN_HISTORY_DAYS, data_dir: str = RAINSTORE_DIR,
+                 max_tiles: int = RAINSTORE_MAX_TILES):
+        self.tile_degrees = tile_degrees
+        self.history_days = history_days
+        self.data_dir = data_dir
+        # No expiry, only the size bound: a dropped tile is reloaded from data_dir or fetched again
+        self.tiles = TTLCache(max_tiles, float("inf"))
+        self._locks = TTLCache(max_tiles, float("inf"))
+        self.syncs = 0
+        self.upstream_calls = 0
+        self.days_fetched = 0
+        self.days_served = 0
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+
+    def _path(self, tile: tuple) -> str:
+        return os.path.join(self.data_dir, f"{self.tile_degrees}_{tile[0]}_{tile[1]}.npz")
+
+    def _load(self, tile: tuple):
+        if not self.data_dir or not os.path.exists(self._path(tile)):
+            return None
+        with np.load(self._path(tile)) as data:
+            return TileRainfall(date.fromordinal(int(data["start"])), data["values"].astype(np.float32))
+
+    def _save(self, tile: tuple, rain: TileRainfall):
+        if self.data_dir:
+            tmp_path = self._path(tile) + ".tmp.npz"
+            np.savez(tmp_path, start=rain.start.toordinal(), values=rain.values)
+            os.replace(tmp_path, self._path(tile))
+
+    def _missing_range(self, rain: TileRainfall, today: date):
+        """
+        First and last day to request, or None if the tile is up to date.
+        """
+        wanted_first = today - timedelta(days=365)
+        if rain is None or rain.end < wanted_first:
+            return wanted_first, today
+        first = rain.end + timedelta(days=1)
+        # Recent days the archive had not filled in yet
+        lag_start = today - timedelta(days=RAIN_ARCHIVE_LAG_DAYS)
+        gaps = np.flatnonzero(np.isnan(rain.window(lag_start, rain.end)))
+        if len(gaps):
+            first = min(first, max(lag_start, rain.start) + timedelta(days=int(gaps[0])))
+        if rain.start > wanted_first:
+            first = wanted_first
+        return (first, today) if first <= today else None
+
+    async def sync(self, lat: float, lon: float, today: date = None) -> TileRainfall:
+        today = today or datetime.now(timezone.utc).date()
+        tile = tile_of(lat, lon, self.tile_degrees)
+        lock = self._locks.get(tile)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks.set(tile, lock)
+        async with lock:
+            rain = self.tiles.get(tile)
+            if rain is None:
+                rain = await asyncio.to_thread(self._load, tile)
+            self.syncs += 1
+            missing = self._missing_range(rain, today)
+            if missing is not None:
+                first, last = missing
+                center_lat, center_lon = tile_center(tile, self.tile_degrees)
+                values = await fetch_precipitation(center_lat, center_lon, first, last)
+                self.upstream_calls += 1
+                self.days_fetched += len(values)
+                if rain is None:
+                    rain = TileRainfall(first, values)
+                else:
+                    rain.merge(first, values, self.history_days)
+                await asyncio.to_thread(self._save, tile, rain)
+            self.tiles.set(tile, rain)
+            self.days_served += 366
+            return rain
+
+    async def annual_total(self, lat: float, lon: float, today: date = None) -> float:
+        """
+        Precipitation over the last 365 days up to and including today, in mm.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        rain = await self.sync(lat, lon, today)
+        return round(float(np.nansum(rain.window(today - timedelta(days=365), today))), 1)
+
+    async def monthly_totals(self, lat: float, lon: float, today: date = None) -> dict:
+        """
+        mm per calendar month over the last 12 months, {1: jan_mm, ..., 12: dec_mm}.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        rain = await self.sync(lat, lon, today)
+        first = today - timedelta(days=364)
+        values = rain.window(first, today)
+        months = rain.months()[max((first - rain.start).days, 0):][:len(values)]
+        totals = np.bincount(months, weights=np.nan_to_num(values), minlength=13)
+        return {month: round(float(totals[month]), 1) for month in range(1, 13)}
+
+    async def seasonal_totals(self, lat: float, lon: float, today: date = None) -> dict:
+        monthly = await self.monthly_totals(lat, lon, today)
+        return {season: round(sum(monthly[m] for m in months), 1) for season, months in SEASONS.items()}
+
+    async def summary(self, lat: float, lon: float, today: date = None) -> dict:
+        monthly = await self.monthly_totals(lat, lon, today)
+        return {
+            "annual": await self.annual_total(lat, lon, today),
+            "seasonal": {season: round(sum(monthly[m] for m in months), 1) for season, months in SEASONS.items()},
+            "monthly": monthly,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "tiles": len(self.tiles),
+            "max_tiles": self.tiles.maxsize,
+            "evicted_tiles": self.tiles.evictions,
+            "stored_days": int(sum(len(rain.values) for _, rain in self.tiles.items())),
+            "syncs": self.syncs,
+            "upstream_calls": self.upstream_calls,
+            "days_fetched": self.days_fetched,
+            # How many days a full-year pull per sync would have downloaded
+            "days_full_pull_equivalent": self.days_served,
+        }
+
+
+rain_store = RainfallStore()
+
+
+if __name__ == "__main__":
+    # A month of daily syncs for 50 tiles, incremental store vs pulling the full year each time:
+    #   python rainstore.py [tiles] [days]
+    import sys
+    from stubserver import StubServer
+
+    tiles = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    async def main():
+        with StubServer(latency=0.0) as stub:
+            stub.point(sys.modules[__name__])
+            store = RainfallStore()
+            # Tile centers, so both paths ask the stub about the same coordinates
+            locations = [tile_center(tile_of(27.0 + i * 0.05, 84.0 + i * 0.03)) for i in range(tiles)]
+            start = date(2025, 6, 1)
+
+            started = time.perf_counter()
+            for d in range(days):
+                today = start + timedelta(days=d)
+                for lat, lon in locations:
+                    await fetch_precipitation(lat, lon, today - timedelta(days=365), today)
+            full_seconds = time.perf_counter() - started
+            full_requests = stub.requests
+
+            stub.reset()
+            started = time.perf_counter()
+            for d in range(days):
+                today = start + timedelta(days=d)
+                for lat, lon in locations:
+                    await store.annual_total(lat, lon, today)
+            store_seconds = time.perf_counter() - started
+
+            print(f"full-year pull : {full_seconds:6.2f}s {full_requests} requests, {tiles * days * 366} days downloaded")
+            print(f"rainfall store : {store_seconds:6.2f}s {stub.requests} requests, {store.days_fetched} days downloaded")
+
+            lat, lon = locations[0]
+            started = time.perf_counter()
+            for _ in range(1000):
+                await store.seasonal_totals(lat, lon, today)
+            print(f"seasonal totals from the store: {(time.perf_counter() - started):.3f} ms per call")
+            print(await store.summary(lat, lon, today))
+
+    asyncio.run(main())
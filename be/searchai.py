@@ -1,16 +1,25 @@
 import google.generativeai as genai
 import os
+from llmclient import GeminiBackend, LLMClient
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+client = LLMClient(GeminiBackend(), "gemini-1.5-flash")
+
+EMPTY_DETAILS = '{"Potential_Harms": "", "Solution": "", "Organic_Solutions": "", "Sources": []}'
+
+
 def grounded_search(prompt: str) -> str:
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
-        if hasattr(response, 'text'):
-            return response.text.strip()
-        else:
-            raise ValueError("No valid text found in response")
+        return client.generate_sync(prompt)
+    except Exception as e:
+        print(f"Error making request: {str(e)}")
+        return EMPTY_DETAILS
+
+
+async def grounded_search_async(prompt: str, use_cache: bool = True) -> str:
+    try:
+        return await client.generate(prompt, use_cache=use_cache)
     except Exception as e:
         print(f"Error making request: {str(e)}")
-        return f'{{"Potential_Harms": "", "Solution": "", "Organic_Solutions": "", "Sources": []}}'
\ No newline at end of file
+        return EMPTY_DETAILS
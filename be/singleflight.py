@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import os
+import time
+
+# Coordinates are rounded to this many decimals before comparing requests (3 ~ 110 m)
+COORD_DECIMALS = int(os.getenv("COORD_DECIMALS", "3"))
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical upstream calls into one. The first caller for a key starts the
+    call; everyone who asks for the same key before it finishes awaits that same task and gets its
+    result (or its exception). Nothing is kept once the call completes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.counters = {}  # provider -> {"calls", "upstream", "coalesced"}
+
+    def _count(self, provider: str, field: str):
+        counters = self.counters.setdefault(provider, {"calls": 0, "upstream": 0, "coalesced": 0})
+        counters[field] += 1
+
+    async def do(self, key: tuple, fn, *args):
+        """
+        Awaits fn(*args), sharing the call with any in-flight request for `key`.
+        key[0] names the provider the counters are reported under.
+        """
+        provider = key[0]
+        self._count(provider, "calls")
+        task = self._in_flight.get(key)
+        if task is None:
+            self._count(provider, "upstream")
+            task = asyncio.ensure_future(fn(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        else:
+            self._count(provider, "coalesced")
+        # shield: one caller going away (client disconnect) must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _done(self, key: tuple, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller was cancelled
+
+    def coalesce(self, provider: str):
+        """
+        Decorator for async fetch(lat, lon): calls for the same provider and rounded coordinates
+        share one request, and the function is called with the rounded coordinates.
+        """
+        def wrap(fn):
+            @functools.wraps(fn)
+            async def wrapper(lat, lon):
+                lat, lon = round(float(lat), COORD_DECIMALS), round(float(lon), COORD_DECIMALS)
+                return await self.do((provider, lat, lon), fn, lat, lon)
+
+            return wrapper
+
+        return wrap
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "providers": {provider: dict(counters) for provider, counters in self.counters.items()},
+        }
+
+
+# Shared by every upstream fetch in this process
+flights = SingleFlight()
+
+
+if __name__ == "__main__":
+    # 500 farmers from one village open the dashboard at once: python singleflight.py
+    async def main():
+        group = SingleFlight()
+        upstream_calls = 0
+
+        @group.coalesce("weather")
+        async def fetch(lat, lon):
+            nonlocal upstream_calls
+            upstream_calls += 1
+            await asyncio.sleep(0.2)
+            return 21.5
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(fetch(27.7168 + i * 1e-6, 85.3240) for i in range(500)))
+        print(f"500 callers, {upstream_calls} upstream call(s), {time.perf_counter() - started:.2f}s, results={set(results)}")
+        print(group.stats())
+
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+import time
+from faster_whisper import WhisperModel
+
+# Per-deployment choice: tiny / base / small / medium, int8 / int8_float32 / float32
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "medium")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", str(os.cpu_count())))
+# background: start loading when the app starts; lazy: load on the first transcription
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "background").lower()
+# A failed load is retried after this many seconds, doubling up to the max
+WHISPER_LOAD_RETRY_SECONDS = float(os.getenv("WHISPER_LOAD_RETRY_SECONDS", "5"))
+WHISPER_LOAD_RETRY_MAX_SECONDS = float(os.getenv("WHISPER_LOAD_RETRY_MAX_SECONDS", "300"))
+
+
+class SpeechModelProvider:
+    """
+    Owns the single WhisperModel of this process. Every app that imports the provider shares it;
+    the model is created on first use (or by load_in_background) so importing never blocks.
+    """
+
+    def __init__(self, size: str = WHISPER_MODEL_SIZE, compute_type: str = WHISPER_COMPUTE_TYPE, cpu_threads: int = WHISPER_CPU_THREADS):
+        self.size = size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.model = None
+        self.load_seconds = None
+        self.error = None
+        self.attempts = 0
+        self._lock = threading.Lock()
+        self._loader = None
+        self._loader_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def get(self) -> WhisperModel:
+        if self.model is not None:
+            return self.model
+        with self._lock:
+            if self.model is None:
+                started = time.perf_counter()
+                self.attempts += 1
+                try:
+                    model = WhisperModel(self.size, device="cpu", compute_type=self.compute_type, cpu_threads=self.cpu_threads)
+                except Exception as e:
+                    self.error = str(e)
+                    print(f"Error loading Whisper model: {str(e)}")
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self.model = model
+                print(f"Whisper {self.size} ({self.compute_type}) loaded in {self.load_seconds:.2f}s, ready to transcribe")
+        return self.model
+
+    def load_in_background(self, retry_seconds: float = WHISPER_LOAD_RETRY_SECONDS):
+        """
+        Loads on a daemon thread, retrying a failed load with exponential backoff until it succeeds.
+        Does nothing if the model is ready or a loader is already running, so callers that find
+        `error` set can simply call it again.
+        """
+        def _run():
+            delay = retry_seconds
+            while not self.ready:
+                try:
+                    self.get()
+                except Exception:
+                    # Kept in self.error and reported by status() meanwhile
+                    print(f"Retrying Whisper model load in {delay:g}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, WHISPER_LOAD_RETRY_MAX_SECONDS)
+
+        with self._loader_lock:
+            if self.ready or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=_run, name="whisper-loader", daemon=True)
+            self._loader.start()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "size": self.size,
+            "compute_type": self.compute_type,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "attempts": self.attempts,
+            "loading": self._loader is not None and self._loader.is_alive(),
+        }
+
+
+# The one instance per process
+speech_model = SpeechModelProvider()
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource  # peak RSS; kB on Linux, bytes on macOS
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Encoder/decoder layers, attention heads and width of each Whisper tier (vocab 51865, 80 mel bins)
+_TIER_DIMS = {"tiny": (4, 6, 384), "base": (6, 8, 512), "small": (12, 12, 768), "medium": (24, 16, 1024)}
+
+
+def _random_init(size: str, directory: str) -> str:
+    """
+    Writes a CTranslate2 Whisper model of the `size` architecture with random weights (float16,
+    like the published faster-whisper models) for timing loads without downloading the weights.
+    """
+    path = os.path.join(directory, f"whisper-{size}-random")
+    if os.path.exists(os.path.join(path, "model.bin")):
+        return path
+    import torch
+    from ctranslate2.converters.transformers import WhisperLoader
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from transformers import WhisperConfig, WhisperForConditionalGeneration
+
+    layers, heads, width = _TIER_DIMS[size]
+    config = WhisperConfig(
+        vocab_size=51865, num_mel_bins=80, d_model=width,
+        encoder_layers=layers, encoder_attention_heads=heads, encoder_ffn_dim=4 * width,
+        decoder_layers=layers, decoder_attention_heads=heads, decoder_ffn_dim=4 * width,
+    )
+    torch.manual_seed(0)
+    model = WhisperForConditionalGeneration(config).eval()
+    loader = WhisperLoader()
+    spec = loader.get_model_spec(model)
+    loader.set_config(spec.config, model, None)
+    tokens = [f"<|{i}|>" for i in range(config.vocab_size)]
+    spec.register_vocabulary(tokens)
+    spec.validate()
+    spec.optimize(quantization="float16")
+    os.makedirs(path, exist_ok=True)
+    spec.save(path)
+    Tokenizer(WordLevel({t: i for i, t in enumerate(tokens)}, unk_token=tokens[0])).save(os.path.join(path, "tokenizer.json"))
+    return path
+
+
+if __name__ == "__main__":
+    # Load time and resident memory per tier, each measured in a fresh process:
+    #   python speechmodel.py
+    # Without network access (no published weights), time random-init models of the same architectures:
+    #   python speechmodel.py --random-init [directory]
+    import json
+    import subprocess
+
+    if len(sys.argv) == 4 and sys.argv[1] == "--load":
+        before = _rss_mb()
+        provider = SpeechModelProvider(sys.argv[2], sys.argv[3])
+        provider.get()
+        print(json.dumps({"load_seconds": provider.load_seconds, "rss_mb": _rss_mb(), "model_mb": _rss_mb() - before}))
+        sys.exit(0)
+
+    random_dir = None
+    if len(sys.argv) > 1 and sys.argv[1] == "--random-init":
+        random_dir = sys.argv[2] if len(sys.argv) > 2 else "whisper-random"
+        print(f"random-init models in {random_dir}/ (timing only, nothing to transcribe)")
+    print(f"{'size':<8}{'compute':<14}{'load s':>8}{'rss MB':>9}{'model MB':>10}")
+    for size in ("tiny", "base", "small", "medium"):
+        model = _random_init(size, random_dir) if random_dir else size
+        for compute_type in ("int8", "int8_float32"):
+            out = subprocess.run([sys.executable, __file__, "--load", model, compute_type], capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"{size:<8}{compute_type:<14} failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{size:<8}{compute_type:<14}{result['load_seconds']:>8.2f}{result['rss_mb']:>9.0f}{result['model_mb']:>10.0f}")
@@ -0,0 +1,159 @@
+import json
+import math
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _coords(query: dict, lat_key: str = "latitude", lon_key: str = "longitude") -> tuple:
+    if "q" in query:
+        lat, lon = query["q"][0].split(",")
+    elif "locations" in query:
+        lat, lon = query["locations"][0].split(",")
+    else:
+        lat, lon = query.get(lat_key, ["0"])[0], query.get(lon_key, ["0"])[0]
+    return float(lat), float(lon)
+
+
+def _wave(lat: float, lon: float, salt: float = 0.0) -> float:
+    # Deterministic 0..1 value per location so repeated runs see the same data
+    return (math.sin(lat * 12.9898 + lon * 78.233 + salt) * 43758.5453) % 1.0
+
+
+def forecast_payload(lat: float, lon: float, days: int) -> dict:
+    """
+    A weatherapi.com forecast.json shaped response with `days` days of 24 hours each.
+    """
+    conditions = [(1000, "Sunny"), (1063, "Patchy rain possible"), (1195, "Heavy rain"), (1087, "Thundery outbreaks possible"), (1264, "Moderate or heavy showers of ice pellets")]
+    forecastday = []
+    start = date(2025, 6, 1)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        hours = []
+        for h in range(24):
+            w = _wave(lat, lon, d * 24 + h)
+            code, text = conditions[int(w * 40) % len(conditions)] if w > 0.8 else conditions[0]
+            hours.append({
+                "time": f"{day} {h:02d}:00",
+                "temp_c": round(15 + 20 * _wave(lat, lon, h), 1),
+                "precip_mm": round(max(0.0, w - 0.6) * 40, 2),
+                "condition": {"text": text, "code": code},
+            })
+        code, text = conditions[int(_wave(lat, lon, d) * len(conditions))]
+        forecastday.append({
+            "date": str(day),
+            "day": {
+                "maxtemp_c": max(hour["temp_c"] for hour in hours),
+                "totalprecip_mm": round(sum(hour["precip_mm"] for hour in hours), 2),
+                "condition": {"text": text, "code": code},
+            },
+            "hour": hours,
+        })
+    return {
+        "location": {"lat": lat, "lon": lon, "localtime_epoch": int(time.time())},
+        "current": {"temp_c": round(15 + 20 * _wave(lat, lon), 1), "last_updated_epoch": int(time.time())},
+        "forecast": {"forecastday": forecastday},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def setup(self):
+        super().setup()
+        with self.server.stub._lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub._lock:
+            stub.requests += 1
+            status = stub.statuses.pop(0) if stub.statuses else None
+        if status is not None:
+            self.send_error(status)
+            return
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        lat, lon = _coords(query)
+        if url.path.startswith("/soil/api"):
+            body = {"ph": f" {5.0 + 2.5 * _wave(lat, lon):.2f} "}
+        elif url.path.endswith("/current.json"):
+            body = {"current": {"temp_c": round(15 + 20 * _wave(lat, lon), 1), "last_updated_epoch": int(time.time())}}
+        elif url.path.endswith("/forecast.json"):
+            body = forecast_payload(lat, lon, int(query.get("days", ["3"])[0]))
+        elif url.path.endswith("/archive"):
+            first = date.fromisoformat(query["start_date"][0])
+            last = date.fromisoformat(query["end_date"][0])
+            days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+            body = {"daily": {
+                "time": [str(day) for day in days],
+                "precipitation_sum": [round(max(0.0, _wave(lat, lon, day.toordinal()) - 0.55) * 30, 1) for day in days],
+            }}
+        elif url.path.endswith("/lookup"):
+            body = {"results": [{"latitude": lat, "longitude": lon, "elevation": int(100 + 3000 * _wave(lat, lon, 1.0))}]}
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer:
+    """
+    Local stand-in for the soil, weatherapi, open-meteo archive and open-elevation APIs, for benchmarks.
+    Answers every request after `latency` seconds with deterministic data and counts requests and
+    TCP connections. Statuses queued in `statuses` are answered first, one per request, as errors.
+    Use as a context manager; point(module) redirects a module's *_API_URL constants here.
+    """
+
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1"):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.statuses = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def urls(self) -> dict:
+        return {
+            "SOIL_API_URL": f"{self.url}/soil/api/",
+            "WEATHER_API_URL": f"{self.url}/v1",
+            "ARCHIVE_API_URL": f"{self.url}/v1/archive",
+            "ELEVATION_API_URL": f"{self.url}/api/v1/lookup",
+        }
+
+    def point(self, *modules):
+        for module in modules:
+            for name, url in self.urls().items():
+                if hasattr(module, name):
+                    setattr(module, name, url)
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,148 @@
+import json
+import numpy as np
+import pandas as pd
+
+# (column prefix, points for the optimal range) in scoring order; any absolute-range hit scores 2, a miss -100
+FACTORS = (
+    ("Ecology_Temp", 7),
+    ("Ecology_Rainfall_Annual", 5),
+    ("Ecology_Soil_PH", 7),
+    ("Ecology_Latitude", 5),
+    ("Ecology_Altitude", 9),
+)
+SEASON_POINTS = 34
+SCORE_CHUNK_SIZE = 8192
+
+
+def month_mask(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    (13, crops) bool table, row m says which crops have month m inside [start, end];
+    windows like Nov..Feb wrap around the new year. Row 0 is unused.
+    """
+    months = np.arange(13).reshape(-1, 1)
+    plain = (start <= end) & (start <= months) & (months <= end)
+    wrapped = (start > end) & ((months >= start) | (months <= end))
+    mask = plain | wrapped
+    mask[0] = False
+    return mask
+
+
+class SuitabilityIndex:
+    """
+    The crop ecology table compiled once into a struct of arrays: (5, crops) optimal/absolute bounds
+    for temperature, rainfall, pH, latitude and altitude, plus a (13, crops) table of planting and
+    harvest points per month. Scoring is a handful of array comparisons and returns plain lists
+    (or ready JSON bytes) without building a DataFrame per request.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.names = frame["Crop"].astype(str).to_numpy()
+        self.opt_min = np.stack([frame[f"{prefix}_Optimal_Min"].to_numpy(dtype=float) for prefix, _ in FACTORS])
+        self.opt_max = np.stack([frame[f"{prefix}_Optimal_Max"].to_numpy(dtype=float) for prefix, _ in FACTORS])
+        self.abs_min = np.stack([frame[f"{prefix}_Absolute_Min"].to_numpy(dtype=float) for prefix, _ in FACTORS])
+        self.abs_max = np.stack([frame[f"{prefix}_Absolute_Max"].to_numpy(dtype=float) for prefix, _ in FACTORS])
+        self.best = np.array([points for _, points in FACTORS], dtype=np.int16).reshape(-1, 1)
+        planting = month_mask(frame["Planting_Start_Month"].to_numpy(), frame["Planting_End_Month"].to_numpy())
+        harvest = month_mask(frame["Harvesting_Start_Month"].to_numpy(), frame["Harvesting_End_Month"].to_numpy())
+        self.season = (planting * SEASON_POINTS + harvest * SEASON_POINTS).astype(np.int32)
+        # '{"Crop": "Wheat", "Score": ' per crop, so responses are assembled from bytes
+        self._json_prefix = [json.dumps({"Crop": name})[:-1].encode("utf-8") + b', "Score": ' for name in self.names]
+
+    @classmethod
+    def from_csv(cls, path: str):
+        frame = pd.read_csv(path)
+        frame.columns = frame.columns.map(str)
+        return cls(frame.loc[:, ~frame.columns.str.contains('^Unnamed')])
+
+    def __len__(self):
+        return len(self.names)
+
+    def scores(self, temp, rainfall, ph, latitude, altitude, month) -> np.ndarray:
+        """
+        int32 score per crop for one location, same rules as Bestcrop.recommend_crops.
+        """
+        values = np.array([temp, rainfall, ph, latitude, altitude], dtype=float).reshape(-1, 1)
+        optimal = (self.opt_min <= values) & (values <= self.opt_max)
+        absolute = (self.abs_min <= values) & (values <= self.abs_max)
+        points = np.where(optimal, self.best, np.where(absolute, np.int16(2), np.int16(-100)))
+        return points.sum(axis=0, dtype=np.int32) + self.season[int(month)]
+
+    def score_matrix(self, temp, rainfall, ph, latitude, altitude, month) -> np.ndarray:
+        """
+        (locations, crops) int32 scores; each argument is a scalar or a 1-D array over locations.
+        """
+        columns = [np.atleast_1d(c) for c in np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (temp, rainfall, ph, latitude, altitude)), np.asarray(month, dtype=int))]
+        months = columns.pop()
+        values = np.stack(columns, axis=1)[:, :, None]  # (locations, 5, 1)
+        out = np.empty((len(values), len(self)), dtype=np.int32)
+        for lo in range(0, len(values), SCORE_CHUNK_SIZE):
+            chunk = values[lo:lo + SCORE_CHUNK_SIZE]
+            optimal = (self.opt_min <= chunk) & (chunk <= self.opt_max)
+            absolute = (self.abs_min <= chunk) & (chunk <= self.abs_max)
+            points = np.where(optimal, self.best, np.where(absolute, np.int16(2), np.int16(-100)))
+            np.add(points.sum(axis=1, dtype=np.int32), self.season[months[lo:lo + SCORE_CHUNK_SIZE]], out=out[lo:lo + SCORE_CHUNK_SIZE])
+        return out
+
+    def _ranked(self, scores: np.ndarray):
+        # Positive scores, best first; the stable sort keeps catalogue order among ties
+        positive = np.flatnonzero(scores > 0)
+        return positive[np.argsort(-scores[positive], kind="stable")]
+
+    def recommend(self, temp, rainfall, ph, latitude, altitude, month) -> list:
+        """
+        [{"Crop": name, "Score": score}, ...] for every crop with a positive score, best first.
+        """
+        scores = self.scores(temp, rainfall, ph, latitude, altitude, month)
+        order = self._ranked(scores)
+        return [{"Crop": name, "Score": score} for name, score in zip(self.names[order].tolist(), scores[order].tolist())]
+
+    def recommend_json(self, temp, rainfall, ph, latitude, altitude, month) -> bytes:
+        """
+        The same list as recommend(), already serialized.
+        """
+        scores = self.scores(temp, rainfall, ph, latitude, altitude, month)
+        order = self._ranked(scores)
+        prefix = self._json_prefix
+        return b"[" + b", ".join(prefix[i] + b"%d}" % score for i, score in zip(order.tolist(), scores[order].tolist())) + b"]"
+
+
+if __name__ == "__main__":
+    # Microbenchmark against Bestcrop.recommend_crops plus the app's DataFrame conversion:
+    #   python suitability.py [calls]
+    import sys
+    import time
+    import Bestcrop
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = np.random.default_rng(0)
+    inputs = list(zip(rng.uniform(0, 40, calls), rng.uniform(100, 4000, calls), rng.uniform(4.5, 8.5, calls),
+                      rng.uniform(26, 31, calls), rng.uniform(60, 4500, calls), rng.integers(1, 13, calls).tolist()))
+
+    def current(*args):
+        # What /Crop_recommendation did: recommend_crops, then the DataFrame -> records conversion
+        frame = Bestcrop.recommend_crops(*args)
+        return frame.astype(object).where(pd.notnull(frame), None).to_dict(orient="records")
+
+    def timed(fn):
+        started = time.perf_counter()
+        for args in inputs:
+            fn(*args)
+        return (time.perf_counter() - started) / calls * 1e6
+
+    index = Bestcrop.crop_index
+    for args in inputs[:200]:
+        expected = {row["Crop"]: row["Score"] for row in current(*args)}
+        assert expected == {row["Crop"]: row["Score"] for row in index.recommend(*args)}
+        assert json.loads(index.recommend_json(*args)) == index.recommend(*args)
+
+    print(f"{len(index)} crops")
+    print(f"  recommend_crops + to_dict : {timed(current):8.1f} us/call")
+    print(f"  index.recommend           : {timed(index.recommend):8.1f} us/call")
+    print(f"  index.recommend + dumps   : {timed(lambda *a: json.dumps(index.recommend(*a))):8.1f} us/call")
+    print(f"  index.recommend_json      : {timed(index.recommend_json):8.1f} us/call")
+
+    # A catalogue of a few thousand varieties: the ecology table repeated
+    big = SuitabilityIndex(pd.concat([Bestcrop.df] * 50, ignore_index=True))
+    print(f"{len(big)} crops")
+    print(f"  index.recommend           : {timed(big.recommend):8.1f} us/call")
+    print(f"  index.recommend_json      : {timed(big.recommend_json):8.1f} us/call")
@@ -0,0 +1,47 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend runs from be/ (uvicorn app:app): modules import each other by name and read Datasets/ by relative path
+BE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BE_DIR))
+os.chdir(BE_DIR)
+
+from io import BytesIO
+import pytest
+
+
+def jpeg_bytes(color=(40, 160, 60), size=(320, 240), seed=0) -> bytes:
+    # A noisy photo-sized JPEG, so cutting it short leaves a valid header but unreadable pixel data
+    import numpy as np
+    from PIL import Image
+
+    noise = np.random.default_rng(seed).integers(-30, 30, (size[1], size[0], 3))
+    pixels = np.clip(np.array(color) + noise, 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fake_registry():
+    """
+    A ready DiseaseModelRegistry with the real preprocessor and a stand-in model (the checkpoint
+    weights are not in the repo): the top label follows the image's mean green value.
+    """
+    import torch
+    from Diseasedetect import CHECKPOINT_PATH, DiseaseModelRegistry, ImagePreprocessor, LABEL_MAP
+
+    class Config:
+        id2label = {i: f"LABEL_{i}" for i in range(len(LABEL_MAP))}
+
+    def backend(pixel_values):
+        labels = ((pixel_values[:, 1].mean(dim=(1, 2)) + 1) * 8).clamp(0, len(LABEL_MAP) - 1).long()
+        return torch.nn.functional.one_hot(labels, len(LABEL_MAP)).float() * 10
+
+    registry = DiseaseModelRegistry()
+    registry.preprocessor = ImagePreprocessor(CHECKPOINT_PATH / "preprocessor_config.json")
+    registry.config = Config()
+    registry.backend = backend
+    registry.ready = True
+    return registry
@@ -0,0 +1,97 @@
+import asyncio
+import alertjob
+from alertjob import NOTICE_SOURCE, AlertJob, last_run_stats
+from forecastalerts import FORECAST_TILE_DEGREES
+from geocache import tile_center, tile_of
+from stubserver import forecast_payload
+
+
+class MemoryFarmers:
+    def __init__(self, rows):
+        self.rows = {row["id"]: row for row in rows}
+        self.updates = 0
+
+    def load(self):
+        return [dict(row) for row in self.rows.values()]
+
+    def notices(self, ids):
+        return {user_id: self.rows[user_id]["notices"] for user_id in ids}
+
+    def write(self, notices, ids):
+        self.updates += 1
+        for user_id in ids:
+            self.rows[user_id]["notices"] = notices
+
+
+def _farmers():
+    return MemoryFarmers([
+        {"id": i, "latitude": 27.70 + (i % 3) * 0.2, "longitude": 85.30 + (i % 3) * 0.2, "notices": None}
+        for i in range(30)
+    ])
+
+
+def test_notices_added_during_the_run_are_kept(tmp_path, monkeypatch):
+    farmers = _farmers()
+    requested = []
+
+    async def fake_fetch(lat, lon, days):
+        requested.append((lat, lon))
+        if not farmers.rows[4]["notices"]:
+            # Another part of the app writes a notice after the job loaded the table
+            farmers.rows[4]["notices"] = [{"title": "Order", "message": "Your tomatoes sold", "source": "market"}]
+        return forecast_payload(lat, lon, days)
+
+    monkeypatch.setattr(alertjob, "fetch_forecast", fake_fetch)
+    job = AlertJob(farmers, days=7, rate=1000, stats_path=tmp_path / "stats.json")
+    result = asyncio.run(job.run())
+
+    notices = farmers.rows[4]["notices"]
+    assert notices[0]["source"] == "market"
+    assert notices[1:] and all(notice["source"] == NOTICE_SOURCE for notice in notices[1:])
+    # Tiles come from geocache.tile_of, like ForecastCache's
+    expected = {tile_center(tile_of(row["latitude"], row["longitude"], FORECAST_TILE_DEGREES), FORECAST_TILE_DEGREES) for row in farmers.rows.values()}
+    assert set(requested) == expected and result["tiles"] == len(expected)
+
+    # A second run with unchanged forecasts writes nothing and keeps the other notice
+    again = asyncio.run(job.run())
+    assert again["farmers_updated"] == 0 and again["update_calls"] == 0
+    assert farmers.rows[4]["notices"] == notices
+
+
+def test_last_run_is_left_for_metrics(tmp_path, monkeypatch):
+    async def fake_fetch(lat, lon, days):
+        return forecast_payload(lat, lon, days)
+
+    monkeypatch.setattr(alertjob, "fetch_forecast", fake_fetch)
+    path = tmp_path / "stats.json"
+    assert last_run_stats(path) is None
+    job = AlertJob(_farmers(), days=3, rate=1000, stats_path=path)
+    asyncio.run(job.run())
+    stored = last_run_stats(path)
+    assert stored == job.stats()
+    assert stored["runs"] == 1 and stored["last_run"]["farmers"] == 30
+
+
+def test_failed_forecast_tiles_are_reported_with_the_tile(tmp_path, monkeypatch):
+    farmers = _farmers()
+    failing = tile_center(tile_of(27.70, 85.30, FORECAST_TILE_DEGREES), FORECAST_TILE_DEGREES)
+
+    async def fake_fetch(lat, lon, days):
+        if (lat, lon) == failing:
+            raise RuntimeError("weatherapi 503")
+        return forecast_payload(lat, lon, days)
+
+    monkeypatch.setattr(alertjob, "fetch_forecast", fake_fetch)
+    job = AlertJob(farmers, days=3, rate=1000, stats_path=tmp_path / "stats.json")
+    result = asyncio.run(job.run())
+
+    assert result["forecast_failures"] == 1
+    assert result["failed_tiles"] == [{
+        "tile": list(tile_of(27.70, 85.30, FORECAST_TILE_DEGREES)),
+        "center": list(failing),
+        "error": "weatherapi 503",
+    }]
+    # The farmers on that tile keep their notices; the others are updated
+    assert result["farmers_skipped"] == 10 and result["farmers_updated"] == 20
+    assert all(farmers.rows[i]["notices"] is None for i in range(0, 30, 3))
+    assert last_run_stats(tmp_path / "stats.json")["last_run"]["failed_tiles"] == result["failed_tiles"]
@@ -0,0 +1,85 @@
+import asyncio
+import time
+import pytest
+import Bestcrop
+from Bestcrop import crop_index, get_bulk_recommendations, location_conditions
+from geocache import tile_of
+
+# Plots in a 3 x 4 block of tiles, several per tile
+LOCATIONS = [(27.6 + i * 0.004, 84.9 + j * 0.006) for i in range(7) for j in range(6)]
+
+
+def conditions_of(lat, lon):
+    # Deterministic per tile, like the cached fetches that answer for the tile centre
+    a, b = tile_of(lat, lon)
+    return {"weather": (a * 7 + b * 3) % 35, "rainfall": 200 + (a * 13 + b * 29) % 3000, "soil_ph": 5 + (a + b) % 30 / 10, "altitude": (a * 37 + b * 11) % 3000}
+
+
+@pytest.fixture
+def fake_fetches(monkeypatch):
+    calls = []
+    slow_tiles, failing_tiles = set(), set()
+
+    def fake(source):
+        async def fetch(lat, lon):
+            calls.append((source, tile_of(lat, lon)))
+            if tile_of(lat, lon) in slow_tiles:
+                await asyncio.sleep(1)
+            if tile_of(lat, lon) in failing_tiles:
+                raise ValueError(f"{source} unavailable")
+            return conditions_of(lat, lon)[source]
+
+        return fetch
+
+    for name, source in (("fetch_weather", "weather"), ("fetch_rainfall", "rainfall"), ("fetch_soil_ph", "soil_ph"), ("fetch_altitude", "altitude")):
+        monkeypatch.setattr(Bestcrop, name, fake(source))
+    return calls, slow_tiles, failing_tiles
+
+
+def test_bulk_matches_single_location_recommendations(fake_fetches):
+    calls, _, _ = fake_fetches
+
+    async def main():
+        bulk = await get_bulk_recommendations(LOCATIONS, top_n=5, month=7)
+        single = []
+        for lat, lon in LOCATIONS:
+            conditions = await location_conditions(lat, lon)
+            single.append(crop_index.recommend(**dict(conditions, month=7))[:5])
+        return bulk, single
+
+    bulk, single = asyncio.run(main())
+    assert [(row["lat"], row["lon"]) for row in bulk] == LOCATIONS
+    assert [row["recommendations"] for row in bulk] == single
+    assert any(single)
+    # The bulk pass looked each tile up once
+    tiles = {tile_of(lat, lon) for lat, lon in LOCATIONS}
+    assert len(calls) == 4 * len(tiles) + 4 * len(LOCATIONS)
+
+
+def test_failing_tiles_only_fail_their_plots(fake_fetches):
+    _, _, failing_tiles = fake_fetches
+    failing_tiles.add(tile_of(*LOCATIONS[0]))
+    results = asyncio.run(get_bulk_recommendations(LOCATIONS, month=7))
+    failed = [row for row in results if "error" in row]
+    assert failed and all(tile_of(row["lat"], row["lon"]) == tile_of(*LOCATIONS[0]) for row in failed)
+    assert {row["error"] for row in failed} == {"weather unavailable"}
+    assert all(row["recommendations"] is not None for row in results if "error" not in row)
+
+
+def test_unfinished_tiles_time_out_by_the_deadline(fake_fetches):
+    calls, slow_tiles, _ = fake_fetches
+    slow = tile_of(*LOCATIONS[-1])
+    slow_tiles.add(slow)
+
+    async def main():
+        started = time.perf_counter()
+        results = await get_bulk_recommendations(LOCATIONS, month=7, deadline=0.2)
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    assert elapsed < 0.5
+    for row in results:
+        if tile_of(row["lat"], row["lon"]) == slow:
+            assert row == {"lat": row["lat"], "lon": row["lon"], "error": "timeout"}
+        else:
+            assert row["recommendations"] is not None
@@ -0,0 +1,89 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from Cropinfo import CropCatalogue, df, df1, etag_matches, get_crop_info, normalize_crop_name, optimal_columns_df
+
+
+@pytest.fixture(scope="module")
+def catalogue():
+    return CropCatalogue(df, df1)
+
+
+def crop_of(entry) -> str:
+    return json.loads(entry[0])[0]["Crop"]
+
+
+@pytest.mark.parametrize("name, crop", [
+    ("corn", "Maize"),
+    ("lady finger", "Okra"),
+    ("Lady_Finger", "Okra"),
+    ("  WHEAT ", "Wheat"),
+    ("paddy", "Rice"),
+])
+def test_lookup_by_name_or_alias(catalogue, name, crop):
+    assert crop_of(catalogue.lookup(name)) == crop
+
+
+def test_unknown_names_are_counted_as_misses(catalogue):
+    before = catalogue.stats()
+    assert catalogue.lookup("dragon fruit tree") is None
+    assert catalogue.stats()["misses"] == before["misses"] + 1
+
+
+def test_bodies_match_get_crop_info(catalogue):
+    names = sorted(set(df["Crop"]) | set(df1["Crop"]))
+    assert len(catalogue.entries) == len(names)
+    for name in names:
+        frame = get_crop_info(name).astype(object)
+        old = json.loads(json.dumps(frame.where(frame.notna(), None).to_dict(orient="records")))
+        new = json.loads(catalogue.lookup(name)[0])
+        if normalize_crop_name(name) in set(map(normalize_crop_name, df["Crop"])):
+            assert new == old, name
+        else:
+            # Fertilizer-only crops: the old concat had no Crop or ecology columns; the catalogue fills them in
+            assert [{k: v for k, v in row.items() if k in old[0]} for row in new] == old
+            assert new[0]["Crop"] == name and all(new[0][c] is None for c in optimal_columns_df[1:])
+
+
+def test_etags_are_stable_and_distinct(catalogue):
+    etags = [etag for _, etag in catalogue.entries.values()]
+    assert len(set(etags)) == len(etags)
+    assert CropCatalogue(df, df1).lookup("wheat")[1] == catalogue.lookup("wheat")[1]
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.fixture
+def client():
+    import app
+
+    # No context manager: the startup hooks are not run
+    return TestClient(app.app)
+
+
+def test_crop_info_endpoint(client):
+    response = client.get("/Crop_info", params={"name": "corn"})
+    assert response.status_code == 200
+    assert response.json()[0]["Crop"] == "Maize"
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and response.headers["cache-control"] == "public, max-age=86400"
+
+    for if_none_match in (etag, "W/" + etag, f'"stale", {etag}'):
+        response = client.get("/Crop_info", params={"name": "Maize"}, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304 and response.headers["etag"] == etag and not response.content
+
+    response = client.get("/Crop_info", params={"name": "corn"}, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200 and response.headers["etag"] == etag
+
+
+def test_crop_info_endpoint_unknown_crop(client):
+    response = client.get("/Crop_info", params={"name": "qwzxv"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Crop 'qwzxv' not found in either dataset."
@@ -0,0 +1,35 @@
+import pytest
+from cropsearch import crop_search
+
+
+@pytest.mark.parametrize("query", ["b", "a", "to", "ma", "आ"])
+def test_ranking_does_not_depend_on_limit(query):
+    wide = crop_search.search(query, 8)
+    for limit in range(1, 8):
+        assert crop_search.search(query, limit) == wide[:limit]
+
+
+def test_crop_names_rank_above_aliases_among_prefix_hits():
+    assert crop_search.search("to", 1)[0]["crop"] == "Tomato"
+    assert [hit["crop"] for hit in crop_search.search("to", 8)][:2] == ["Tomato", "Tobacco"]
+
+
+@pytest.mark.parametrize("query, crop", [
+    ("tomato", "Tomato"), ("tom", "Tomato"), ("tamatar", "Tomato"), ("tomatoe", "Tomato"), ("आलु", "Potato"),
+])
+def test_best(query, crop):
+    assert crop_search.best(query) == crop
+
+
+@pytest.mark.parametrize("query", ["a", "b", "o", "to"])
+def test_best_ignores_short_prefixes(query):
+    assert crop_search.best(query) is None
+
+
+def test_crop_info_needs_a_real_match():
+    from fastapi.testclient import TestClient
+    import app
+
+    client = TestClient(app.app)
+    assert client.get("/Crop_info", params={"name": "a"}).status_code == 404
+    assert client.get("/Crop_info", params={"name": "tamatar"}).status_code == 200
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import pytest
+import dashboard
+from dashboard import DashboardFanout
+from geocache import GeoCache
+
+LAT, LON = 27.7168, 85.3240
+
+
+def fetch_after(delay, value=None, error=None, done=None):
+    async def fetch(lat, lon):
+        await asyncio.sleep(delay)
+        if done is not None:
+            done.append((lat, lon))
+        if error is not None:
+            raise error
+        return value
+
+    return fetch
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = GeoCache(ttls={"weather": 0.01, "rainfall": 0.01, "soil_ph": 0.01, "altitude": 0.01})
+    monkeypatch.setattr(dashboard, "geocache", cache)
+    return cache
+
+
+def test_all_fields_arrive(cache):
+    fanout = DashboardFanout({
+        "temperature": ("weather", fetch_after(0.01, 24.5), 1, None, None),
+        "altitude": ("altitude", fetch_after(0.02, 1340), 1, None, None),
+    }, deadline=1)
+    result = asyncio.run(fanout.collect(LAT, LON))
+    assert result["weather"] == {"temperature": 24.5, "altitude": 1340}
+    assert result["status"] == {"temperature": {"state": "ok"}, "altitude": {"state": "ok"}}
+    assert fanout.stats()["complete"] == 1
+
+
+def test_slow_sources_fall_back_to_stale_default_or_missing(cache):
+    cache.set("rainfall", LAT, LON, 812.0)
+    time.sleep(0.02)  # past its TTL, only available through stale()
+    fanout = DashboardFanout({
+        "rainfall": ("rainfall", fetch_after(1), 0.05, None, None),
+        "soil_ph": ("soil_ph", fetch_after(1), 0.05, None, 6.1),
+        "altitude": ("altitude", fetch_after(1), 0.05, None, None),
+    }, deadline=1)
+    result = asyncio.run(fanout.collect(LAT, LON))
+    assert result["weather"] == {"rainfall": 812.0, "soil_ph": 6.1, "altitude": None}
+    assert result["status"]["rainfall"] == {"state": "stale", "age_seconds": 0, "error": "timeout"}
+    assert result["status"]["soil_ph"] == {"state": "default", "error": "timeout"}
+    assert result["status"]["altitude"] == {"state": "missing", "error": "timeout"}
+    assert fanout.stats()["fields"]["rainfall"]["stale"] == 1
+
+
+def test_stale_values_older_than_the_limit_are_not_used(cache, monkeypatch):
+    cache.set("weather", LAT, LON, 30.0)
+    stored = time.time()
+    monkeypatch.setattr(time, "time", lambda: stored + 7 * 3600)
+    fanout = DashboardFanout({"temperature": ("weather", fetch_after(1), 0.05, 6 * 3600, None)}, deadline=1)
+    result = asyncio.run(fanout.collect(LAT, LON))
+    assert result["status"]["temperature"] == {"state": "missing", "error": "timeout"}
+
+
+def test_a_source_that_raises_only_affects_its_field(cache):
+    fanout = DashboardFanout({
+        "temperature": ("weather", fetch_after(0.01, 24.5), 1, None, None),
+        "soil_ph": ("soil_ph", fetch_after(0.01, error=RuntimeError("soil API 502")), 1, None, 6.1),
+        "altitude": ("altitude", fetch_after(0.01, error=ValueError()), 1, None, None),
+    }, deadline=1)
+    result = asyncio.run(fanout.collect(LAT, LON))
+    assert result["weather"] == {"temperature": 24.5, "soil_ph": 6.1, "altitude": None}
+    assert result["status"]["soil_ph"] == {"state": "default", "error": "soil API 502"}
+    assert result["status"]["altitude"] == {"state": "missing", "error": "ValueError"}
+    assert fanout.stats()["complete"] == 0
+
+
+def test_the_response_is_sent_by_the_deadline(cache):
+    finished = []
+    fanout = DashboardFanout({
+        field: (field, fetch_after(0.3, 1.0, done=finished), 5, None, None)
+        for field in ("weather", "rainfall", "soil_ph", "altitude")
+    }, deadline=0.1)
+
+    async def main():
+        started = time.perf_counter()
+        result = await fanout.collect(LAT, LON)
+        elapsed = time.perf_counter() - started
+        assert not finished
+        await asyncio.sleep(0.3)  # the late fetches keep running to warm the cache
+        return result, elapsed
+
+    result, elapsed = asyncio.run(main())
+    assert elapsed < 0.2
+    assert result["elapsed_ms"] < 200
+    assert all(status == {"state": "missing", "error": "timeout"} for status in result["status"].values())
+    assert len(finished) == 4
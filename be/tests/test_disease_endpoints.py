@@ -0,0 +1,99 @@
+import pytest
+from fastapi.testclient import TestClient
+from conftest import jpeg_bytes
+from Diseasedetect import DiseaseResultCache
+from diseasebatcher import DiseaseInferenceBatcher
+
+
+@pytest.fixture
+def client(fake_registry, monkeypatch):
+    import app
+
+    batcher = DiseaseInferenceBatcher(fake_registry, max_wait_ms=5)
+    monkeypatch.setattr(app, "disease_registry", fake_registry)
+    monkeypatch.setattr(app, "disease_batcher", batcher)
+    monkeypatch.setattr(app, "disease_cache", DiseaseResultCache())
+    batcher.start()
+    # No context manager: the startup hooks (model loading, Supabase) are not run
+    yield TestClient(app.app)
+    batcher.stop()
+
+
+def test_single_detection_rejects_truncated_image(client):
+    data = jpeg_bytes()
+    response = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("leaf.jpg", data[:len(data) // 3], "image/jpeg")})
+    assert response.status_code == 400
+
+    response = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("leaf.jpg", data, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json()["disease_detected"]
+
+
+def test_batch_detection_reports_bad_files_per_image(client):
+    good, other = jpeg_bytes((40, 160, 60)), jpeg_bytes((200, 40, 40), seed=1)
+    files = [
+        ("images", ("good.jpg", good, "image/jpeg")),
+        ("images", ("truncated.jpg", good[:len(good) // 3], "image/jpeg")),
+        ("images", ("notes.txt", b"not an image", "text/plain")),
+        ("images", ("garbage.jpg", b"\xff\xd8 definitely not a jpeg", "image/jpeg")),
+        ("images", ("other.jpg", other, "image/jpeg")),
+    ]
+    response = client.post("/disease_detection/batch/?top_k=2", files=files)
+    assert response.status_code == 200
+    results = {result["filename"]: result for result in response.json()["results"]}
+    assert list(results) == ["good.jpg", "truncated.jpg", "notes.txt", "garbage.jpg", "other.jpg"]
+    for name in ("truncated.jpg", "notes.txt", "garbage.jpg"):
+        assert "error" in results[name] and "predictions" not in results[name]
+    for name in ("good.jpg", "other.jpg"):
+        assert len(results[name]["predictions"]) == 2
+    # Different inputs, different top label: rows were not mixed up between images
+    assert results["good.jpg"]["predictions"][0] != results["other.jpg"]["predictions"][0]
+
+
+def test_batch_detection_goes_through_the_batcher(client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app.asyncio, "to_thread", _only_decode(app.asyncio.to_thread, app.disease_registry))
+    files = [("images", (f"{i}.jpg", jpeg_bytes(seed=i), "image/jpeg")) for i in range(5)]
+    assert client.post("/disease_detection/batch/", files=files).status_code == 200
+    assert app.disease_batcher.stats()["items"] == 5
+
+
+def _only_decode(to_thread, registry):
+    # Fails the test if inference is pushed onto the default thread pool instead of the batcher
+    async def guarded(fn, *args, **kwargs):
+        assert fn == registry.preprocessor.decode, f"unexpected to_thread({fn})"
+        return await to_thread(fn, *args, **kwargs)
+
+    return guarded
+
+
+def test_near_duplicate_hit_is_not_re_stored(client):
+    import app
+
+    data = jpeg_bytes(seed=3)
+    assert client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("a.jpg", data, "image/jpeg")}).status_code == 200
+    # Same pixels, different bytes: served from the perceptual hash, and only cached by its bytes
+    recompressed = data + b"\x00"
+    assert client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("b.jpg", recompressed, "image/jpeg")}).status_code == 200
+    assert app.disease_cache.near_hits == 1
+    assert len(app.disease_cache.perceptual) == 1
+    assert app.disease_batcher.stats()["items"] == 1
+
+
+def test_cached_answers_are_served_while_the_model_loads(client, fake_registry):
+    import app
+
+    data = jpeg_bytes(seed=4)
+    first = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("a.jpg", data, "image/jpeg")})
+    assert first.status_code == 200
+
+    fake_registry.ready = False  # e.g. a model reload
+    again = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("a.jpg", data, "image/jpeg")})
+    assert again.status_code == 200 and again.json()["disease_detected"] == first.json()["disease_detected"]
+    near = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("b.jpg", data + b"\x00", "image/jpeg")})
+    assert near.status_code == 200
+
+    miss = client.post("/disease_detection/?lat=27.7&lon=85.3", files={"image": ("c.jpg", jpeg_bytes((200, 40, 40), seed=5), "image/jpeg")})
+    assert miss.status_code == 503
+    assert app.disease_batcher.stats()["items"] == 1
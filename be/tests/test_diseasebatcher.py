@@ -0,0 +1,38 @@
+import asyncio
+from io import BytesIO
+import pytest
+from PIL import Image
+from conftest import jpeg_bytes
+from diseasebatcher import DiseaseInferenceBatcher
+
+
+async def _classify_together(batcher, images):
+    return await asyncio.gather(*(batcher.submit(image) for image in images), return_exceptions=True)
+
+
+def test_corrupt_image_fails_only_its_own_request(fake_registry):
+    good = jpeg_bytes()
+    truncated = good[:len(good) // 3]
+    images = [Image.open(BytesIO(data)) for data in (good, truncated, good)]
+    batcher = DiseaseInferenceBatcher(fake_registry, max_batch_size=8, max_wait_ms=50)
+    batcher.start()
+    try:
+        results = asyncio.run(_classify_together(batcher, images))
+    finally:
+        batcher.stop()
+
+    assert isinstance(results[1], OSError)
+    assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+    assert results[0].argmax() == results[2].argmax()
+    assert batcher.stats()["isolated_failures"] == 1
+
+
+def test_single_failure_is_reported_once(fake_registry):
+    batcher = DiseaseInferenceBatcher(fake_registry, max_batch_size=1)
+    batcher.start()
+    try:
+        with pytest.raises(OSError):
+            asyncio.run(batcher.submit(Image.open(BytesIO(jpeg_bytes()[:200]))))
+    finally:
+        batcher.stop()
+    assert batcher.stats()["isolated_failures"] == 0
@@ -0,0 +1,66 @@
+import threading
+from Diseasedetect import DiseaseModelRegistry
+
+
+def test_background_load_retries_until_it_succeeds(monkeypatch):
+    registry = DiseaseModelRegistry(checkpoint_path="/nonexistent")
+    attempts = []
+
+    def flaky_load():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("checkpoint not mounted yet")
+        registry.ready = True
+
+    monkeypatch.setattr(registry, "load", flaky_load)
+    registry.load_in_background(retry_seconds=0.01)
+    registry._loader.join(timeout=5)
+    assert registry.ready
+    assert len(attempts) == 3
+
+
+def test_load_in_background_starts_one_loader(monkeypatch):
+    registry = DiseaseModelRegistry(checkpoint_path="/nonexistent")
+    release = threading.Event()
+    monkeypatch.setattr(registry, "load", lambda: (release.wait(5), setattr(registry, "ready", True)))
+    registry.load_in_background()
+    loader = registry._loader
+    registry.load_in_background()
+    assert registry._loader is loader
+    release.set()
+    loader.join(timeout=5)
+    registry.load_in_background()
+    assert registry._loader is loader  # ready: nothing new is started
+
+
+def test_similar_lookup_matches_a_full_scan():
+    import random
+    from Diseasedetect import DiseaseResultCache
+
+    rng = random.Random(0)
+    cache = DiseaseResultCache(max_distance=4)
+    stored = [rng.getrandbits(64) for _ in range(300)]
+    for i, phash in enumerate(stored):
+        cache.set(f"key{i}", phash, f"label{i}")
+    for i, phash in enumerate(stored[:100]):
+        flips = rng.sample(range(64), rng.randint(0, 6))
+        query = phash
+        for bit in flips:
+            query ^= 1 << bit
+        expected = min(
+            ((query ^ other).bit_count(), j) for j, other in enumerate(stored) if (query ^ other).bit_count() <= 4
+        ) if len(flips) <= 4 else None
+        assert cache.get_similar(query) == (f"label{expected[1]}" if expected else None)
+
+
+def test_near_match_is_not_indexed_under_the_new_hash():
+    from Diseasedetect import DiseaseResultCache
+
+    cache = DiseaseResultCache(max_distance=4)
+    cache.set("original", 0, "Tomato___Late_blight")
+    near = 0b1111  # 4 bits from the original
+    assert cache.get_similar(near) == "Tomato___Late_blight"
+    cache.set("near", None, "Tomato___Late_blight")
+    # 8 bits from the original, 4 from the near copy: must not chain through it
+    assert cache.get_similar(0b11111111) is None
+    assert cache.get("near") == "Tomato___Late_blight"
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import diseaseinfo
+from Diseasedetect import LABEL_MAP
+from diseaseinfo import DETAIL_FIELDS, DiseaseKnowledgeStore
+
+
+def test_shipped_knowledge_covers_every_label():
+    store = DiseaseKnowledgeStore()
+    for label in LABEL_MAP.values():
+        assert set(DETAIL_FIELDS) <= set(store.entries[label]), label
+        assert store.entries[label]["Solution"]
+        # Hand-written seeds are never fresh: the first request fetches a sourced answer
+        assert store.entries[label].get("seed") and not store.is_fresh(label)
+
+
+def test_concurrent_refreshes_save_snapshots_one_at_a_time(tmp_path, monkeypatch):
+    store = DiseaseKnowledgeStore(path=tmp_path / "knowledge.json")
+    saved = []
+    save = store.save
+
+    def recording_save(entries=None):
+        assert entries is not store.entries  # a snapshot, not the dict the event loop mutates
+        saved.append(len(entries))
+        save(entries)
+
+    async def fake_fetch(name, use_cache=True):
+        await asyncio.sleep(0)
+        return {"Solution": f"treat {name}", "Sources": []}
+
+    monkeypatch.setattr(store, "save", recording_save)
+    monkeypatch.setattr(diseaseinfo, "fetch_details", fake_fetch)
+
+    async def refresh_all():
+        await asyncio.gather(*(store.refresh(label) for label in LABEL_MAP.values()))
+
+    asyncio.run(refresh_all())
+    # Serialized saves: each snapshot includes everything stored before it, the last one everything
+    assert saved == sorted(saved) and saved[-1] == len(LABEL_MAP)
+    on_disk = json.loads((tmp_path / "knowledge.json").read_text(encoding="utf-8"))
+    assert set(on_disk) == set(LABEL_MAP.values())
+    assert list(tmp_path.iterdir()) == [tmp_path / "knowledge.json"]
+
+
+def test_force_bypasses_the_llm_cache(tmp_path, monkeypatch):
+    store = DiseaseKnowledgeStore(path=tmp_path / "knowledge.json")
+    calls = []
+
+    async def fake_search(prompt, use_cache=True):
+        calls.append(use_cache)
+        return '{"Solution": "spray", "Sources": []}'
+
+    monkeypatch.setattr(diseaseinfo, "grounded_search_async", fake_search)
+    label = LABEL_MAP["LABEL_15"]
+    assert asyncio.run(store.refresh(label))
+    assert asyncio.run(store.refresh(label, force=True))
+    assert calls == [True, False]
@@ -0,0 +1,85 @@
+import random
+import pytest
+from forecastalerts import NO_ALERTS, ForecastFrame, evaluate, validate_rules
+from stubserver import forecast_payload
+
+
+def nested_loops(forecast_data):
+    # The analyzer weatherforecast.py used before the rules became data
+    alerts = []
+    for day in forecast_data["forecast"]["forecastday"]:
+        date = day["date"]
+        day_data = day["day"]
+        max_temp = day_data["maxtemp_c"]
+        total_precip = day_data["totalprecip_mm"]
+        condition_text = day_data["condition"]["text"].lower()
+        condition_code = day_data["condition"]["code"]
+        if total_precip > 20:
+            alerts.append(f"Alert for {date}: Heavy rain expected ({total_precip} mm). Take precautions for flooding.")
+        elif total_precip < 1 and max_temp > 30:
+            alerts.append(f"Alert for {date}: Dry and hot conditions (Precip: {total_precip} mm, Temp: {max_temp}°C). Monitor irrigation.")
+        if "hail" in condition_text or condition_code in [1246, 1264, 1276]:
+            alerts.append(f"Alert for {date}: Possible hail ({condition_text}). Protect crops with covers.")
+        for hour in day["hour"]:
+            hour_time = hour["time"]
+            hour_precip = hour["precip_mm"]
+            hour_condition = hour["condition"]["text"].lower()
+            if hour_precip > 10:
+                alerts.append(f"Alert for {hour_time}: Sudden heavy rain expected ({hour_precip} mm).")
+            if "thunderstorm" in hour_condition:
+                alerts.append(f"Alert for {hour_time}: Thunderstorm possible. Secure outdoor equipment.")
+    return alerts if alerts else [NO_ALERTS]
+
+
+def _payloads(count, days=7, seed=0):
+    rng = random.Random(seed)
+    extra = [(1087, "Thunderstorm nearby"), (1276, "Moderate or heavy rain with thunder"), (1237, "Light HAIL showers")]
+    payloads = []
+    for i in range(count):
+        payload = forecast_payload(27.0 + i * 0.013, 84.0 + i * 0.017, days)
+        for day in payload["forecast"]["forecastday"]:
+            if rng.random() < 0.2:
+                day["day"]["condition"] = dict(zip(("code", "text"), rng.choice(extra)))
+            if rng.random() < 0.2:
+                day["day"]["totalprecip_mm"] = rng.choice([0, 0.5, 25])
+                day["day"]["maxtemp_c"] = rng.choice([29, 31.5, 35])
+            for hour in day["hour"]:
+                if rng.random() < 0.03:
+                    hour["condition"] = dict(zip(("code", "text"), rng.choice(extra)))
+                    hour["precip_mm"] = rng.choice([10, 12])
+        payloads.append(payload)
+    return payloads
+
+
+def test_single_forecasts_match_the_nested_loops():
+    for payload in _payloads(60):
+        assert evaluate(ForecastFrame.from_payload(payload)) == [nested_loops(payload)]
+
+
+def test_stacked_forecasts_match_the_nested_loops():
+    payloads = _payloads(40, seed=1)
+    # A quiet forecast in the middle must keep its NO_ALERTS slot
+    quiet = forecast_payload(27.0, 84.0, 2)
+    for day in quiet["forecast"]["forecastday"]:
+        day["day"].update(totalprecip_mm=5, maxtemp_c=20, condition={"text": "Sunny", "code": 1000})
+        for hour in day["hour"]:
+            hour.update(precip_mm=0, condition={"text": "Sunny", "code": 1000})
+    payloads.insert(20, quiet)
+    frames = [ForecastFrame.from_payload(payload) for payload in payloads]
+    assert evaluate(ForecastFrame.concat(frames)) == [nested_loops(payload) for payload in payloads]
+    assert evaluate(frames[20]) == [[NO_ALERTS]]
+
+
+@pytest.mark.parametrize("rules", [
+    [{"scope": "day", "message": "x"}],
+    [{"name": "a", "scope": "day", "message": "x"}, {"name": "a", "scope": "day", "message": "y"}],
+    [{"name": "a", "scope": "week", "message": "x"}],
+    [{"name": "a", "scope": "day"}],
+    [{"name": "a", "scope": "day", "all": [["humidity", ">", 80]], "message": "x"}],
+    [{"name": "a", "scope": "hour", "message": "{max_temp}"}],
+    [{"name": "a", "scope": "day", "unless": "b", "message": "x"}],
+    ["not a rule"],
+])
+def test_invalid_rules_raise_value_error(rules):
+    with pytest.raises(ValueError):
+        validate_rules(rules)
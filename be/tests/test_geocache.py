@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+from geocache import GeoCache, tile_center, tile_of
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Wall clock for stored_at / expires_at; the in-memory TTLs run on time.monotonic and are left alone
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_each_source_expires_on_its_own_ttl():
+    cache = GeoCache(ttls={"weather": 0.05, "altitude": 60})
+    cache.set("weather", 12.97, 77.59, {"temp": 31})
+    cache.set("altitude", 12.97, 77.59, 920)
+    assert cache.get("weather", 12.97, 77.59) == {"temp": 31}
+    time.sleep(0.08)
+    assert cache.get("weather", 12.97, 77.59) is None
+    assert cache.get("altitude", 12.97, 77.59) == 920
+    assert cache.stats()["sources"]["weather"] == {"memory_hits": 1, "persistent_hits": 0, "misses": 1}
+
+
+def test_points_in_one_tile_share_a_value():
+    cache = GeoCache(tile_degrees=0.01)
+    cache.set("soil_ph", 12.971, 77.591, 6.4)
+    assert cache.get("soil_ph", 12.979, 77.599) == 6.4
+    assert cache.get("soil_ph", 12.981, 77.599) is None  # next tile north
+
+
+def test_least_recently_used_tile_is_evicted_first():
+    cache = GeoCache(maxsize=2)
+    cache.set("altitude", 10.005, 70.005, 1)
+    cache.set("altitude", 11.005, 71.005, 2)
+    assert cache.get("altitude", 10.005, 70.005) == 1  # touch the first tile
+    cache.set("altitude", 12.005, 72.005, 3)
+    assert cache.get("altitude", 11.005, 71.005) is None
+    assert cache.get("altitude", 10.005, 70.005) == 1
+    assert cache.get("altitude", 12.005, 72.005) == 3
+    assert cache.memory.stats()["evictions"] == 1
+
+
+def test_sqlite_tier_survives_a_new_instance(tmp_path):
+    db = str(tmp_path / "geo.db")
+    first = GeoCache(db_path=db)
+    first.set("altitude", 12.97, 77.59, 920)
+    first.close()
+
+    second = GeoCache(db_path=db)
+    assert second.get("altitude", 12.97, 77.59) == 920
+    assert second.get("altitude", 12.97, 77.59) == 920  # promoted into memory
+    assert second.stats()["sources"]["altitude"] == {"memory_hits": 1, "persistent_hits": 1, "misses": 0}
+    assert second.stats()["persistent_rows"] == 1
+    second.close()
+
+
+def test_expired_sqlite_rows_are_only_a_stale_fallback(tmp_path, clock):
+    db = str(tmp_path / "geo.db")
+    first = GeoCache(db_path=db, ttls={"rainfall": 3600})
+    first.set("rainfall", 12.97, 77.59, 4.2)
+    first.close()
+
+    clock[0] += 5400
+    second = GeoCache(db_path=db, ttls={"rainfall": 3600})
+    assert second.get("rainfall", 12.97, 77.59) is None
+    assert second.stale("rainfall", 12.97, 77.59) == (4.2, 5400)
+    second.close()
+
+
+def test_stale_reports_age_after_the_ttl(clock):
+    cache = GeoCache(ttls={"weather": 0.05})
+    assert cache.stale("weather", 12.97, 77.59) is None
+    cache.set("weather", 12.97, 77.59, {"temp": 31})
+    clock[0] += 90
+    time.sleep(0.08)
+    assert cache.get("weather", 12.97, 77.59) is None
+    assert cache.stale("weather", 12.97, 77.59) == ({"temp": 31}, 90)
+
+
+def test_cached_fetches_the_tile_center_once():
+    cache = GeoCache(tile_degrees=0.01)
+    calls = []
+
+    @cache.cached("soil_ph")
+    async def fetch(lat, lon):
+        calls.append((lat, lon))
+        return 6.8
+
+    async def main():
+        return [await fetch(12.9712, 77.5946), await fetch(12.9788, 77.5901)]
+
+    assert asyncio.run(main()) == [6.8, 6.8]
+    assert calls == [tile_center(tile_of(12.9712, 77.5946, 0.01), 0.01)] == [(12.975, 77.595)]
+
+
+def test_cached_does_not_store_none_or_exceptions():
+    cache = GeoCache()
+    calls = []
+
+    @cache.cached("altitude")
+    async def fetch(lat, lon):
+        calls.append((lat, lon))
+        if len(calls) == 2:
+            raise RuntimeError("upstream down")
+        return None
+
+    assert asyncio.run(fetch(12.97, 77.59)) is None
+    with pytest.raises(RuntimeError):
+        asyncio.run(fetch(12.97, 77.59))
+    assert asyncio.run(fetch(12.97, 77.59)) is None
+    assert len(calls) == 3
+    assert cache.stale("altitude", 12.97, 77.59) is None
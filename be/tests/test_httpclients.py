@@ -0,0 +1,92 @@
+import asyncio
+import socket
+import httpx
+import pytest
+from httpclients import HttpClients
+from stubserver import StubServer
+
+PROVIDERS = {
+    "weatherapi": {"timeout": 5.0, "connect_timeout": 1.0, "retries": 2, "backoff": 0.0, "max_connections": 5, "http2": False},
+    "soil": {"timeout": 5.0, "connect_timeout": 1.0, "retries": 1, "backoff": 0.0, "max_connections": 5, "http2": False},
+}
+
+
+@pytest.fixture
+def stub():
+    with StubServer(latency=0.0) as server:
+        yield server
+
+
+def _get(clients, name, url):
+    async def main():
+        try:
+            return await clients.get(name, url)
+        finally:
+            await clients.close()
+
+    return asyncio.run(main())
+
+
+def test_retryable_statuses_are_retried_until_success(stub):
+    clients = HttpClients(PROVIDERS)
+    stub.statuses = [503, 429]
+    response = _get(clients, "weatherapi", f"{stub.url}/v1/current.json?q=27.0,85.3")
+    assert response.status_code == 200
+    assert stub.requests == 3
+    counters = clients.stats()["providers"]["weatherapi"]
+    assert (counters["requests"], counters["retries"], counters["failures"]) == (1, 2, 0)
+
+
+@pytest.mark.parametrize("name, attempts", [("weatherapi", 3), ("soil", 2)])
+def test_retries_stop_at_the_provider_limit(stub, name, attempts):
+    clients = HttpClients(PROVIDERS)
+    stub.statuses = [500] * 5
+    with pytest.raises(httpx.HTTPStatusError) as raised:
+        _get(clients, name, f"{stub.url}/v1/current.json?q=27.0,85.3")
+    assert raised.value.response.status_code == 500
+    assert stub.requests == attempts
+    counters = clients.stats()["providers"][name]
+    assert (counters["retries"], counters["failures"]) == (attempts - 1, 1)
+
+
+def test_client_errors_other_than_429_are_not_retried(stub):
+    clients = HttpClients(PROVIDERS)
+    stub.statuses = [404]
+    with pytest.raises(httpx.HTTPStatusError):
+        _get(clients, "weatherapi", f"{stub.url}/v1/current.json?q=27.0,85.3")
+    assert stub.requests == 1
+    assert clients.stats()["providers"]["weatherapi"]["retries"] == 0
+
+
+def test_transport_errors_are_retried_then_raised():
+    with socket.socket() as sock:  # a port nothing listens on
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    clients = HttpClients(PROVIDERS)
+    with pytest.raises(httpx.ConnectError):
+        _get(clients, "weatherapi", f"http://127.0.0.1:{port}/v1/current.json")
+    counters = clients.stats()["providers"]["weatherapi"]
+    assert (counters["requests"], counters["retries"], counters["failures"]) == (1, 2, 1)
+
+
+def test_close_then_start_reopens_the_pools(stub):
+    clients = HttpClients(PROVIDERS)
+    url = f"{stub.url}/v1/current.json?q=27.0,85.3"
+
+    async def main():
+        await clients.start()
+        first = clients.client("weatherapi")
+        assert (await clients.get("weatherapi", url)).status_code == 200
+        await clients.close()
+        assert first.is_closed
+        assert not any(p["open"] for p in clients.stats()["providers"].values())
+
+        await clients.start()
+        assert all(p["open"] for p in clients.stats()["providers"].values())
+        assert clients.client("weatherapi") is not first
+        assert (await clients.get("weatherapi", url)).status_code == 200
+        await clients.close()
+
+    asyncio.run(main())
+    assert stub.requests == 2
+    assert clients.stats()["providers"]["weatherapi"]["requests"] == 2
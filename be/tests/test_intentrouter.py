@@ -0,0 +1,50 @@
+import pytest
+from intentrouter import IntentRouter
+
+router = IntentRouter()
+
+
+@pytest.mark.parametrize("text, route", [
+    ("मौसम कैसा रहेगा", "/weatheralerts"),
+    ("मौसमको जानकारी दिनुस्", "/weatheralerts"),
+    ("असिनाले नोक्सान गर्छ", "/weatheralerts"),
+    ("मेरे टमाटर में रोग लगा है", "/disease"),
+    ("पत्तियों पर कीड़े", "/disease"),
+    ("मुझे टमाटर बेचना है", "/explore"),
+    ("भिडियो हेर्न चाहन्छु", "/tutorial"),
+    ("कौन सी फसल लगाऊं", "/recommend"),
+    ("होम पेज", "/"),
+    ("weather alert", "/weatheralerts"),
+    ("disease alerts near me on the map", "/alerts"),
+])
+def test_routes(text, route):
+    assert router.classify(text) == route
+
+
+@pytest.mark.parametrize("text", [
+    # A phrase glued into a longer word is a different word
+    "होमवर्क", "मुझे होमवर्क में मदद चाहिए", "खादी", "खादी का कुर्ता", "पातालपानी", "ओलेग", "बालीवुड",
+])
+def test_phrases_inside_other_words_do_not_match(text):
+    assert router.scores(text) == {}
+    assert router.classify(text) is None
+
+
+@pytest.mark.parametrize("text", ["how to sell", "मुझे अपनी बाली बेचनी है"])
+def test_two_against_one_is_not_confident(text):
+    ranked = sorted(router.scores(text).values(), reverse=True)
+    assert len(ranked) == 2 and ranked[0] <= 2 * ranked[1]
+    assert router.classify(text) is None
+
+
+def test_route_query_records_local_and_llm_answers(monkeypatch):
+    import intentrouter
+
+    fresh = IntentRouter()
+    monkeypatch.setattr(intentrouter, "router", fresh)
+    monkeypatch.setattr(intentrouter, "msg", lambda prompt: 'Sure: {"page": "/tutorial"}')
+    assert intentrouter.route_query("मौसम कैसा रहेगा") == {"page": "/weatheralerts"}
+    assert intentrouter.route_query("something unrelated") == {"page": "/tutorial"}
+    stats = fresh.stats()
+    assert (stats["queries"], stats["local_hits"], stats["llm_calls"]) == (2, 1, 1)
+    assert stats["avg_local_ms"] is not None and stats["avg_llm_ms"] is not None
@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+import pytest
+from listing import LISTING_FIELDS, _same, parse_listing
+
+CORPUS = json.loads((Path(__file__).parent.parent / "Datasets" / "listing_corpus.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("sample", CORPUS, ids=[sample["text"] for sample in CORPUS])
+def test_corpus(sample):
+    parsed = parse_listing(sample["text"])
+    for field in LISTING_FIELDS:
+        assert _same(parsed[field], sample["expected"][field]), field
+
+
+@pytest.mark.parametrize("text, value", [
+    ("दो सौ पचास किलो", 250),
+    ("5 हजार किलो", 5000),
+    ("डेढ़ सौ किलो", 150),
+    ("twenty five kg", 25),
+    ("छ किलो", 6),
+    ("दो किलो", 2),
+])
+def test_number_runs(text, value):
+    assert parse_listing(text)["quantity"] == value
+
+
+def test_digit_is_not_added_to_a_neighbouring_number():
+    # "छ" (is) and "दो" (give) next to a price must not be summed into it
+    assert parse_listing("आलु छ 30 रुपैयाँ")["price_per_unit"] == 30
+    assert parse_listing("बेच दो 20 रुपये")["price_per_unit"] == 20
+    assert parse_listing("पचास 20 रुपये")["price_per_unit"] == 20
+
+
+def test_ambiguous_words_outside_a_quantity():
+    assert parse_listing("आम तौर पर बाजार बंद रहता है")["crop_name"] is None
+    assert parse_listing("I have a 100 kg")["quantity"] == 100
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import pytest
+from llmclient import FakeBackend, LLMClient
+
+
+def test_cache_hits_skip_the_backend():
+    backend = FakeBackend({"weather": "sunny"})
+    client = LLMClient(backend, "fake")
+    assert client.generate_sync("weather   today") == "sunny"
+    assert asyncio.run(client.generate("weather today")) == "sunny"  # same prompt after whitespace folding
+    assert backend.calls == 1
+    assert client.stats()["cache"]["hits"] == 1
+    # use_cache=False always reaches the backend
+    assert asyncio.run(client.generate("weather today", use_cache=False)) == "sunny"
+    assert backend.calls == 2
+
+
+def test_timeouts_are_counted_on_both_paths():
+    client = LLMClient(FakeBackend(latency=0.3), "fake", timeout=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.generate("slow"))
+    with pytest.raises(TimeoutError):
+        client.generate_sync("slow")
+    stats = client.stats()
+    assert stats["timeouts"] == 2 and stats["calls"] == 2 and stats["cache"]["size"] == 0
+
+
+def test_async_and_sync_callers_share_one_limit():
+    client = LLMClient(FakeBackend(latency=0.05), "fake", max_concurrency=3)
+    threads = [threading.Thread(target=client.generate_sync, args=(f"sync {i}",)) for i in range(6)]
+
+    async def main():
+        for thread in threads:
+            thread.start()
+        await asyncio.gather(*(client.generate(f"async {i}") for i in range(6)))
+
+    asyncio.run(main())
+    for thread in threads:
+        thread.join()
+    assert client.calls == 12
+    assert client.peak_concurrency == 3
+
+
+def test_client_works_across_event_loops():
+    client = LLMClient(FakeBackend(), "fake", max_concurrency=1)
+    for i in range(3):
+        assert asyncio.run(client.generate(f"prompt {i}")) == "{}"
+
+
+def test_cancelled_caller_does_not_keep_a_slot():
+    client = LLMClient(FakeBackend(latency=0.2), "fake", max_concurrency=1)
+
+    async def main():
+        first = asyncio.create_task(client.generate("a"))
+        second = asyncio.create_task(client.generate("b"))  # waits for the only slot
+        await asyncio.sleep(0.05)
+        second.cancel()
+        first.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return await asyncio.wait_for(client.generate("c"), 1)
+
+    assert asyncio.run(main()) == "{}"
@@ -0,0 +1,16 @@
+from Diseasedetect import CHECKPOINT_PATH, ImagePreprocessor
+from PIL import Image
+
+
+def test_buffer_kept_only_up_to_batch_size():
+    preprocessor = ImagePreprocessor(CHECKPOINT_PATH / "preprocessor_config.json", max_buffered=4)
+    images = [Image.new("RGB", (300, 260), (i * 10, 100, 50)) for i in range(6)]
+
+    small = preprocessor(images[:4])
+    kept = preprocessor._local.buffer
+    assert kept.shape[0] == 4
+
+    large = preprocessor(images)
+    assert large.shape[0] == 6
+    assert preprocessor._local.buffer is kept  # the one-off batch did not replace or grow it
+    assert small.shape[1:] == large.shape[1:] == (3, 224, 224)
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import date, timedelta
+import numpy as np
+import pytest
+import rainstore
+from geocache import tile_center, tile_of
+from httpclients import http_clients
+from rainstore import RAIN_ARCHIVE_LAG_DAYS, RainfallStore, TileRainfall
+from stubserver import StubServer
+
+TODAY = date(2025, 6, 15)
+
+
+def known(first: date, last: date, mm: float = 1.0) -> TileRainfall:
+    return TileRainfall(first, np.full((last - first).days + 1, mm, dtype=np.float32))
+
+
+def test_first_sync_asks_for_the_whole_year():
+    store = RainfallStore()
+    assert store._missing_range(None, TODAY) == (TODAY - timedelta(days=365), TODAY)
+    # History that ended before the year we need is treated the same way
+    assert store._missing_range(known(date(2023, 1, 1), date(2024, 1, 1)), TODAY) == (TODAY - timedelta(days=365), TODAY)
+
+
+def test_next_day_only_asks_for_the_new_day():
+    store = RainfallStore()
+    rain = known(TODAY - timedelta(days=400), TODAY - timedelta(days=1))
+    assert store._missing_range(rain, TODAY) == (TODAY, TODAY)
+    assert store._missing_range(known(TODAY - timedelta(days=400), TODAY), TODAY) is None
+
+
+def test_unpublished_days_in_the_lag_window_are_asked_for_again():
+    store = RainfallStore()
+    rain = known(TODAY - timedelta(days=400), TODAY - timedelta(days=1))
+    rain.values[-3:] = np.nan  # the archive had not filled in the last three days
+    assert store._missing_range(rain, TODAY) == (TODAY - timedelta(days=3), TODAY)
+    # A gap older than the lag window is never going to be filled and is not asked for again
+    rain = known(TODAY - timedelta(days=400), TODAY - timedelta(days=1))
+    rain.values[-(RAIN_ARCHIVE_LAG_DAYS + 5)] = np.nan
+    assert store._missing_range(rain, TODAY) == (TODAY, TODAY)
+
+
+def test_a_short_history_is_extended_back_to_a_full_year():
+    store = RainfallStore()
+    rain = known(TODAY - timedelta(days=30), TODAY)
+    assert store._missing_range(rain, TODAY) == (TODAY - timedelta(days=365), TODAY)
+
+
+def test_merge_fills_gaps_and_trims_to_history_days():
+    rain = known(date(2025, 1, 1), date(2025, 1, 10))
+    rain.values[-2:] = np.nan
+    rain.merge(date(2025, 1, 9), np.array([2.0, np.nan, 3.0, 4.0], dtype=np.float32), keep_days=12)
+    assert rain.start == date(2025, 1, 1) and rain.end == date(2025, 1, 12)
+    np.testing.assert_array_equal(rain.values[-4:], [2.0, np.nan, 3.0, 4.0])
+
+    rain.merge(date(2025, 1, 13), np.array([5.0, 6.0], dtype=np.float32), keep_days=12)
+    assert rain.start == date(2025, 1, 3) and rain.end == date(2025, 1, 14)
+    assert len(rain.values) == 12 and rain.values[-1] == 6.0
+
+
+@pytest.fixture
+def month_numbers(monkeypatch):
+    # Each day's rainfall is its month number, so a monthly total shows which days landed in it
+    calls = []
+
+    async def fetch(lat, lon, first, last):
+        calls.append((first, last))
+        days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        return np.array([day.month for day in days], dtype=np.float32)
+
+    monkeypatch.setattr(rainstore, "fetch_precipitation", fetch)
+    return calls
+
+
+def test_monthly_and_seasonal_totals_across_the_year_boundary(month_numbers):
+    store = RainfallStore()
+    today = date(2025, 1, 15)
+    monthly = asyncio.run(store.monthly_totals(27.7, 85.3, today))
+    # 365 days from 2024-01-17: January is split across both years, February 2024 is a leap month
+    assert monthly[1] == 1 * (15 + 15)
+    assert monthly[2] == 2 * 29
+    assert monthly[12] == 12 * 31
+    assert sum(monthly.values()) == sum(m * n for m, n in zip(range(1, 13), (30, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)))
+
+    seasonal = asyncio.run(store.seasonal_totals(27.7, 85.3, today))
+    assert seasonal["winter"] == monthly[12] + monthly[1] + monthly[2]
+    assert seasonal["monsoon"] == sum(monthly[m] for m in (6, 7, 8, 9))
+    assert len(month_numbers) == 1  # the second call was served from the store
+
+
+def test_tiles_are_bounded_least_recently_used_first(month_numbers):
+    store = RainfallStore(max_tiles=2)
+
+    async def main():
+        for lat in (27.705, 27.715, 27.705, 27.725):
+            await store.sync(lat, 85.3, TODAY)
+
+    asyncio.run(main())
+    assert store.stats()["tiles"] == 2 and store.stats()["evicted_tiles"] == 1
+    assert store.tiles.get(tile_of(27.715, 85.3, store.tile_degrees)) is None
+    assert len(store._locks) == 2
+
+
+def test_saved_tiles_are_reloaded_instead_of_fetched(month_numbers, tmp_path):
+    asyncio.run(RainfallStore(data_dir=str(tmp_path)).sync(27.7, 85.3, TODAY))
+    store = RainfallStore(data_dir=str(tmp_path))
+    asyncio.run(store.sync(27.7, 85.3, TODAY))
+    assert len(month_numbers) == 1 and store.upstream_calls == 0
+
+
+def test_incremental_totals_match_a_full_year_pull(monkeypatch):
+    locations = [tile_center(tile_of(27.0 + i * 0.05, 84.0 + i * 0.03)) for i in range(5)]
+    start = date(2025, 6, 1)
+
+    async def main():
+        with StubServer(latency=0.0) as stub:
+            monkeypatch.setattr(rainstore, "ARCHIVE_API_URL", stub.urls()["ARCHIVE_API_URL"])
+            store = RainfallStore()
+            worst = 0.0
+            try:
+                for d in range(20):
+                    today = start + timedelta(days=d)
+                    for lat, lon in locations:
+                        values = await rainstore.fetch_precipitation(lat, lon, today - timedelta(days=365), today)
+                        worst = max(worst, abs(float(np.nansum(values)) - await store.annual_total(lat, lon, today)))
+            finally:
+                await http_clients.close()
+            return worst, store
+
+    worst, store = asyncio.run(main())
+    assert worst < 0.06  # totals are rounded to 0.1 mm
+    assert store.days_fetched == 5 * 366 + 5 * 19
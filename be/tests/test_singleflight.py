@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+
+def _fetcher(group, provider="weather", result=21.5, delay=0.05):
+    calls = []
+
+    @group.coalesce(provider)
+    async def fetch(lat, lon):
+        calls.append((lat, lon))
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fetch, calls
+
+
+def test_concurrent_identical_keys_share_one_call():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group)
+
+    async def main():
+        return await asyncio.gather(*(fetch(27.7168, 85.3240) for _ in range(20)))
+
+    assert asyncio.run(main()) == [21.5] * 20
+    assert calls == [(27.717, 85.324)]
+    assert group.stats() == {"in_flight": 0, "providers": {"weather": {"calls": 20, "upstream": 1, "coalesced": 19}}}
+
+
+def test_coordinates_rounded_to_three_decimals_share_a_key():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group)
+
+    async def main():
+        # the first three round to (27.717, 85.324); the last is one step away
+        await asyncio.gather(fetch(27.7168, 85.3240), fetch(27.71704, 85.32398), fetch("27.7172", "85.3241"), fetch(27.7176, 85.3240))
+
+    asyncio.run(main())
+    assert calls == [(27.717, 85.324), (27.718, 85.324)]
+
+
+def test_later_calls_start_a_new_request():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group)
+    asyncio.run(fetch(27.7168, 85.3240))
+    asyncio.run(fetch(27.7168, 85.3240))
+    assert len(calls) == 2  # not a cache
+
+
+def test_an_exception_reaches_every_waiter():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group, result=RuntimeError("upstream down"))
+
+    async def main():
+        return await asyncio.gather(*(fetch(27.7168, 85.3240) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len({id(r) for r in results}) == 1
+    assert group.stats()["in_flight"] == 0
+
+
+def test_one_waiter_cancelling_does_not_cancel_the_call():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group, delay=0.1)
+
+    async def main():
+        leaving = asyncio.ensure_future(fetch(27.7168, 85.3240))
+        staying = asyncio.ensure_future(fetch(27.7168, 85.3240))
+        await asyncio.sleep(0.02)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(main()) == 21.5
+    assert len(calls) == 1
+
+
+def test_every_waiter_cancelling_leaves_nothing_in_flight():
+    group = SingleFlight()
+    fetch, calls = _fetcher(group, delay=0.05)
+
+    async def main():
+        waiters = [asyncio.ensure_future(fetch(27.7168, 85.3240)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.1)  # the shared call still finishes on its own
+        return group.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 0
+    assert len(calls) == 1
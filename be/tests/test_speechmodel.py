@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+import speechmodel
+from speechmodel import SpeechModelProvider
+from transcriber import TranscriberUnavailable, TranscriptionExecutor
+
+
+def _flaky_whisper(monkeypatch, failures):
+    calls = []
+
+    def whisper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("model download interrupted")
+        return object()
+
+    monkeypatch.setattr(speechmodel, "WhisperModel", whisper)
+    return calls
+
+
+def test_background_load_retries_until_it_succeeds(monkeypatch):
+    calls = _flaky_whisper(monkeypatch, failures=2)
+    provider = SpeechModelProvider("tiny")
+    provider.load_in_background(retry_seconds=0.01)
+    provider._loader.join(timeout=5)
+    assert provider.ready and provider.error is None
+    assert len(calls) == provider.attempts == 3
+
+
+def test_failed_lazy_load_recovers_through_the_executor(monkeypatch):
+    _flaky_whisper(monkeypatch, failures=1)
+    provider = SpeechModelProvider("tiny")
+    with pytest.raises(RuntimeError):
+        provider.get()  # a lazy first use that failed
+
+    executor = TranscriptionExecutor(provider)
+    with pytest.raises(TranscriberUnavailable):
+        asyncio.run(executor.transcribe(b""))
+    # The 503 started a retrying loader instead of sticking for the life of the process
+    provider._loader.join(timeout=10)
+    assert provider.ready
+    executor.shutdown()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from transcriber import TranscriberUnavailable
+
+
+class FakeExecutor:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def transcribe(self, audio, **options):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return "पचास किलो आलु"
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    import app
+
+    monkeypatch.setenv("STREAM_CHUNK_SECONDS", "0.1")
+    monkeypatch.setattr(app, "extract_listing", lambda text: {"crop_name": "Potato"})
+
+    def connect(executor):
+        monkeypatch.setattr(app, "transcriber", executor)
+        return TestClient(app.app).websocket_connect("/transcribe/stream")
+
+    return connect
+
+
+def _pcm(seconds):
+    return np.zeros(int(16000 * seconds), dtype="<i2").tobytes()
+
+
+def test_worker_failure_is_reported_without_another_frame(stream):
+    with stream(FakeExecutor(TranscriberUnavailable("Speech model failed to load"))) as ws:
+        ws.send_bytes(_pcm(0.5))
+        # No further frames: the error must arrive on its own
+        message = ws.receive_json()
+        assert message["type"] == "error" and message["status"] == 503
+
+
+def test_empty_frames_and_end(stream):
+    executor = FakeExecutor()
+    with stream(executor) as ws:
+        ws.send_bytes(b"")
+        ws.send_text("end")
+        assert ws.receive_json() == {"type": "final", "text": ""}
+        assert ws.receive_json()["type"] == "listing"
+    assert executor.calls == 0
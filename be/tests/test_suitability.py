@@ -0,0 +1,56 @@
+import itertools
+import numpy as np
+import pytest
+from Bestcrop import crop_index, df, recommend_crops
+from suitability import FACTORS, SEASON_POINTS, month_mask
+
+# Conditions spanning the catalogue's optimal, absolute-only and out-of-range values
+TEMPS = (-5, 8, 18, 27, 38)
+RAINFALL = (150, 700, 1500, 3500)
+PH = (4.2, 5.8, 6.8, 8.4)
+LATITUDES = (-30, 0, 27.7, 45)
+ALTITUDES = (50, 1400, 3200)
+
+
+def old(temp, rainfall, ph, latitude, altitude, month):
+    frame = recommend_crops(temp, rainfall, ph, latitude, altitude, month)
+    return [(str(crop), int(score)) for crop, score in zip(frame["Crop"], frame["Score"])]
+
+
+@pytest.mark.parametrize("month", range(1, 13))
+def test_index_matches_recommend_crops_for_every_month(month):
+    for temp, rainfall, ph, latitude, altitude in itertools.product(TEMPS, RAINFALL, PH, LATITUDES, ALTITUDES):
+        expected = old(temp, rainfall, ph, latitude, altitude, month)
+        got = [(row["Crop"], row["Score"]) for row in crop_index.recommend(temp, rainfall, ph, latitude, altitude, month)]
+        # Same crops and scores; the old unstable sort may order ties differently
+        assert sorted(got) == sorted(expected)
+        assert [score for _, score in got] == [score for _, score in expected]
+
+
+def test_score_matrix_matches_single_scores():
+    locations = list(itertools.product(TEMPS, RAINFALL, PH, LATITUDES, ALTITUDES))
+    months = np.arange(len(locations)) % 12 + 1
+    matrix = crop_index.score_matrix(*zip(*locations), months)
+    for row, location, month in zip(matrix, locations, months):
+        np.testing.assert_array_equal(row, crop_index.scores(*location, month))
+
+
+def test_month_mask_wraps_around_the_new_year():
+    mask = month_mask(np.array([11, 12, 3]), np.array([2, 2, 5]))
+    assert np.flatnonzero(mask[:, 0]).tolist() == [1, 2, 11, 12]  # Nov..Feb
+    assert np.flatnonzero(mask[:, 1]).tolist() == [1, 2, 12]  # Dec..Feb
+    assert np.flatnonzero(mask[:, 2]).tolist() == [3, 4, 5]
+
+
+@pytest.mark.parametrize("crop", ["Pear", "Peach", "Apple"])
+def test_wrapped_planting_windows_match_recommend_crops(crop):
+    row = df[df["Crop"] == crop].iloc[0]
+    assert row["Planting_Start_Month"] > row["Planting_End_Month"]
+    # The middle of each optimal range, so the crop is recommended in every month
+    conditions = [(row[f"{prefix}_Optimal_Min"] + row[f"{prefix}_Optimal_Max"]) / 2 for prefix, _ in FACTORS]
+    i = crop_index.names.tolist().index(crop)
+    planting = month_mask(np.array([row["Planting_Start_Month"]]), np.array([row["Planting_End_Month"]]))[:, 0]
+    assert planting[1] and planting[12] and not planting[6]
+    for month in range(1, 13):
+        assert crop_index.scores(*conditions, month)[i] == dict(old(*conditions, month))[crop]
+        assert crop_index.season[month, i] >= SEASON_POINTS * planting[month]
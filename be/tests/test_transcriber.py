@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from transcriber import TranscriberBusy, TranscriberUnavailable, TranscriptionExecutor
+
+
+class BlockingModel:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = 0
+
+    def transcribe(self, audio, **options):
+        self.started += 1
+        self.release.wait(5)
+        return [type("Segment", (), {"text": "ok"})()], None
+
+
+class Provider:
+    def __init__(self, model=None, error=None):
+        self.model = model
+        self.error = error
+        self.retries = 0
+
+    def get(self):
+        return self.model
+
+    def load_in_background(self):
+        self.retries += 1
+
+
+def test_full_queue_is_rejected_and_cancelled_callers_keep_their_slot():
+    model = BlockingModel()
+    executor = TranscriptionExecutor(Provider(model), max_workers=1, max_queue=1)
+
+    audio = np.zeros(1600, dtype=np.float32)
+
+    async def scenario():
+        waiting = [asyncio.create_task(executor.transcribe(audio)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(TranscriberBusy):
+            await executor.transcribe(audio)
+        # Both clients disconnect: the queued job is dropped, the decode already running keeps its slot
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert model.started == 1 and executor._in_flight == 1
+        refill = [asyncio.create_task(executor.transcribe(audio))]
+        await asyncio.sleep(0.01)
+        with pytest.raises(TranscriberBusy):
+            await executor.transcribe(audio)
+        model.release.set()
+        assert await refill[0] == "ok"
+        for _ in range(100):
+            if executor._in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor._in_flight == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        model.release.set()
+        executor.shutdown()
+    assert executor.rejected >= 1
+
+
+def test_endpoint_maps_saturation_to_429_and_failed_model_to_503(monkeypatch):
+    import app
+
+    model = BlockingModel()
+    busy = TranscriptionExecutor(Provider(model), max_workers=1, max_queue=0)
+    busy._in_flight = 1  # the one worker is taken
+    monkeypatch.setattr(app, "transcriber", busy)
+    client = TestClient(app.app)
+    response = client.post("/transcribe", files={"file": ("a.wav", b"RIFF", "audio/wav")})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "5"
+
+    provider = Provider(error="model download interrupted")
+    monkeypatch.setattr(app, "transcriber", TranscriptionExecutor(provider))
+    response = client.post("/transcribe", files={"file": ("a.wav", b"RIFF", "audio/wav")})
+    assert response.status_code == 503
+    assert provider.retries == 1
+    busy.shutdown()
+
+
+def test_shut_down_executor_is_unavailable():
+    executor = TranscriptionExecutor(Provider(BlockingModel()))
+    executor.shutdown()
+    with pytest.raises(TranscriberUnavailable):
+        asyncio.run(executor.transcribe(b""))
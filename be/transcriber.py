@@ -0,0 +1,262 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from faster_whisper import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+
+class TranscriberBusy(Exception):
+    """
+    Every worker is busy and the wait queue is full; the client should retry later.
+    """
+    status_code = 429
+
+
+class TranscriberUnavailable(Exception):
+    """
+    The executor is shut down or the speech model could not be loaded.
+    """
+    status_code = 503
+
+
+def decode_audio_bytes(data: bytes, sampling_rate: int = 16000):
+    """
+    Decodes an uploaded audio file held in memory into mono float32 PCM at `sampling_rate`.
+    PyAV demuxes and resamples frame by frame from the buffer, so nothing touches the disk.
+    """
+    return decode_audio(BytesIO(data), sampling_rate=sampling_rate)
+
+
+def _summary(samples) -> dict:
+    if not samples:
+        return {"count": 0, "avg_ms": None, "p50_ms": None, "p95_ms": None}
+    ordered = sorted(samples)
+
+    def pick(pct):
+        return round(ordered[min(len(ordered) - 1, int(pct * len(ordered)))] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+    }
+
+
+class TranscriptionExecutor:
+    """
+    Runs Whisper transcription on a bounded thread pool so long clips never block the event loop.
+    At most `max_workers` clips decode at once and at most `max_queue` more may wait; beyond that
+    callers get TranscriberBusy (HTTP 429) straight away instead of piling up.
+    """
+
+    def __init__(self, provider=None, max_workers: int = None, max_queue: int = None):
+        # Anything with get() -> WhisperModel, load_in_background() and an `error` attribute, normally speechmodel.speech_model
+        self.provider = provider
+        self.max_workers = max_workers or int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("TRANSCRIBE_MAX_QUEUE", "8"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="whisper")
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait = deque(maxlen=500)
+        self.decode_time = deque(maxlen=500)
+
+    async def transcribe(self, audio, **options) -> str:
+        """
+        Transcribes raw upload bytes, a file path, a file-like object or a float32 PCM array
+        and returns the joined text.
+        """
+        if self._closed or self.provider is None:
+            raise TranscriberUnavailable("Transcription service is not available")
+        if self.provider.error:
+            # Keep retrying the load in the background so the 503 lasts only until it succeeds
+            self.provider.load_in_background()
+            raise TranscriberUnavailable(f"Speech model failed to load: {self.provider.error}")
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise TranscriberBusy("Transcription queue is full, please retry shortly")
+            self._in_flight += 1
+
+        # The slot is released when the job itself finishes (or is cancelled before it started), not
+        # when the caller stops waiting: a disconnected client's decode still occupies a worker
+        try:
+            future = self._executor.submit(self._run, audio, time.perf_counter(), options)
+        except RuntimeError:
+            # Shut down between the check above and here
+            self._release(None)
+            raise TranscriberUnavailable("Transcription service is not available")
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _run(self, audio, submitted_at: float, options: dict) -> str:
+        started = time.perf_counter()
+        self.queue_wait.append(started - submitted_at)
+        try:
+            if isinstance(audio, (bytes, bytearray)):
+                audio = decode_audio_bytes(audio)
+            # Loads the model on first use if it was not preloaded
+            segments, info = self.provider.get().transcribe(audio, **options)
+            # segments is lazy: the actual decoding happens while joining, so keep it on this thread
+            text = " ".join(s.text for s in segments)
+        except Exception:
+            self.failed += 1
+            raise
+        self.decode_time.append(time.perf_counter() - started)
+        self.completed += 1
+        return text
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait": _summary(list(self.queue_wait)),
+            "decode_time": _summary(list(self.decode_time)),
+        }
+
+
+class StreamingTranscription:
+    """
+    Transcribes 16-bit little-endian mono PCM as it arrives over a socket.
+    Audio is cut into windows at pauses found by the Silero VAD (or at `max_window_seconds`
+    during non-stop speech), and each window is transcribed on the executor while the client
+    keeps uploading. `on_partial` is awaited with the running text after every window.
+    """
+
+    def __init__(self, executor: TranscriptionExecutor, sampling_rate: int = 16000, chunk_seconds: float = None, max_window_seconds: float = None, **options):
+        self.executor = executor
+        self.sampling_rate = sampling_rate
+        self.chunk_samples = int(sampling_rate * (chunk_seconds or float(os.getenv("STREAM_CHUNK_SECONDS", "3"))))
+        self.max_window_samples = int(sampling_rate * (max_window_seconds or float(os.getenv("STREAM_MAX_WINDOW_SECONDS", "15"))))
+        self.options = options
+        self.segments = []
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._leftover = b""
+        self._wake_at = self.chunk_samples
+        self._wake = asyncio.Event()
+        self._finished = False
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.segments)
+
+    def feed(self, chunk: bytes):
+        data = self._leftover + chunk
+        usable = len(data) - len(data) % 2
+        self._leftover = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        self._pending = np.concatenate([self._pending, samples])
+        if len(self._pending) >= self._wake_at:
+            self._wake.set()
+
+    def finish(self):
+        """
+        Marks the end of the upload; run() transcribes whatever is left and returns.
+        """
+        self._finished = True
+        self._wake.set()
+
+    def _split_at_pause(self, audio: np.ndarray) -> int:
+        # Returns how many samples can be transcribed now without cutting through a word
+        speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=300))
+        if not speech or len(audio) - speech[-1]["end"] >= self.sampling_rate * 0.3:
+            return len(audio)
+        if len(speech) > 1:
+            return (speech[-2]["end"] + speech[-1]["start"]) // 2
+        return 0
+
+    async def run(self, on_partial) -> str:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while len(self._pending) >= self._wake_at or (self._finished and len(self._pending)):
+                audio = self._pending
+                if self._finished or len(audio) >= self.max_window_samples:
+                    cut = len(audio)
+                else:
+                    cut = await asyncio.to_thread(self._split_at_pause, audio)
+                if cut == 0:
+                    # Still mid-sentence: look again once more audio has arrived
+                    self._wake_at = len(audio) + self.chunk_samples // 2
+                    break
+
+                # feed() only appends, so the first `cut` samples are still the ones we looked at
+                self._pending = self._pending[cut:]
+                self._wake_at = self.chunk_samples
+                segment = (await self.executor.transcribe(audio[:cut], **self.options)).strip()
+                if segment:
+                    self.segments.append(segment)
+                    await on_partial(self.text, segment)
+
+            if self._finished and not len(self._pending):
+                return self.text
+
+
+def _benchmark(path: str, repeats: int, model_size: str = None):
+    import tempfile
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    def via_temp_file():
+        # What the endpoints used to do: write the upload to disk, decode from the path, delete it
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1], dir=".")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            return decode_audio(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def in_memory():
+        return decode_audio_bytes(data)
+
+    results = {}
+    for name, decode in (("temp file", via_temp_file), ("in memory", in_memory)):
+        decode()  # warm up codecs
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            audio = decode()
+            timings.append(time.perf_counter() - started)
+        results[name] = audio
+        print(f"decode via {name:<9}: {_summary(timings)}")
+
+    if model_size:
+        from faster_whisper import WhisperModel
+
+        model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        for name, audio in results.items():
+            started = time.perf_counter()
+            segments, info = model.transcribe(audio, beam_size=1, language="hi", vad_filter=True)
+            text = " ".join(s.text for s in segments)
+            print(f"end-to-end via {name:<9}: {(time.perf_counter() - started) * 1000:.1f} ms  {text[:60]!r}")
+
+
+if __name__ == "__main__":
+    # Compare the old temp-file path with in-memory decoding:
+    #   python transcriber.py clip.webm [repeats] [whisper model size for an end-to-end run]
+    import sys
+
+    _benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 20, sys.argv[3] if len(sys.argv) > 3 else None)